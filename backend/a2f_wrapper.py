@@ -5,39 +5,56 @@ Uses PyBind11 bindings for Audio2Face-3D SDK
 
 import numpy as np
 from pathlib import Path
-from typing import Dict, List
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 from config import config
+from cancellation import CancelToken, check
+from structured_logging import get_logger
 import sys
 
+logger = get_logger(__name__)
+
 class Audio2FaceSDK:
     """Python wrapper for Audio2Face-3D SDK using PyBind11 bindings"""
 
-    def __init__(self, character_index: int = 0, use_gpu_solver: bool = False):
+    def __init__(self, character_index: int = 0, use_gpu_solver: bool = False, binding=None,
+                 window_seconds: float = 0.0, window_context_seconds: float = 0.5,
+                 model_path: Optional[Path] = None):
         """
         Initialize Audio2Face SDK
 
         Args:
             character_index: Character to use (0=Claire, 1=James, 2=Mark)
             use_gpu_solver: Use GPU for blendshape solving (default: False for CPU)
+            binding: Module providing BlendshapeModel (default: audio2face_py);
+                     lets benchmarks run against a stand-in on CPU
+            window_seconds: Split longer audio into windows of this length (0 = whole clip)
+            window_context_seconds: Audio context added on each side of a window
+            model_path: Model directory holding model.json (default: config.MODEL_PATH)
         """
         self.character_index = character_index
         self.use_gpu_solver = use_gpu_solver
+        self.window_seconds = window_seconds
+        self.window_context_seconds = window_context_seconds
+        self.model_dir = Path(model_path or config.MODEL_PATH)
         self.model_loaded = False
         self.bundle = None
 
         try:
             # Import PyBind11 module
-            import audio2face_py
-            self.a2f = audio2face_py
+            if binding is None:
+                import audio2face_py as binding
+            self.a2f = binding
 
             # Load model
-            model_path = str(config.MODEL_PATH / "model.json")
+            model_path = str(self.model_dir / "model.json")
             if not Path(model_path).exists():
                 raise FileNotFoundError(f"Model not found at {model_path}")
 
-            print(f"Loading Audio2Face model from: {model_path}")
-            print(f"Character: {self._get_character_name(character_index)}")
-            print(f"GPU Solver: {use_gpu_solver}")
+            logger.info("Loading Audio2Face model", extra={
+                'model_path': model_path,
+                'character': self._get_character_name(character_index),
+                'gpu_solver': use_gpu_solver
+            })
 
             # Create blendshape model using the CORRECTED API
             self.bundle = self.a2f.BlendshapeModel(
@@ -51,18 +68,17 @@ class Audio2FaceSDK:
             self.fps = self.bundle.get_fps()
             self.model_loaded = True
 
-            print(f"✓ Audio2Face SDK initialized successfully")
-            print(f"✓ Blendshapes: {self.num_blendshapes}")
-            print(f"✓ FPS: {self.fps}")
+            logger.info("Audio2Face SDK initialized", extra={
+                'num_blendshapes': self.num_blendshapes, 'fps': self.fps
+            })
 
         except ImportError as e:
-            print(f"✗ Failed to import audio2face_py module: {e}")
-            print("NOTE: PyBind11 wrapper needs to be built first")
-            print("Run: cd Audio2Face-3D-SDK/_build && make audio2face_py")
+            logger.error(f"Failed to import audio2face_py module: {e}. PyBind11 wrapper needs to be "
+                         "built first: cd Audio2Face-3D-SDK/_build && make audio2face_py")
             raise RuntimeError("PyBind11 module not available") from e
 
         except Exception as e:
-            print(f"✗ Failed to initialize Audio2Face SDK: {e}")
+            logger.error(f"Failed to initialize Audio2Face SDK: {e}")
             raise
 
     def reset_bundle(self):
@@ -78,7 +94,7 @@ class Audio2FaceSDK:
             del self.bundle
 
         # Recreate bundle with same parameters
-        model_path = str(config.MODEL_PATH / "model.json")
+        model_path = str(self.model_dir / "model.json")
         self.bundle = self.a2f.BlendshapeModel(
             model_path=model_path,
             character_index=self.character_index,
@@ -86,12 +102,47 @@ class Audio2FaceSDK:
             constant_noise=False
         )
 
-    def process_audio(self, audio: np.ndarray) -> Dict:
+    def _prepare_audio(self, audio: np.ndarray) -> np.ndarray:
+        """Ensure audio is 1D float32 within [-1, 1]"""
+        # Ensure audio is float32 and 1D
+        audio = audio.astype(np.float32, copy=False)
+        if audio.ndim > 1:
+            audio = audio.flatten()
+
+        # Normalize if needed
+        max_val = np.abs(audio).max() if audio.size else 0.0
+        if max_val > 1.0:
+            audio = audio / max_val
+            logger.debug("Normalized audio", extra={'max_value': float(max_val)})
+
+        return audio
+
+    def _package_result(self, blendshapes: np.ndarray) -> Dict:
+        """Wrap a (num_frames, num_blendshapes) array with its timing information"""
+        num_frames = blendshapes.shape[0]
+        timestamps = np.arange(num_frames) / self.fps
+        duration = timestamps[-1] if num_frames > 0 else 0.0
+
+        return {
+            'blendshapes': blendshapes,
+            'timestamps': timestamps,
+            'fps': self.fps,
+            'duration': duration,
+            'num_frames': num_frames
+        }
+
+    def process_audio(self, audio: np.ndarray, cancel_token: Optional[CancelToken] = None,
+                      on_window: Optional[Callable[[Dict], None]] = None,
+                      window_seconds: Optional[float] = None) -> Dict:
         """
         Process audio and return blendshapes
 
         Args:
             audio: Audio data as float32 numpy array (16kHz mono)
+            cancel_token: Checked before each inference window
+            on_window: Called with each window (see process_windows) as soon as
+                       it finishes, e.g. to stream frames to a client
+            window_seconds: Override the instance's window length for this call
 
         Returns:
             Dictionary with:
@@ -104,39 +155,151 @@ class Audio2FaceSDK:
         if not self.model_loaded:
             raise RuntimeError("SDK not initialized")
 
-        # Reset bundle before each request to clear execution state
-        self.reset_bundle()
+        audio = self._prepare_audio(audio)
 
-        # Ensure audio is float32 and 1D
-        audio = audio.astype(np.float32)
-        if audio.ndim > 1:
-            audio = audio.flatten()
-
-        # Normalize if needed
-        max_val = np.abs(audio).max()
-        if max_val > 1.0:
-            audio = audio / max_val
-            print(f"Normalized audio (max was {max_val:.2f})")
-
-        print(f"Processing audio: {len(audio)} samples ({len(audio)/config.SAMPLE_RATE:.2f}s)")
+        logger.debug("Processing audio", extra={'samples': len(audio)})
 
         # Process through SDK - this calls the C++ implementation
-        blendshapes = self.bundle.process_audio(audio)
+        windows = []
+        for window in self.process_windows(audio, cancel_token, window_seconds):
+            windows.append(window['blendshapes'])
+            if on_window:
+                on_window(window)
+        blendshapes = windows[0] if len(windows) == 1 else np.concatenate(windows)
 
         # blendshapes is now a numpy array of shape (num_frames, num_blendshapes)
-        num_frames = blendshapes.shape[0]
-        timestamps = np.arange(num_frames) / self.fps
-        duration = timestamps[-1] if num_frames > 0 else 0.0
+        result = self._package_result(blendshapes)
 
-        print(f"✓ Generated {num_frames} frames ({duration:.2f}s @ {self.fps}fps)")
+        logger.debug("Generated frames", extra={'num_frames': result['num_frames'], 'fps': self.fps})
 
-        return {
-            'blendshapes': blendshapes,
-            'timestamps': timestamps,
-            'fps': self.fps,
-            'duration': duration,
-            'num_frames': num_frames
-        }
+        return result
+
+    def iter_windows(self, num_samples: int,
+                     window_seconds: Optional[float] = None) -> Iterator[Tuple[int, int, int, int]]:
+        """
+        Split a clip into inference windows (window_seconds defaults to the instance's)
+
+        Yields:
+            (start, end, context_start, context_end) sample ranges; frames are
+            kept for [start, end), the context only conditions the model
+        """
+        if window_seconds is None:
+            window_seconds = self.window_seconds
+        window = int(window_seconds * config.SAMPLE_RATE)
+        if window <= 0 or num_samples <= window:
+            yield 0, num_samples, 0, num_samples
+            return
+
+        context = int(self.window_context_seconds * config.SAMPLE_RATE)
+        for start in range(0, num_samples, window):
+            end = min(start + window, num_samples)
+            yield start, end, max(0, start - context), min(num_samples, end + context)
+
+    def _frame_at(self, sample: int) -> int:
+        return int(round(sample * self.fps / config.SAMPLE_RATE))
+
+    def process_windows(self, audio: np.ndarray, cancel_token: Optional[CancelToken] = None,
+                        window_seconds: Optional[float] = None) -> Iterator[Dict]:
+        """
+        Run inference window by window, yielding each window's frames as soon as
+        it finishes (a single window covering the clip when windowing is off)
+
+        Args:
+            audio: Audio data as float32 numpy array (16kHz mono)
+            cancel_token: Checked before each window; raises Cancelled
+            window_seconds: Override the instance's window length
+
+        Yields:
+            Dictionary with blendshapes for the window, start_frame,
+            window_index and num_windows
+        """
+        if not self.model_loaded:
+            raise RuntimeError("SDK not initialized")
+
+        audio = self._prepare_audio(audio)
+        windows = list(self.iter_windows(len(audio), window_seconds))
+
+        for index, (start, end, context_start, context_end) in enumerate(windows):
+            check(cancel_token, f"inference window {index + 1}/{len(windows)}")
+
+            # Reset bundle before each window to clear execution state
+            self.reset_bundle()
+            output = self.bundle.process_audio(audio[context_start:context_end])
+
+            first_frame = self._frame_at(start)
+            if len(windows) > 1:
+                # Drop frames produced for the context padding
+                offset = first_frame - self._frame_at(context_start)
+                if index < len(windows) - 1:
+                    count = self._frame_at(end) - first_frame
+                    output = output[offset:offset + count]
+                    if 0 < len(output) < count:
+                        output = np.concatenate([output, np.repeat(output[-1:], count - len(output), axis=0)])
+                else:
+                    output = output[offset:]
+
+            yield {
+                'blendshapes': output,
+                'start_frame': first_frame,
+                'window_index': index,
+                'num_windows': len(windows)
+            }
+
+    def supports_native_batching(self) -> bool:
+        """Whether the binding can run several clips in one call"""
+        return self.model_loaded and hasattr(self.bundle, 'process_batch')
+
+    def process_batch(self, audios: List[np.ndarray]) -> List[Dict]:
+        """
+        Process several clips, paying bundle reset and call overhead once when
+        the binding supports native batching (clips spanning several windows
+        run windowed on their own, as in process_audio)
+
+        Args:
+            audios: List of float32 numpy arrays (16kHz mono)
+
+        Returns:
+            One result dictionary per clip, in input order (see process_audio)
+        """
+        if not self.model_loaded:
+            raise RuntimeError("SDK not initialized")
+
+        if not audios:
+            return []
+
+        # Without native batching each clip still needs a fresh bundle
+        if not self.supports_native_batching():
+            return [self.process_audio(audio) for audio in audios]
+
+        # Clips longer than one window are windowed exactly as they would be
+        # alone, so output never depends on whether the scheduler batched them
+        results: List[Optional[Dict]] = [None] * len(audios)
+        batched = []
+        for index, audio in enumerate(audios):
+            if sum(1 for _ in self.iter_windows(len(audio))) > 1:
+                results[index] = self.process_audio(audio)
+            else:
+                batched.append(index)
+        if not batched:
+            return results
+
+        self.reset_bundle()
+        prepared = [self._prepare_audio(audios[index]) for index in batched]
+
+        total = sum(len(audio) for audio in prepared)
+        logger.debug("Processing batch", extra={'clips': len(prepared), 'samples': total})
+
+        outputs = self.bundle.process_batch(prepared)
+        if len(outputs) != len(prepared):
+            raise RuntimeError(f"Batch returned {len(outputs)} results for {len(prepared)} clips")
+
+        for index, blendshapes in zip(batched, outputs):
+            results[index] = self._package_result(blendshapes)
+        logger.debug("Generated batch frames", extra={
+            'clips': len(results), 'num_frames': sum(r['num_frames'] for r in results)
+        })
+
+        return results
 
     def get_blendshape_names(self) -> List[str]:
         """Get list of blendshape names"""
@@ -169,8 +332,15 @@ class Audio2FaceSDK:
         characters = ["Claire", "James", "Mark"]
         return characters[index] if index < len(characters) else f"Character_{index}"
 
+    def release(self):
+        """Free the bundle (and its GPU memory) now rather than at garbage collection"""
+        self.model_loaded = False
+        if self.bundle:
+            bundle, self.bundle = self.bundle, None
+            del bundle
+
     def __del__(self):
         """Cleanup"""
         if hasattr(self, 'bundle') and self.bundle:
             del self.bundle
-            print("✓ Audio2Face SDK cleaned up")
+            logger.debug("Audio2Face SDK cleaned up")
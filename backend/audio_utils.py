@@ -1,36 +1,212 @@
 import numpy as np
 import soundfile as sf
 import librosa
+import shutil
+import subprocess
 from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
 from config import config
+from cancellation import CancelToken, check
+
+# Formats accepted by /process-audio
+SUPPORTED_FORMATS = ('wav', 'flac', 'ogg', 'mp3')
+
+# Raw sample formats accepted by /process-pcm, as numpy dtypes
+PCM_FORMATS = {'s16le': np.dtype('<i2'), 'f32le': np.dtype('<f4')}
+
+def sniff_format(header: bytes) -> Optional[str]:
+    """
+    Detect the audio container from its leading magic bytes
+
+    Args:
+        header: First bytes of the file (16 are enough)
+
+    Returns:
+        One of SUPPORTED_FORMATS, or None if the container is not recognised
+    """
+    if header[:4] in (b'RIFF', b'RF64') and header[8:12] == b'WAVE':
+        return 'wav'
+    if header[:4] == b'fLaC':
+        return 'flac'
+    if header[:4] == b'OggS':
+        return 'ogg'
+    # MP3: ID3v2 tag, or a bare MPEG audio frame sync (11 set bits)
+    if header[:3] == b'ID3':
+        return 'mp3'
+    if len(header) >= 2 and header[0] == 0xFF and (header[1] & 0xE0) == 0xE0:
+        return 'mp3'
+    return None
+
+def sniff_file(audio_path: str) -> Optional[str]:
+    """Detect the audio container of a file on disk"""
+    with open(audio_path, 'rb') as f:
+        return sniff_format(f.read(16))
+
+# Decoder callables take a path and return (audio, sample_rate) where audio is
+# float32 shaped (samples,) or (channels, samples), same as librosa.load(mono=False)
+Decoder = Callable[[str], Tuple[np.ndarray, int]]
+
+def _decode_soundfile(audio_path: str) -> Tuple[np.ndarray, int]:
+    """Decode in-process through libsndfile (WAV/FLAC/OGG, MP3 on libsndfile >= 1.1)"""
+    audio, sr = sf.read(audio_path, dtype='float32', always_2d=False)
+    if audio.ndim > 1:
+        audio = audio.T
+    return audio, sr
+
+def _decode_ffmpeg(audio_path: str) -> Tuple[np.ndarray, int]:
+    """Decode through a local ffmpeg, which also downmixes and resamples to the target format"""
+    cmd = [
+        'ffmpeg', '-nostdin', '-v', 'error', '-i', audio_path,
+        '-f', 'f32le', '-acodec', 'pcm_f32le',
+        '-ac', str(config.CHANNELS), '-ar', str(config.SAMPLE_RATE), '-'
+    ]
+    proc = subprocess.run(cmd, capture_output=True, check=True)
+    return np.frombuffer(proc.stdout, dtype=np.float32), config.SAMPLE_RATE
+
+def _decode_librosa(audio_path: str) -> Tuple[np.ndarray, int]:
+    """Generic fallback through librosa (audioread for anything libsndfile rejects)"""
+    return librosa.load(audio_path, sr=None, mono=False)
+
+def _soundfile_supports(fmt: str) -> Callable[[], bool]:
+    return lambda: fmt.upper() in sf.available_formats()
+
+def _ffmpeg_available() -> bool:
+    return shutil.which('ffmpeg') is not None
+
+class DecoderRegistry:
+    """Per-format decoder chains, tried in priority order until one succeeds"""
+
+    def __init__(self):
+        self._decoders: Dict[Optional[str], List[Tuple[int, str, Decoder, Callable[[], bool]]]] = {}
+
+    def register(self, fmt: Optional[str], name: str, decoder: Decoder,
+                 priority: int = 0, available: Optional[Callable[[], bool]] = None):
+        """
+        Register a decoder
+
+        Args:
+            fmt: Format from SUPPORTED_FORMATS, or None for a catch-all fallback
+            name: Decoder name reported back to callers
+            decoder: Callable returning (audio, sample_rate)
+            priority: Higher runs first
+            available: Optional probe, checked at decode time, that disables the decoder
+        """
+        chain = self._decoders.setdefault(fmt, [])
+        chain.append((priority, name, decoder, available or (lambda: True)))
+        chain.sort(key=lambda entry: -entry[0])
+
+    def decoders_for(self, fmt: Optional[str]) -> List[Tuple[str, Decoder]]:
+        """Available decoders for a format, format-specific first, then catch-alls"""
+        chain = self._decoders.get(fmt, []) if fmt else []
+        chain = chain + self._decoders.get(None, [])
+        return [(name, decoder) for _, name, decoder, available in chain if available()]
+
+    def decode(self, audio_path: str, fmt: Optional[str] = None) -> Tuple[np.ndarray, int, str]:
+        """
+        Decode a file with the fastest decoder that can handle it
+
+        Args:
+            audio_path: Path to the audio file
+            fmt: Known format; sniffed from the file when omitted
+
+        Returns:
+            Tuple of (audio, sample_rate, decoder_name)
+        """
+        if fmt is None:
+            fmt = sniff_file(audio_path)
+
+        errors = []
+        for name, decoder in self.decoders_for(fmt):
+            try:
+                audio, sr = decoder(audio_path)
+                return audio, sr, name
+            except Exception as e:
+                errors.append(f"{name}: {e}")
+
+        raise RuntimeError(f"No decoder could read {fmt or 'unknown'} audio ({'; '.join(errors)})")
+
+decoders = DecoderRegistry()
+for _fmt in ('wav', 'flac', 'ogg'):
+    decoders.register(_fmt, 'soundfile', _decode_soundfile, priority=100)
+    decoders.register(_fmt, 'ffmpeg', _decode_ffmpeg, priority=50, available=_ffmpeg_available)
+decoders.register('mp3', 'soundfile', _decode_soundfile, priority=100, available=_soundfile_supports('mp3'))
+decoders.register('mp3', 'ffmpeg', _decode_ffmpeg, priority=50, available=_ffmpeg_available)
+decoders.register(None, 'librosa', _decode_librosa, priority=0)
 
 class AudioProcessor:
     """Handle audio file processing for Audio2Face"""
 
     @staticmethod
-    def load_and_preprocess(audio_path: str) -> tuple[np.ndarray, int]:
+    def load_and_preprocess(audio_path: str, fmt: Optional[str] = None,
+                            cancel_token: Optional[CancelToken] = None,
+                            on_decoded: Optional[Callable[[np.ndarray, int], None]] = None) -> tuple[np.ndarray, int]:
         """
         Load audio and convert to Audio2Face format:
         - 16kHz sample rate
         - Mono channel
         - 16-bit PCM
+
+        The container is sniffed from magic bytes unless fmt is given, and
+        decoded by the fastest registered decoder for it. cancel_token is
+        checked between stages; on_decoded(samples, sample_rate) is called
+        with the decoded audio before resampling (e.g. to report progress).
         """
         # Load audio
-        audio, sr = librosa.load(audio_path, sr=None, mono=False)
+        audio, sr, _ = decoders.decode(audio_path, fmt)
+        check(cancel_token, "resample")
+        if on_decoded:
+            on_decoded(audio, sr)
+
+        return AudioProcessor.preprocess(audio, sr, cancel_token), config.SAMPLE_RATE
 
+    @staticmethod
+    def preprocess(audio: np.ndarray, sr: int, cancel_token: Optional[CancelToken] = None,
+                   res_type: str = "soxr_hq") -> np.ndarray:
+        """Mono, 16kHz, peak-normalized float audio from decoded samples (res_type: librosa resampler)"""
         # Convert to mono if stereo
         if audio.ndim > 1:
             audio = librosa.to_mono(audio)
 
         # Resample to 16kHz if needed
         if sr != config.SAMPLE_RATE:
-            audio = librosa.resample(audio, orig_sr=sr, target_sr=config.SAMPLE_RATE)
+            audio = librosa.resample(audio, orig_sr=sr, target_sr=config.SAMPLE_RATE, res_type=res_type)
+            check(cancel_token, "normalize")
 
         # Normalize to [-1, 1]
         if np.max(np.abs(audio)) > 0:
             audio = audio / np.max(np.abs(audio))
 
-        return audio, config.SAMPLE_RATE
+        return audio
+
+    @staticmethod
+    def from_pcm(data: bytes, sample_format: str = 's16le', sample_rate: int = 16000,
+                 channels: int = 1) -> np.ndarray:
+        """
+        Preprocessed audio from raw interleaved PCM, without a container or temp file
+
+        Args:
+            data: Raw sample bytes
+            sample_format: Key of PCM_FORMATS
+            sample_rate: Sample rate of data
+            channels: Interleaved channel count
+
+        Returns:
+            Mono 16kHz float32 audio normalized to [-1, 1]
+        """
+        dtype = PCM_FORMATS[sample_format]
+        if len(data) % (dtype.itemsize * channels):
+            raise ValueError(f"Body length {len(data)} is not a whole number of {channels}-channel "
+                             f"{sample_format} frames")
+
+        samples = np.frombuffer(data, dtype=dtype)
+        if channels > 1:
+            # Average the interleaved channels
+            audio = samples.reshape(-1, channels).mean(axis=1, dtype=np.float32)
+        else:
+            audio = samples.astype(np.float32)
+
+        # Peak normalization also removes the int16 scale
+        return AudioProcessor.preprocess(audio, sample_rate)
 
     @staticmethod
     def save_processed(audio: np.ndarray, output_path: str):
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Startup Autotuner
+Benchmarks solver mode, inference worker count and numeric-library thread
+counts on synthetic clips, and remembers the fastest configuration per host
+fingerprint so later boots reuse it
+
+Only settings that leave the output unchanged are tuned: the window length
+(WINDOW_SECONDS) changes the blendshapes and stays as configured (measure
+its fidelity with bench_fidelity.py first). Each candidate is timed
+AUTOTUNE_REPEATS times and compared by its median; a value replaces the
+incumbent only when it is faster by at least AUTOTUNE_MIN_IMPROVEMENT.
+
+Usage:
+    python autotune.py            # Tune (or show the cached result) for this host
+    python autotune.py --force    # Re-tune even if a cached result exists
+    python autotune.py --stand-in # Tune against the CPU stand-in binding
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import platform
+import argparse
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import config
+from a2f_wrapper import Audio2FaceSDK
+from scheduler import InferenceScheduler
+from thread_budget import apply_thread_limits
+
+# Dimensions are tuned one at a time, in this order, starting from the defaults
+DIMENSIONS = ('use_gpu_solver', 'inference_workers', 'blas_threads', 'numba_threads')
+
+def default_settings() -> Dict:
+    """Settings from config.py, used when autotuning is off or has no result"""
+    return {
+        'use_gpu_solver': config.USE_GPU_SOLVER,
+        'inference_workers': config.INFERENCE_WORKERS,
+        'window_seconds': config.WINDOW_SECONDS,
+        'blas_threads': None,
+        'numba_threads': None
+    }
+
+def _gpu_name() -> str:
+    try:
+        proc = subprocess.run(['nvidia-smi', '--query-gpu=name,driver_version', '--format=csv,noheader'],
+                              capture_output=True, text=True, timeout=5)
+        return proc.stdout.strip()
+    except Exception:
+        return ""
+
+def _cpu_model() -> str:
+    try:
+        for line in Path('/proc/cpuinfo').read_text().splitlines():
+            if line.startswith('model name'):
+                return line.split(':', 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor()
+
+def host_fingerprint(binding_name: str = "audio2face_py") -> str:
+    """Hash of everything that changes which configuration is fastest"""
+    model_json = config.MODEL_PATH / "model.json"
+    model_stamp = ""
+    if model_json.exists():
+        stat = model_json.stat()
+        model_stamp = f"{stat.st_size}:{int(stat.st_mtime)}"
+
+    # No hostname: containers get a new one on every start, and the hardware,
+    # model and software below are what decide the fastest configuration
+    parts = [
+        platform.machine(), _cpu_model(), str(os.cpu_count()),
+        _gpu_name(), str(config.MODEL_PATH), model_stamp, binding_name,
+        platform.python_version()
+    ]
+    return hashlib.sha256("|".join(parts).encode('utf-8')).hexdigest()[:16]
+
+def search_space() -> Dict[str, List]:
+    """Candidate values per dimension, limited to what this host can apply"""
+    cores = os.cpu_count() or 1
+    thread_counts = sorted({1, max(1, cores // 2), cores})
+
+    space = {
+        'use_gpu_solver': [False, True],
+        'inference_workers': [n for n in (1, 2, 4) if n <= cores],
+        'blas_threads': [None],
+        'numba_threads': [None]
+    }
+    try:
+        import threadpoolctl  # noqa: F401
+        space['blas_threads'] = [None] + thread_counts
+    except ImportError:
+        pass
+    try:
+        import numba
+        space['numba_threads'] = [None] + [n for n in thread_counts if n <= numba.config.NUMBA_NUM_THREADS]
+    except ImportError:
+        pass
+    return space
+
+def synthetic_clips(seed: int = 0) -> List[np.ndarray]:
+    """Speech-like clips with the mix of lengths we serve: many short, a few long"""
+    rng = np.random.default_rng(seed)
+    clips = []
+    for duration in (2.0, 2.0, 2.0, 2.0, 6.0, 6.0, 45.0):
+        t = np.arange(int(duration * config.SAMPLE_RATE)) / config.SAMPLE_RATE
+        pitch = 120 + 40 * np.sin(2 * np.pi * 0.7 * t)
+        voiced = np.sin(2 * np.pi * np.cumsum(pitch) / config.SAMPLE_RATE)
+        syllables = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t + rng.uniform(0, np.pi))
+        audio = voiced * syllables + 0.05 * rng.standard_normal(len(t))
+        clips.append((audio / np.max(np.abs(audio))).astype(np.float32))
+    return clips
+
+def build_workers(settings: Dict, binding=None) -> List[Audio2FaceSDK]:
+    """One Audio2FaceSDK per inference worker"""
+    return [
+        Audio2FaceSDK(use_gpu_solver=settings['use_gpu_solver'], binding=binding,
+                      window_seconds=settings['window_seconds'],
+                      window_context_seconds=config.WINDOW_CONTEXT_SECONDS,
+                      model_path=settings.get('model_path'))
+        for _ in range(settings['inference_workers'])
+    ]
+
+def benchmark(settings: Dict, clips: List[np.ndarray], binding=None, repeats: int = 1) -> Dict:
+    """Run every clip through a scheduler built from the settings, repeats times; report median throughput"""
+    report = {'settings': dict(settings)}
+    scheduler = None
+    try:
+        apply_thread_limits(settings['blas_threads'], settings['numba_threads'])
+        workers = build_workers(settings, binding)
+        scheduler = InferenceScheduler([sdk.process_audio for sdk in workers], config.SAMPLE_RATE,
+                                       max_queued_seconds=float('inf'))
+
+        # Warm-up outside the timed region
+        scheduler.submit(clips[0]).result()
+
+        runs = []
+        for _ in range(max(1, repeats)):
+            start = time.perf_counter()
+            for future in [scheduler.submit(clip) for clip in clips]:
+                future.result()
+            runs.append(time.perf_counter() - start)
+        elapsed = float(np.median(runs))
+
+        audio_seconds = sum(len(clip) for clip in clips) / config.SAMPLE_RATE
+        report.update({
+            'seconds': round(elapsed, 4),
+            'runs': [round(run, 4) for run in runs],
+            'audio_seconds_per_second': round(audio_seconds / elapsed, 2),
+            'real_time_factor': round(elapsed / audio_seconds, 5)
+        })
+    except Exception as e:
+        report['error'] = str(e)
+    finally:
+        if scheduler:
+            scheduler.shutdown()
+    return report
+
+def tune(binding=None, verbose: bool = True) -> Dict:
+    """
+    Coordinate search: sweep one dimension at a time, starting with the
+    incumbent value, and switch only to a value whose median time beats it by
+    config.AUTOTUNE_MIN_IMPROVEMENT (differences within noise keep the default)
+
+    Returns:
+        Dictionary with the best settings and every candidate's report
+    """
+    clips = synthetic_clips()
+    space = search_space()
+    best = default_settings()
+    reports = []
+    measured = {}
+
+    for dimension in DIMENSIONS:
+        if len(space[dimension]) < 2:
+            continue
+        incumbent = best[dimension]
+        values = [incumbent] + [value for value in space[dimension] if value != incumbent]
+        best_seconds = None
+        for value in values:
+            candidate = {**best, dimension: value}
+            key = json.dumps(candidate, sort_keys=True)
+            if key not in measured:
+                measured[key] = benchmark(candidate, clips, binding, config.AUTOTUNE_REPEATS)
+                reports.append(measured[key])
+                if verbose:
+                    print_report(measured[key])
+            report = measured[key]
+            if 'error' in report:
+                continue
+            if best_seconds is None or report['seconds'] < best_seconds * (1 - config.AUTOTUNE_MIN_IMPROVEMENT):
+                best_seconds = report['seconds']
+                best = candidate
+
+    apply_thread_limits(best['blas_threads'], best['numba_threads'])
+    return {'settings': best, 'candidates': reports, 'tuned_at': time.time()}
+
+def load_or_tune(binding=None, force: bool = False, cache_path: Optional[Path] = None,
+                 verbose: bool = True) -> Dict:
+    """
+    Reuse this host's cached result, or tune and persist a new one
+
+    Returns:
+        Dictionary with settings, candidates, tuned_at, fingerprint and cached flag
+    """
+    cache_path = Path(cache_path or config.AUTOTUNE_CACHE)
+    binding_name = getattr(binding, '__name__', type(binding).__name__) if binding else "audio2face_py"
+    fingerprint = host_fingerprint(binding_name)
+
+    cache = {}
+    if cache_path.exists():
+        try:
+            cache = json.loads(cache_path.read_text())
+        except json.JSONDecodeError:
+            cache = {}
+
+    if not force and fingerprint in cache:
+        # The window length is never tuned; older entries may still carry one
+        entry = {**cache[fingerprint], 'settings': {**cache[fingerprint]['settings'],
+                                                    'window_seconds': config.WINDOW_SECONDS}}
+        apply_thread_limits(entry['settings']['blas_threads'], entry['settings']['numba_threads'])
+        if verbose:
+            print(f"✓ Reusing autotuned configuration for host {fingerprint}: {entry['settings']}")
+        return {**entry, 'fingerprint': fingerprint, 'cached': True}
+
+    if verbose:
+        print(f"🔧 Autotuning inference configuration for host {fingerprint}...")
+    entry = tune(binding, verbose)
+    cache[fingerprint] = entry
+
+    partial = cache_path.with_suffix('.partial')
+    partial.write_text(json.dumps(cache, indent=2))
+    os.replace(partial, cache_path)
+
+    if verbose:
+        print(f"✓ Autotuned configuration: {entry['settings']}")
+    return {**entry, 'fingerprint': fingerprint, 'cached': False}
+
+def print_report(report: Dict):
+    """One line per candidate"""
+    settings = report['settings']
+    label = (f"solver={'gpu' if settings['use_gpu_solver'] else 'cpu'} "
+             f"workers={settings['inference_workers']} window={settings['window_seconds']:g}s "
+             f"blas={settings['blas_threads'] or '-'} numba={settings['numba_threads'] or '-'}")
+    if 'error' in report:
+        print(f"  ✗ {label}: {report['error']}")
+    else:
+        print(f"  {label}: {report['seconds']:.3f}s "
+              f"({report['audio_seconds_per_second']:.1f} audio-s/s, RTF {report['real_time_factor']:.4f})")
+
+def main():
+    parser = argparse.ArgumentParser(description="Autotune Audio2Face inference configuration for this host")
+    parser.add_argument("--force", action="store_true", help="Re-tune even if a cached result exists")
+    parser.add_argument("--stand-in", action="store_true", help="Use the CPU stand-in binding")
+    args = parser.parse_args()
+
+    binding = None
+    if args.stand_in:
+        import stand_in_binding
+        binding = stand_in_binding
+        # Stable path, so the host fingerprint (and the cache) survive reruns
+        stand_in_binding.use_placeholder_model(config.TEMP_DIR / "stand-in-model")
+
+    result = load_or_tune(binding, force=args.force)
+    if result['cached']:
+        print("\nCandidates from the cached run:")
+        for report in result['candidates']:
+            print_report(report)
+    sys.exit(0)
+
+if __name__ == "__main__":
+    main()
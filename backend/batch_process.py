@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Offline Bulk Processing
+Runs a directory or manifest of audio files through AudioProcessor and
+Audio2FaceSDK on a process pool, without the HTTP server
+
+Each input produces a compressed .npz (blendshapes, timestamps, fps, duration)
+under the output directory, mirroring the input layout and keeping the
+original suffix (a.wav -> a.wav.npz, so a.wav and a.mp3 never collide), and
+a line in index.jsonl. Files whose .npz already exists are skipped, so an interrupted
+run can simply be restarted.
+
+Usage:
+    python batch_process.py INPUT_DIR_OR_MANIFEST OUTPUT_DIR [--workers N]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from audio_utils import AudioProcessor, SUPPORTED_FORMATS
+
+INDEX_NAME = "index.jsonl"
+
+# Per-worker state, created once by _init_worker
+_sdk = None
+
+def discover_inputs(source: Path) -> List[Path]:
+    """List audio files under a directory, or read them from a manifest (one path per line)"""
+    if source.is_dir():
+        return sorted(
+            path for path in source.rglob("*")
+            if path.is_file() and path.suffix.lower().lstrip('.') in SUPPORTED_FORMATS
+        )
+
+    inputs = []
+    for line in source.read_text().splitlines():
+        line = line.strip()
+        if line and not line.startswith('#'):
+            path = Path(line)
+            inputs.append(path if path.is_absolute() else source.parent / path)
+    return inputs
+
+def plan_outputs(inputs: List[Path], output_dir: Path) -> List[Tuple[Path, Path]]:
+    """Map every input to an .npz path that mirrors its location relative to the common root"""
+    # A manifest may list the same file twice; it is processed once
+    resolved = list(dict.fromkeys(path.resolve() for path in inputs))
+    root = Path(os.path.commonpath([path.parent for path in resolved])) if resolved else Path('.')
+    plan = []
+    for path in resolved:
+        relative = path.relative_to(root)
+        plan.append((path, output_dir / relative.with_name(relative.name + '.npz')))
+    return plan
+
+def load_index(output_dir: Path) -> Dict[str, Dict]:
+    """Latest index record per source"""
+    records = {}
+    index_path = output_dir / INDEX_NAME
+    if index_path.exists():
+        for line in index_path.read_text().splitlines():
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Torn last line from a crash
+            records[record['source']] = record
+    return records
+
+def recover_record(source: Path, output: Path) -> Dict:
+    """Rebuild an index record from a finished .npz that never made it into the index"""
+    with np.load(output) as data:
+        return {
+            'source': str(source),
+            'output': str(output),
+            'status': 'ok',
+            'num_frames': int(data['blendshapes'].shape[0]),
+            'fps': float(data['fps']),
+            'duration': float(data['duration']),
+        }
+
+def _init_worker(character_index: int, use_gpu_solver: bool):
+    """Load the model once per worker process"""
+    global _sdk
+    try:
+        from cuda_init_fix import initialize_cuda_driver, initialize_cuda_runtime, preload_cuda_libraries
+        preload_cuda_libraries()
+        initialize_cuda_driver()
+        initialize_cuda_runtime()
+    except Exception as e:
+        print(f"⚠ CUDA pre-initialization failed in worker {os.getpid()}: {e}")
+
+    from a2f_wrapper import Audio2FaceSDK
+    _sdk = Audio2FaceSDK(character_index=character_index, use_gpu_solver=use_gpu_solver)
+
+def _process_file(source: Path, output: Path) -> Dict:
+    """Decode, infer and write one file (runs in a worker)"""
+    record = {'source': str(source), 'output': str(output), 'worker': os.getpid()}
+    try:
+        start = time.perf_counter()
+        audio, sr = AudioProcessor.load_and_preprocess(str(source))
+        decoded = time.perf_counter()
+        result = _sdk.process_audio(audio)
+        inferred = time.perf_counter()
+
+        duration = AudioProcessor.get_duration(audio, sr)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        partial = output.with_name(output.name[:-len('.npz')] + '.partial.npz')
+        np.savez_compressed(
+            partial,
+            blendshapes=np.asarray(result['blendshapes'], dtype=np.float32),
+            timestamps=np.asarray(result['timestamps'], dtype=np.float32),
+            fps=result['fps'],
+            duration=duration
+        )
+        os.replace(partial, output)  # Atomic: a present .npz is always complete
+
+        record.update({
+            'status': 'ok',
+            'num_frames': int(result['num_frames']),
+            'fps': float(result['fps']),
+            'duration': duration,
+            'decode_s': decoded - start,
+            'infer_s': inferred - decoded,
+            'total_s': time.perf_counter() - start,
+        })
+    except Exception as e:
+        record.update({'status': 'error', 'error': str(e)})
+    return record
+
+def run(source: Path, output_dir: Path, workers: int, character_index: int = 0,
+        use_gpu_solver: bool = False) -> Dict:
+    """Process every pending input and return the run summary"""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    jobs = plan_outputs(discover_inputs(source), output_dir)
+    index = load_index(output_dir)
+
+    pending = []
+    skipped = 0
+    with open(output_dir / INDEX_NAME, 'a') as index_file:
+        for src, out in jobs:
+            if out.exists():
+                skipped += 1
+                if index.get(str(src), {}).get('status') != 'ok':
+                    index_file.write(json.dumps(recover_record(src, out)) + "\n")
+            else:
+                pending.append((src, out))
+
+    print("=" * 60)
+    print(f"Bulk processing: {len(jobs)} file(s), {skipped} already done, {len(pending)} pending")
+    print(f"Workers: {workers}  Output: {output_dir}")
+    print("=" * 60)
+
+    summary = {'total': len(jobs), 'skipped': skipped, 'ok': 0, 'failed': 0,
+               'audio_seconds': 0.0, 'wall_seconds': 0.0}
+    if not pending:
+        return summary
+
+    start = time.perf_counter()
+    # spawn: each worker owns its own CUDA context
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker,
+                             initargs=(character_index, use_gpu_solver)) as pool, \
+            open(output_dir / INDEX_NAME, 'a') as index_file:
+        futures = [pool.submit(_process_file, src, out) for src, out in pending]
+        for done, future in enumerate(as_completed(futures), start=1):
+            try:
+                record = future.result()
+            except BrokenProcessPool:
+                # Workers died, typically in _init_worker (model or CUDA failed to load);
+                # nothing further can run, and unfinished files stay pending for a re-run
+                summary['failed'] += len(pending) - done + 1
+                print(f"✗ Worker processes failed (could not load the model?); "
+                      f"{len(pending) - done + 1} file(s) left unprocessed")
+                break
+            index_file.write(json.dumps(record) + "\n")
+            index_file.flush()
+
+            if record['status'] == 'ok':
+                summary['ok'] += 1
+                summary['audio_seconds'] += record['duration']
+                rtf = record['total_s'] / record['duration'] if record['duration'] else 0.0
+                print(f"✓ [{done}/{len(pending)}] {record['source']} "
+                      f"({record['num_frames']} frames, RTF {rtf:.3f})")
+            else:
+                summary['failed'] += 1
+                print(f"✗ [{done}/{len(pending)}] {record['source']}: {record['error']}")
+
+    summary['wall_seconds'] = time.perf_counter() - start
+    return summary
+
+def print_summary(summary: Dict):
+    """Print throughput and real-time factor for the run"""
+    wall = summary['wall_seconds']
+    audio = summary['audio_seconds']
+    print("\n" + "=" * 60)
+    print("Bulk Processing Summary")
+    print("=" * 60)
+    print(f"Processed: {summary['ok']}")
+    print(f"Failed:    {summary['failed']}")
+    print(f"Skipped:   {summary['skipped']}")
+    if wall > 0:
+        print(f"Wall time: {wall:.1f}s")
+        print(f"Throughput: {summary['ok'] / wall:.2f} files/s, {audio / wall:.1f} audio-s/s")
+        if audio > 0:
+            print(f"Real-time factor: {wall / audio:.4f} ({audio / wall:.1f}x realtime)")
+    print("=" * 60)
+
+def main():
+    parser = argparse.ArgumentParser(description="Process audio files offline into blendshape .npz files")
+    parser.add_argument("source", type=Path, help="Directory to walk, or manifest file with one path per line")
+    parser.add_argument("output_dir", type=Path, help="Directory for .npz outputs and index.jsonl")
+    parser.add_argument("--workers", type=int, default=2, help="Worker processes, each loading one model (default: 2)")
+    parser.add_argument("--character", type=int, default=0, help="Character index (0=Claire, 1=James, 2=Mark)")
+    parser.add_argument("--gpu-solver", action="store_true", help="Use the GPU blendshape solver")
+    args = parser.parse_args()
+
+    if not args.source.exists():
+        print(f"✗ Input not found: {args.source}")
+        sys.exit(1)
+
+    summary = run(args.source, args.output_dir, args.workers, args.character, args.gpu_solver)
+    print_summary(summary)
+    sys.exit(1 if summary['failed'] else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark micro-batched inference against one-clip-per-call
+Uses the stand-in binding (fixed per-call cost), so it runs on CPU
+Usage: python bench_batching.py [num_clips] [clip_seconds]
+"""
+import sys
+import time
+import tempfile
+
+import numpy as np
+
+import stand_in_binding
+from config import config
+from a2f_wrapper import Audio2FaceSDK
+from scheduler import InferenceScheduler
+
+def run(sdk: Audio2FaceSDK, clips, max_batch_size: int) -> float:
+    """Submit every clip at once and time until all are done"""
+    infer_batch = sdk.process_batch if max_batch_size > 1 else None
+    scheduler = InferenceScheduler(sdk.process_audio, config.SAMPLE_RATE, infer_batch=infer_batch,
+                                   max_batch_size=max_batch_size, batch_window=0.005,
+                                   max_queued_seconds=float('inf'))
+    start = time.perf_counter()
+    futures = [scheduler.submit(clip) for clip in clips]
+    results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+
+    # Per-clip outputs must stay separate and match their own input
+    for clip, result in zip(clips, results):
+        assert result['num_frames'] == int(len(clip) / config.SAMPLE_RATE * config.FPS)
+        assert len(result['timestamps']) == result['num_frames']
+    return elapsed
+
+def main():
+    num_clips = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    clip_seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 1.5
+
+    with tempfile.TemporaryDirectory() as tmp:
+        stand_in_binding.use_placeholder_model(tmp)
+
+        rng = np.random.default_rng(0)
+        clips = [
+            (rng.standard_normal(int(config.SAMPLE_RATE * clip_seconds * rng.uniform(0.5, 1.5))) * 0.1).astype(np.float32)
+            for _ in range(num_clips)
+        ]
+        audio_seconds = sum(len(clip) for clip in clips) / config.SAMPLE_RATE
+
+        print("=" * 60)
+        print(f"Batching Benchmark ({num_clips} clips, {audio_seconds:.1f}s of audio, stand-in binding)")
+        print("=" * 60)
+        print(f"{'mode':<28}{'batch':>6}{'seconds':>10}{'clips/s':>10}{'speedup':>9}")
+
+        native = Audio2FaceSDK(binding=stand_in_binding.BatchBinding)
+        fallback = Audio2FaceSDK(binding=stand_in_binding)
+
+        baseline = None
+        for label, sdk, batch_sizes in (("one clip per call", native, [1]),
+                                         ("per-clip fallback", fallback, [8]),
+                                         ("native batching", native, [4, 8, 16])):
+            for batch_size in batch_sizes:
+                elapsed = run(sdk, clips, batch_size)
+                baseline = baseline or elapsed
+                print(f"{label:<28}{batch_size:>6}{elapsed:>10.2f}"
+                      f"{num_clips / elapsed:>10.1f}{baseline / elapsed:>8.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Benchmark decode throughput per format and decoder
+Usage: python bench_decoders.py [duration_seconds] [repeats]
+"""
+import sys
+import time
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+from audio_utils import decoders, sniff_file, _ffmpeg_available
+
+def make_clip(duration: float, sample_rate: int = 44100) -> np.ndarray:
+    """Stereo speech-like test signal"""
+    t = np.arange(int(duration * sample_rate)) / sample_rate
+    mono = 0.3 * np.sin(2 * np.pi * 200 * t) + 0.1 * np.sin(2 * np.pi * 800 * t)
+    mono *= 0.5 + 0.5 * np.sin(2 * np.pi * 5 * t)
+    return np.stack([mono, mono * 0.8], axis=1).astype(np.float32)
+
+def write_clips(directory: Path, audio: np.ndarray, sample_rate: int) -> dict:
+    """Write the clip in every format we can produce locally"""
+    clips = {}
+    for fmt, subtype in (('wav', 'PCM_16'), ('flac', 'PCM_16'), ('ogg', 'VORBIS')):
+        path = directory / f"clip.{fmt}"
+        sf.write(path, audio, sample_rate, subtype=subtype)
+        clips[fmt] = path
+
+    mp3_path = directory / "clip.mp3"
+    if 'MP3' in sf.available_formats():
+        try:
+            sf.write(mp3_path, audio, sample_rate, format='MP3', subtype='MPEG_LAYER_III')
+            clips['mp3'] = mp3_path
+        except Exception:
+            pass
+    if 'mp3' not in clips and _ffmpeg_available():
+        import subprocess
+        subprocess.run(['ffmpeg', '-y', '-v', 'error', '-i', str(clips['wav']), str(mp3_path)], check=True)
+        clips['mp3'] = mp3_path
+    return clips
+
+def bench(decoder, path: Path, repeats: int) -> float:
+    """Best-of-N wall time for one decode"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        decoder(str(path))
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 30.0
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    print("=" * 60)
+    print(f"Decoder Benchmark ({duration:.0f}s stereo clip, best of {repeats})")
+    print("=" * 60)
+    print(f"ffmpeg available: {_ffmpeg_available()}\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        clips = write_clips(Path(tmp), make_clip(duration), 44100)
+
+        print(f"{'format':<8}{'decoder':<12}{'ms':>10}{'x realtime':>14}{'MB/s':>10}")
+        for fmt, path in clips.items():
+            assert sniff_file(str(path)) == fmt, f"sniffing failed for {fmt}"
+            size_mb = path.stat().st_size / (1024 * 1024)
+            for name, decoder in decoders.decoders_for(fmt):
+                try:
+                    seconds = bench(decoder, path, repeats)
+                except Exception as e:
+                    print(f"{fmt:<8}{name:<12}{'failed':>10}  ({e})")
+                    continue
+                print(f"{fmt:<8}{name:<12}{seconds * 1000:>10.1f}"
+                      f"{duration / seconds:>14.0f}{size_mb / seconds:>10.1f}")
+
+if __name__ == "__main__":
+    main()
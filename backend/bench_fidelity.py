@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Evaluate fidelity against speed for fast processing modes
+Runs every clip of a corpus through the reference pipeline
+(AudioProcessor.load_and_preprocess plus a whole-clip
+Audio2FaceSDK.process_audio) and through each alternative mode, and reports
+per-channel error, lip-closure timing drift and speedup. The JSON report is
+machine-readable; with --budgets, modes outside their accuracy budget are
+flagged and the exit status is 1.
+
+Without a corpus directory, synthetic 44.1kHz speech-like clips with pauses
+are used. --stand-in runs on CPU with the stand-in binding (its outputs are
+deterministic, so errors are meaningful relative to each other, not to the
+real model).
+
+Budgets file: {"<mode>" or "*": {"max_mae": 0.01, "max_error": 0.1,
+"max_lip_drift_ms": 34, "max_missed_closures": 0, "min_speedup": 1.0}}
+
+Usage: python bench_fidelity.py [corpus_dir] [--stand-in] [--modes a,b]
+                                [--repeats N] [--report fidelity.json]
+                                [--budgets budgets.json]
+"""
+import sys
+import json
+import time
+import argparse
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import librosa
+import soundfile as sf
+
+from config import config
+from audio_utils import AudioProcessor, SUPPORTED_FORMATS, decoders
+from a2f_wrapper import Audio2FaceSDK
+from gltf_export import PRECISIONS
+from projection import CHANNEL_GROUPS
+
+# A closure starts when jawOpen falls below this fraction of its range in the reference
+LIP_CLOSURE_LEVEL = 0.2
+# Closures further apart than this are not the same event
+LIP_MATCH_SECONDS = 0.2
+# Pauses at least this long are skipped by skip_silence (shorter ones are inferred)
+SILENCE_MIN_SECONDS = 0.5
+SILENCE_TOP_DB = 40
+
+class Clip:
+    """One corpus entry and its reference output"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.name = path.name
+        self.reference: Optional[np.ndarray] = None
+        self.reference_seconds = 0.0
+        self.audio_seconds = 0.0
+
+def synthetic_corpus(directory: Path, seed: int = 0) -> List[Path]:
+    """Stereo 44.1kHz speech-like clips with syllables and pauses, written as WAV"""
+    rng = np.random.default_rng(seed)
+    sr = 44100
+    paths = []
+    for index, duration in enumerate((2.0, 4.0, 8.0, 20.0)):
+        t = np.arange(int(duration * sr)) / sr
+        pitch = 120 + 40 * np.sin(2 * np.pi * 0.7 * t)
+        voiced = np.sin(2 * np.pi * np.cumsum(pitch) / sr) + 0.3 * np.sin(4 * np.pi * np.cumsum(pitch) / sr)
+        syllables = np.clip(np.sin(2 * np.pi * rng.uniform(3, 5) * t + rng.uniform(0, np.pi)), 0, None)
+        # Pauses between phrases
+        phrases = (np.sin(2 * np.pi * 0.25 * t + rng.uniform(0, np.pi)) > -0.6).astype(np.float64)
+        mono = voiced * syllables * phrases + 0.01 * rng.standard_normal(len(t)) * phrases
+        audio = np.stack([mono, 0.9 * mono], axis=1) / np.max(np.abs(mono))
+        path = directory / f"synthetic_{index}_{duration:g}s.wav"
+        sf.write(path, audio.astype(np.float32), sr, subtype='PCM_16')
+        paths.append(path)
+    return paths
+
+def load_corpus(directory: Optional[str], scratch: Path) -> List[Path]:
+    if directory is None:
+        return synthetic_corpus(scratch)
+    paths = sorted(p for p in Path(directory).iterdir() if p.suffix.lower().lstrip('.') in SUPPORTED_FORMATS)
+    if not paths:
+        raise SystemExit(f"No audio files ({', '.join(SUPPORTED_FORMATS)}) in {directory}")
+    return paths
+
+def timed(fn: Callable, repeats: int):
+    """(result of the last run, fastest run in seconds)"""
+    best, result = float('inf'), None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+def reference(sdk: Audio2FaceSDK, path: Path) -> np.ndarray:
+    audio, _ = AudioProcessor.load_and_preprocess(str(path))
+    return sdk.process_audio(audio, window_seconds=0.0)['blendshapes']
+
+def resampled_with(res_type: str):
+    def run(sdk: Audio2FaceSDK, path: Path) -> np.ndarray:
+        audio, sr, _ = decoders.decode(str(path))
+        audio = AudioProcessor.preprocess(audio, sr, res_type=res_type)
+        return sdk.process_audio(audio, window_seconds=0.0)['blendshapes']
+    return run
+
+def windowed(seconds: float):
+    def run(sdk: Audio2FaceSDK, path: Path) -> np.ndarray:
+        audio, _ = AudioProcessor.load_and_preprocess(str(path))
+        return sdk.process_audio(audio, window_seconds=seconds)['blendshapes']
+    return run
+
+def skip_silence(sdk: Audio2FaceSDK, path: Path) -> np.ndarray:
+    """Infer only the voiced spans (with context); pauses get the model's pose for silence"""
+    audio, _ = AudioProcessor.load_and_preprocess(str(path))
+    sr, fps = config.SAMPLE_RATE, sdk.fps
+    num_frames = int(len(audio) / sr * fps)
+    spans = librosa.effects.split(audio, top_db=SILENCE_TOP_DB)
+
+    # Merge spans separated by short pauses
+    merged: List[List[int]] = []
+    for start, end in spans:
+        if merged and start - merged[-1][1] < SILENCE_MIN_SECONDS * sr:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+
+    rest = sdk.process_audio(np.zeros(sr, dtype=np.float32), window_seconds=0.0)['blendshapes']
+    frames = np.repeat(rest[len(rest) // 2:len(rest) // 2 + 1], num_frames, axis=0)
+    context = int(sdk.window_context_seconds * sr)
+    for start, end in merged:
+        lo, hi = max(0, start - context), min(len(audio), end + context)
+        output = sdk.process_audio(audio[lo:hi], window_seconds=0.0)['blendshapes']
+        first = int(round(lo * fps / sr))
+        keep_from, keep_to = int(round(start * fps / sr)), min(num_frames, int(round(end * fps / sr)))
+        rows = output[keep_from - first:keep_to - first]
+        frames[keep_from:keep_from + len(rows)] = rows
+    return frames
+
+def quantized(precision: str):
+    """Output as glTF sampler values at the given precision, decoded back to floats"""
+    _, dtype, scale = PRECISIONS[precision]
+
+    def transform(frames: np.ndarray) -> np.ndarray:
+        return np.round(np.clip(frames, 0.0, 1.0) * scale).astype(dtype).astype(np.float32) / scale
+    return transform
+
+def float16(frames: np.ndarray) -> np.ndarray:
+    return frames.astype(np.float16).astype(np.float32)
+
+def smoothed(width: int):
+    """Centered moving average over width frames"""
+    def transform(frames: np.ndarray) -> np.ndarray:
+        padded = np.pad(frames, ((width // 2, width - 1 - width // 2), (0, 0)), mode='edge')
+        kernel = np.ones(width) / width
+        return np.stack([np.convolve(padded[:, i], kernel, mode='valid') for i in range(frames.shape[1])], axis=1)
+    return transform
+
+# name -> (description, kind, function): 'pipeline' modes re-run decode and
+# inference; 'output' modes post-process the reference frames, and their time
+# is the reference pipeline's plus the transform's
+MODES: Dict[str, Tuple[str, str, Callable]] = {
+    'float16': ("float16 blendshape values", 'output', float16),
+    'gltf_ushort': ("glTF ushort-normalized sampler output", 'output', quantized('ushort')),
+    'gltf_ubyte': ("glTF ubyte-normalized sampler output", 'output', quantized('ubyte')),
+    'resample_soxr_qq': ("quick soxr resampling", 'pipeline', resampled_with('soxr_qq')),
+    'resample_polyphase': ("polyphase resampling", 'pipeline', resampled_with('polyphase')),
+    'windowed_5s': ("5s inference windows (stream default)", 'pipeline', windowed(5.0)),
+    'windowed_10s': ("10s inference windows", 'pipeline', windowed(10.0)),
+    'skip_silence': ("inference on voiced spans only", 'pipeline', skip_silence),
+    'smooth_3': ("3-frame moving average", 'output', smoothed(3)),
+}
+
+def closure_onsets(frames: np.ndarray, jaw: int, level: float) -> np.ndarray:
+    """Frame indices where jawOpen drops below level"""
+    closed = frames[:, jaw] < level
+    return np.flatnonzero(closed[1:] & ~closed[:-1]) + 1
+
+def lip_drift(reference_frames: np.ndarray, frames: np.ndarray, names: List[str], fps: int) -> Dict:
+    """Timing of lip closures against the reference: matched drift, missed and extra closures"""
+    if 'jawOpen' not in names or not len(reference_frames):
+        return {}
+    jaw = names.index('jawOpen')
+    low, high = reference_frames[:, jaw].min(), reference_frames[:, jaw].max()
+    level = low + LIP_CLOSURE_LEVEL * (high - low)
+    expected, found = closure_onsets(reference_frames, jaw, level), closure_onsets(frames, jaw, level)
+
+    drifts, matched = [], set()
+    for onset in expected:
+        if len(found):
+            nearest = int(np.argmin(np.abs(found - onset)))
+            if abs(found[nearest] - onset) <= LIP_MATCH_SECONDS * fps and nearest not in matched:
+                matched.add(nearest)
+                drifts.append(abs(int(found[nearest]) - int(onset)) * 1000 / fps)
+    return {
+        'closures': len(expected),
+        'drifts_ms': drifts,
+        'missed_closures': len(expected) - len(drifts),
+        'extra_closures': len(found) - len(matched)
+    }
+
+def compare(reference_frames: np.ndarray, frames: np.ndarray, names: List[str], fps: int) -> Dict:
+    """Per-channel and overall error of frames against the reference"""
+    n = min(len(reference_frames), len(frames))
+    error = np.abs(frames[:n].astype(np.float64) - reference_frames[:n])
+    lipsync = [i for i, name in enumerate(names) if name.startswith(CHANNEL_GROUPS['lipsync'])]
+    return {
+        'frames': n,
+        'frame_count_delta': len(frames) - len(reference_frames),
+        'abs_error_sum': error.sum(axis=0),
+        'squared_error_sum': (error ** 2).sum(axis=0),
+        'max_error': error.max(axis=0) if n else np.zeros(len(names)),
+        'lipsync_channels': lipsync,
+        'lip': lip_drift(reference_frames[:n], frames[:n], names, fps)
+    }
+
+def summarize(description: str, clips: List[Clip], results: List[Dict], seconds: List[float],
+              names: List[str]) -> Dict:
+    """Aggregate per-clip comparisons into one mode entry of the report"""
+    frames = sum(r['frames'] for r in results)
+    abs_sum = sum(r['abs_error_sum'] for r in results)
+    sq_sum = sum(r['squared_error_sum'] for r in results)
+    max_error = np.max([r['max_error'] for r in results], axis=0)
+    mae = abs_sum / max(1, frames)
+    lipsync = results[0]['lipsync_channels']
+    drifts = [d for r in results for d in r['lip'].get('drifts_ms', [])]
+    reference_seconds = sum(clip.reference_seconds for clip in clips)
+
+    return {
+        'description': description,
+        'summary': {
+            'mae': float(mae.mean()),
+            'rmse': float(np.sqrt(sq_sum.sum() / max(1, frames * len(names)))),
+            'max_error': float(max_error.max()),
+            'worst_channel': names[int(np.argmax(mae))],
+            'lipsync_mae': float(mae[lipsync].mean()) if lipsync else None,
+            'lip_closures': sum(r['lip'].get('closures', 0) for r in results),
+            'mean_lip_drift_ms': float(np.mean(drifts)) if drifts else 0.0,
+            'max_lip_drift_ms': float(np.max(drifts)) if drifts else 0.0,
+            'missed_closures': sum(r['lip'].get('missed_closures', 0) for r in results),
+            'extra_closures': sum(r['lip'].get('extra_closures', 0) for r in results),
+            'frame_count_delta': sum(abs(r['frame_count_delta']) for r in results),
+            'seconds': sum(seconds),
+            'speedup': reference_seconds / sum(seconds) if sum(seconds) else None
+        },
+        'per_channel': {
+            channel: {'mae': float(mae[i]), 'max_error': float(max_error[i])}
+            for i, channel in enumerate(names)
+        },
+        'clips': [
+            {
+                'clip': clip.name,
+                'mae': float(r['abs_error_sum'].sum() / max(1, r['frames'] * len(names))),
+                'max_error': float(r['max_error'].max()) if r['frames'] else 0.0,
+                'max_lip_drift_ms': float(max(r['lip'].get('drifts_ms') or [0.0])),
+                'missed_closures': r['lip'].get('missed_closures', 0),
+                'seconds': s,
+                'speedup': clip.reference_seconds / s if s else None
+            }
+            for clip, r, s in zip(clips, results, seconds)
+        ]
+    }
+
+def check_budget(summary: Dict, budget: Dict) -> List[str]:
+    """Violations of one mode's budget"""
+    limits = (('max_mae', 'mae'), ('max_error', 'max_error'), ('max_lip_drift_ms', 'max_lip_drift_ms'),
+              ('max_missed_closures', 'missed_closures'))
+    violations = [f"{key} {summary[key]:.4g} > {budget[limit]:g}"
+                  for limit, key in limits if limit in budget and summary[key] > budget[limit]]
+    if 'min_speedup' in budget and (summary['speedup'] or 0) < budget['min_speedup']:
+        violations.append(f"speedup {summary['speedup'] or 0:.2f} < {budget['min_speedup']:g}")
+    return violations
+
+def main():
+    parser = argparse.ArgumentParser(description="Fidelity vs. speed of fast processing modes")
+    parser.add_argument("corpus", nargs="?", help="Directory of audio clips (default: synthetic clips)")
+    parser.add_argument("--stand-in", action="store_true", help="Use the CPU stand-in binding")
+    parser.add_argument("--modes", help=f"Comma-separated subset of: {', '.join(MODES)}")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per clip (fastest counts)")
+    parser.add_argument("--report", default="fidelity_report.json", help="JSON report path")
+    parser.add_argument("--budgets", help="JSON accuracy budgets per mode ('*' for all)")
+    args = parser.parse_args()
+
+    modes = args.modes.split(',') if args.modes else list(MODES)
+    unknown = [mode for mode in modes if mode not in MODES]
+    if unknown:
+        raise SystemExit(f"Unknown mode(s) {unknown}; expected some of {list(MODES)}")
+    budgets = json.loads(Path(args.budgets).read_text()) if args.budgets else {}
+
+    with tempfile.TemporaryDirectory() as scratch:
+        binding = None
+        if args.stand_in:
+            import stand_in_binding
+            stand_in_binding.use_placeholder_model(Path(scratch) / "model")
+            binding = stand_in_binding
+        sdk = Audio2FaceSDK(binding=binding, window_context_seconds=config.WINDOW_CONTEXT_SECONDS)
+        if not sdk.model_loaded:
+            raise SystemExit("SDK not initialized (pass --stand-in to run without it)")
+        names, fps = sdk.get_blendshape_names(), sdk.fps
+
+        clips = [Clip(path) for path in load_corpus(args.corpus, Path(scratch))]
+        for clip in clips:
+            reference(sdk, clip.path)  # Warm decoders, resampling filters and the bundle
+            clip.reference, clip.reference_seconds = timed(lambda: reference(sdk, clip.path), args.repeats)
+            clip.audio_seconds = len(clip.reference) / fps
+
+        audio_seconds = sum(clip.audio_seconds for clip in clips)
+        print("=" * 96)
+        print(f"Fidelity vs. Speed ({len(clips)} clips, {audio_seconds:.1f}s of audio, "
+              f"{'stand-in binding' if args.stand_in else 'SDK'})")
+        print("=" * 96)
+        print(f"{'mode':<20}{'MAE':>9}{'max err':>9}{'worst channel':>18}{'lip drift ms':>14}"
+              f"{'missed':>8}{'speedup':>9}  budget")
+
+        report = {
+            'corpus': [{'clip': clip.name, 'audio_seconds': clip.audio_seconds,
+                        'reference_seconds': clip.reference_seconds} for clip in clips],
+            'reference': {'pipeline': "load_and_preprocess + process_audio (whole clip)",
+                          'seconds': sum(clip.reference_seconds for clip in clips)},
+            'binding': 'stand-in' if args.stand_in else 'audio2face_py',
+            'modes': {}
+        }
+        failed = False
+        for name in modes:
+            description, kind, fn = MODES[name]
+            results, seconds = [], []
+            for clip in clips:
+                if kind == 'output':
+                    frames, transform_seconds = timed(lambda: fn(clip.reference), args.repeats)
+                    elapsed = clip.reference_seconds + transform_seconds
+                else:
+                    fn(sdk, clip.path)
+                    frames, elapsed = timed(lambda: fn(sdk, clip.path), args.repeats)
+                results.append(compare(clip.reference, frames, names, fps))
+                seconds.append(elapsed)
+
+            entry = summarize(description, clips, results, seconds, names)
+            budget = budgets.get(name, budgets.get('*'))
+            if budget is not None:
+                violations = check_budget(entry['summary'], budget)
+                entry['budget'] = {'limits': budget, 'passed': not violations, 'violations': violations}
+                failed = failed or bool(violations)
+            report['modes'][name] = entry
+
+            s = entry['summary']
+            verdict = "-" if budget is None else ("pass" if not entry['budget']['violations'] else "FAIL")
+            print(f"{name:<20}{s['mae']:>9.4f}{s['max_error']:>9.4f}{s['worst_channel']:>18}"
+                  f"{s['max_lip_drift_ms']:>14.1f}{s['missed_closures']:>8}{s['speedup'] or 0:>8.2f}x  {verdict}")
+
+    Path(args.report).write_text(json.dumps(report, indent=2))
+    print("-" * 96)
+    print(f"Report: {args.report} (per-channel errors, per-clip results, budget violations)")
+    print("(lip drift: closure onset timing vs. reference, worst case; output modes: reference time + transform)")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
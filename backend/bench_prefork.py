@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark pre-forked server workers against `uvicorn --workers`
+Starts the backend both ways, waits until every worker answers /stats,
+warms the decode path, and compares boot time and memory of all server
+processes (PSS adds up to the real total; RSS counts copy-on-write pages
+once per process)
+Usage: python bench_prefork.py [workers] [port]
+"""
+import os
+import sys
+import json
+import time
+import signal
+import subprocess
+import urllib.request
+
+import numpy as np
+
+from prefork import memory_usage
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+READY_TIMEOUT = 300.0
+WARMUP_REQUESTS_PER_WORKER = 8
+
+def wait_for_workers(port: int, workers: int, started: float):
+    """Poll /stats until every worker pid has answered; returns ({pid: stats}, seconds)"""
+    seen = {}
+    while len(seen) < workers:
+        if time.perf_counter() - started > READY_TIMEOUT:
+            raise TimeoutError(f"Only {len(seen)}/{workers} workers answered")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/stats", timeout=5) as response:
+                process = json.load(response)['process']
+            seen.setdefault(process['pid'], process)
+        except OSError:
+            time.sleep(0.05)
+    return seen, time.perf_counter() - started
+
+def warm_up(port: int, workers: int):
+    """
+    Send 44.1kHz PCM through the decode path so lazily-imported modules load
+    in every worker (connections are spread over workers by the kernel;
+    requests only reach the decoder once the SDK has loaded)
+    """
+    pcm = (np.sin(np.arange(44100) * 0.05) * 8000).astype('<i2').tobytes()
+    for _ in range(workers * WARMUP_REQUESTS_PER_WORKER):
+        request = urllib.request.Request(f"http://127.0.0.1:{port}/process-pcm", data=pcm,
+                                         headers={"X-Sample-Rate": "44100"})
+        try:
+            urllib.request.urlopen(request, timeout=30).close()
+        except OSError:
+            pass
+
+def run(label: str, command, port: int, workers: int) -> dict:
+    started = time.perf_counter()
+    server = subprocess.Popen(command, cwd=BACKEND_DIR, start_new_session=True,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        seen, ready_seconds = wait_for_workers(port, workers, started)
+        warm_up(port, workers)
+        # The supervising parent counts too: under pre-fork it holds the shared pages
+        memory = {pid: memory_usage(str(pid)) for pid in [server.pid, *seen]}
+    finally:
+        os.killpg(server.pid, signal.SIGTERM)
+        server.wait(timeout=60)
+
+    boots = [process['boot_seconds'] for process in seen.values()]
+    print(f"{label:<22}{ready_seconds:>9.2f}{max(boots):>10.2f}"
+          f"{sum(m['rss_mb'] for m in memory.values()):>10.0f}"
+          f"{sum(m.get('pss_mb', 0) for m in memory.values()):>10.0f}"
+          f"{sum(memory[pid].get('private_mb', 0) for pid in seen) / workers:>12.0f}")
+    return {'ready_seconds': ready_seconds, 'memory': memory}
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 8090
+
+    print("=" * 73)
+    print(f"Server Worker Benchmark ({workers} workers)")
+    print("=" * 73)
+    print(f"{'mode':<22}{'ready s':>9}{'boot s':>10}{'RSS MB':>10}{'PSS MB':>10}{'private/wkr':>12}")
+
+    spawned = run("uvicorn --workers", [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+                                        "--port", str(port), "--workers", str(workers)], port, workers)
+    forked = run("pre-fork launcher", [sys.executable, "main.py", "--host", "127.0.0.1",
+                                       "--port", str(port), "--workers", str(workers)], port, workers)
+
+    print("-" * 73)
+    pss = [sum(m.get('pss_mb', 0) for m in result['memory'].values()) for result in (spawned, forked)]
+    if pss[0]:
+        print(f"Pre-fork saves {pss[0] - pss[1]:.0f}MB PSS ({1 - pss[1] / pss[0]:.0%}) and is ready "
+              f"{spawned['ready_seconds'] - forked['ready_seconds']:.2f}s sooner")
+    print("(ready s: launch until all workers answer; boot s: slowest worker's own start-up)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark the thread budget: throughput scaling curve with and without it
+Runs concurrent jobs shaped like a request (44.1kHz decode resample plus a
+solver-sized matrix product per frame block) at concurrency 1 to 2x the
+usable CPUs, once with library thread defaults and once with the budget's
+limits. Each mode runs in a fresh interpreter, because library thread pools
+are sized when NumPy loads.
+Usage: python bench_threads.py [audio_seconds] [repeats]
+"""
+import os
+import sys
+import json
+import time
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import thread_budget
+
+VERTICES = 6000  # Solver-sized: frames x 3V positions projected onto 72 blendshapes
+
+def _job(audio, sr, basis):
+    import numpy as np
+    from audio_utils import AudioProcessor
+    samples = AudioProcessor.preprocess(audio, sr)
+    frames = max(1, len(samples) * 30 // 16000)
+    positions = np.random.default_rng(0).standard_normal((frames, basis.shape[0]), dtype=np.float32)
+    return positions @ basis
+
+def _curve(seconds: float, repeats: int, budgeted: bool):
+    """Child process: audio-seconds processed per second at each concurrency"""
+    import numpy as np
+
+    cpus, _ = thread_budget.available_cpus()
+    levels = sorted({1, *range(2, 2 * cpus + 1, max(1, cpus // 2))})
+    sr = 44100
+    t = np.arange(int(seconds * sr), dtype=np.float32) / sr
+    audio = np.sin(2 * np.pi * 220 * t).astype(np.float32)
+    basis = np.random.default_rng(1).standard_normal((3 * VERTICES, 72), dtype=np.float32)
+    _job(audio, sr, basis)  # Warm resampling filters and JIT kernels
+
+    results = {}
+    for concurrency in levels:
+        budget = thread_budget.plan(concurrency, 1)
+        if budgeted:
+            thread_budget.apply(budget)
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            started = time.perf_counter()
+            list(pool.map(lambda _: _job(audio, sr, basis), range(concurrency * repeats)))
+            elapsed = time.perf_counter() - started
+        results[concurrency] = {
+            'rate': concurrency * repeats * seconds / elapsed,
+            'library_threads': thread_budget.effective_limits()
+        }
+    print(json.dumps(results))
+
+def run(budgeted: bool, seconds: float, repeats: int) -> dict:
+    env = dict(os.environ)
+    if budgeted:
+        # What main.py exports before its imports (one inference + one decode thread)
+        budget = thread_budget.plan(1, 1)
+        for name in thread_budget.LIBRARY_ENV:
+            env.setdefault(name, str(budget.library_threads))
+    else:
+        for name in thread_budget.LIBRARY_ENV:
+            env.pop(name, None)
+    output = subprocess.run([sys.executable, __file__, '--child', str(seconds), str(repeats), str(int(budgeted))],
+                            env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True, check=True).stdout
+    return {int(k): v for k, v in json.loads(output.strip().splitlines()[-1]).items()}
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    cpus, source = thread_budget.available_cpus()
+
+    print("=" * 70)
+    print(f"Thread Budget Benchmark ({cpus} CPU(s), limited by {source}; {seconds:.0f}s clips)")
+    print("=" * 70)
+    defaults = run(False, seconds, repeats)
+    budgeted = run(True, seconds, repeats)
+
+    print(f"{'concurrency':<13}{'default audio-s/s':>19}{'budget audio-s/s':>18}{'speedup':>9}  library threads")
+    for concurrency in sorted(defaults):
+        a, b = defaults[concurrency], budgeted[concurrency]
+        threads = ", ".join(f"{name} {a['library_threads'][name]}->{n}"
+                            for name, n in b['library_threads'].items() if name in a['library_threads'])
+        print(f"{concurrency:<13}{a['rate']:>19.1f}{b['rate']:>18.1f}{b['rate'] / a['rate']:>8.2f}x  {threads}")
+    print("-" * 70)
+    print("(audio-s/s: seconds of audio decoded and solved per wall-clock second)")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        _curve(float(sys.argv[2]), int(sys.argv[3]), sys.argv[4] == '1')
+    else:
+        main()
@@ -0,0 +1,85 @@
+"""
+Cooperative Cancellation
+A token shared by everything working on one request; long-running stages
+check it at their boundaries (decode, resample, each inference window) and
+stop early once it is cancelled
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Optional
+
+class Cancelled(Exception):
+    """Raised at a stage boundary when the work is no longer wanted"""
+
+class RequestAbandoned(Cancelled):
+    """The caller stopped waiting: reason is 'timeout' or 'disconnected'"""
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+class CancelToken:
+    """Thread-safe, one-way cancellation flag with a reason"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.reason: Optional[str] = None
+
+    def cancel(self, reason: str = "cancelled"):
+        """Request cancellation; the first reason wins"""
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self, stage: str = ""):
+        """Raise Cancelled if cancellation was requested"""
+        if self._event.is_set():
+            where = f" before {stage}" if stage else ""
+            raise Cancelled(f"Cancelled{where}: {self.reason}")
+
+def check(token: Optional[CancelToken], stage: str = ""):
+    """token.check(stage), tolerating a missing token"""
+    if token is not None:
+        token.check(stage)
+
+async def guard(awaitable: Awaitable[Any], timeout: Optional[float],
+                is_disconnected: Callable[[], Awaitable[bool]], poll: float = 0.5) -> Any:
+    """
+    Await a result, giving up on timeout or client disconnect
+
+    Giving up cancels the awaitable, which propagates to whatever owns the
+    work (see SingleFlight). Requests that still want the result keep it alive.
+
+    Args:
+        awaitable: The work to wait for
+        timeout: Seconds to wait (None waits indefinitely)
+        is_disconnected: Coroutine function, e.g. starlette Request.is_disconnected
+        poll: Seconds between disconnect checks
+
+    Raises:
+        RequestAbandoned: On timeout or disconnect
+    """
+    async def watch():
+        while not await is_disconnected():
+            await asyncio.sleep(poll)
+
+    task = asyncio.ensure_future(awaitable)
+    watcher = asyncio.ensure_future(watch())
+    try:
+        done, _ = await asyncio.wait({task, watcher}, timeout=timeout,
+                                     return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watcher.cancel()
+
+    if task in done:
+        return task.result()
+
+    task.cancel()
+    if watcher in done:
+        raise RequestAbandoned('disconnected', "Client disconnected")
+    raise RequestAbandoned('timeout', f"Request timed out after {timeout:g}s")
@@ -6,6 +6,7 @@ class Config:
     MODEL_PATH = Path("../Audio2Face-3D-SDK/models/Audio2Face-3D-v3.0")
     A2F_MODEL_PATH = Path("../Audio2Face-3D-SDK/models/Audio2Face-3D-v3.0")  # Alias for compatibility
     TEMP_DIR = Path("./temp")
+    RESULTS_DIR = Path("./results")  # Memory-mapped result store
 
     # Audio settings
     SAMPLE_RATE = 16000
@@ -16,9 +17,82 @@ class Config:
     FPS = 30
     BLENDSHAPE_COUNT = 72  # Audio2Face outputs 72 blendshapes
 
+    # glTF export settings
+    AVATAR_GLB_PATH = Path("../frontend/assets/avatar.glb")  # Default morph-target layout
+    GLTF_PRECISION = "float"  # Sampler output encoding: float, ushort or ubyte
+    RIG_PROFILES_DIR = Path("./rig_profiles")  # Registered retarget profiles (one JSON file each)
+
+    # Result store settings
+    RESULT_STORE_MAX_BYTES = 2 * 1024**3  # Oldest results are evicted beyond this
+
+    # Inference settings (overridden by the autotuner when it is enabled)
+    USE_GPU_SOLVER = False
+    INFERENCE_WORKERS = 1  # Audio2FaceSDK instances serving the queue
+    WINDOW_SECONDS = 0.0  # Split long audio into windows of this length (0 = whole clip)
+    WINDOW_CONTEXT_SECONDS = 0.5  # Audio context added on each side of a window
+    STREAM_WINDOW_SECONDS = 5.0  # Window length for ?stream=ndjson (first frames after one window)
+    AUTOTUNE_ON_STARTUP = False  # Benchmark candidate configurations on first boot per host
+    AUTOTUNE_CACHE = Path("./autotune.json")
+    AUTOTUNE_REPEATS = 3  # Timed runs per candidate; the median is compared
+    AUTOTUNE_MIN_IMPROVEMENT = 0.05  # A candidate must be this much faster (fraction) to replace the incumbent
+    MODEL_SWAP_DRAIN_SECONDS = 300.0  # Longest wait for old workers to finish after a hot-swap
+
+    # Pipeline stage settings (inference is sized by INFERENCE_WORKERS)
+    DECODE_WORKERS = 0  # Threads writing, decoding and resampling uploads (0: sized by the thread budget)
+    DECODE_QUEUE_SIZE = 32  # Uploads waiting for a decode thread; later ones wait to be admitted
+    SERIALIZE_WORKERS = 2  # Threads storing results and encoding responses (JSON, GLB)
+    SERIALIZE_QUEUE_SIZE = 32
+    STAGE_UTILIZATION_WINDOW = 60.0  # Seconds of history behind each stage's utilization
+
+    # Thread budget settings
+    THREAD_BUDGET = True  # Limit BLAS/OpenMP/numba threads so concurrent workers don't oversubscribe the CPUs
+    CPU_AFFINITY = None  # None: inherited; list of core ids; "split": disjoint cores per pre-forked worker
+
+    # Progress reporting settings
+    PROGRESS_HEARTBEAT_SECONDS = 1.0  # Progress events are re-sent this often while nothing changes (ETA moves)
+    PROGRESS_RETENTION_SECONDS = 60.0  # Finished, or subscribed but never started, channels are kept this long
+    PROGRESS_MAX_CHANNELS = 1000
+
+    # Incremental reprocessing settings
+    INCREMENTAL_REPROCESSING = True  # Reuse cached frames for unchanged chunks of re-submitted audio (?document=<key>)
+    SEGMENT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+    SEGMENT_CONTEXT_SECONDS = 0.5  # Audio context inferred around a changed region
+    SEGMENT_BLEND_SECONDS = 0.1  # Crossfade from reused into re-inferred frames
+    SEGMENT_MIN_REUSE = 0.2  # Below this reusable fraction, the whole clip is re-inferred
+
+    # Scheduler settings
+    SCHEDULER_AGING_RATE = 1.0  # Seconds of job cost forgiven per second waited
+    SCHEDULER_BULK_OFFSET = 30.0  # Extra cost (seconds) charged to bulk jobs
+    SCHEDULER_MAX_QUEUED_SECONDS = 600.0  # Admission budget of queued audio seconds
+    MAX_BATCH_SIZE = 8  # Clips per batched inference call (1 disables batching)
+    BATCH_WINDOW_MS = 10  # How long a ready clip waits for batch-mates
+    REQUEST_TIMEOUT_SECONDS = 300.0  # Default per-request budget (override with timeout_ms)
+    INFERENCE_HANG_SECONDS = 120.0  # A worker is never declared hung before this...
+    INFERENCE_HANG_FACTOR = 10.0  # ...nor before this many times its job's expected run time
+
+    # Health monitor settings
+    HEALTH_INTERVAL_SECONDS = 15.0  # Time between background check rounds
+    HEALTH_CANARY_SECONDS = 0.5  # Length of the synthetic canary clip
+    HEALTH_CANARY_SLO_MS = 500.0  # Canary inference (excluding queue wait) slower than this degrades health
+    HEALTH_CANARY_TIMEOUT_SECONDS = 10.0  # Canary not finished by then degrades health (stalled workers are what make it unhealthy)
+    HEALTH_TEMP_DIR_MAX_MB = 1024  # Leftover temp files beyond this degrade health
+    HEALTH_MIN_FREE_DISK_MB = 512
+    HEALTH_MAX_RSS_MB = 16384
+    HEALTH_MAX_QUEUE_DEPTH = 100
+
+    # Logging settings
+    LOG_LEVEL = "INFO"
+    LOG_JSON = True  # JSON lines; False for readable console output
+    LOG_QUEUE_SIZE = 10000  # Records buffered for the writer thread before dropping
+    LOG_SAMPLE_RATES = {"DEBUG": 0.01}  # Fraction of records kept per level (others: all)
+    LOG_TRACE_LIMIT = 5  # Tracebacks per distinct error per window
+    LOG_TRACE_WINDOW = 60.0  # Seconds
+
     # Server settings
     HOST = "0.0.0.0"
     PORT = 8000
+    SERVER_WORKERS = 1  # `python main.py` pre-forks this many server processes when above 1
+    ADMIN_TOKEN = None  # /admin endpoints require a matching X-Admin-Token header; unset, they are disabled (404)
 
     def __init__(self):
         self.TEMP_DIR.mkdir(exist_ok=True)
@@ -0,0 +1,212 @@
+"""
+glTF Morph-Target Animation Export
+Bakes a blendshape track into a binary glTF (GLB) animation clip so engines can
+play it with their native animation systems instead of driving
+morphTargetInfluences by hand every frame
+"""
+
+import json
+import struct
+import hashlib
+import numpy as np
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+GLB_MAGIC = 0x46546C67  # b'glTF'
+GLB_VERSION = 2
+CHUNK_JSON = 0x4E4F534A
+CHUNK_BIN = 0x004E4942
+
+# glTF componentType constants
+FLOAT = 5126
+UNSIGNED_SHORT = 5123
+UNSIGNED_BYTE = 5121
+
+# Sampler output encodings allowed by the core spec for "weights" targets
+PRECISIONS = {
+    'float': (FLOAT, np.float32, None),
+    'ushort': (UNSIGNED_SHORT, np.uint16, 65535),
+    'ubyte': (UNSIGNED_BYTE, np.uint8, 255),
+}
+
+# A layout is a list of (node_name, morph_target_names) pairs
+MorphLayout = List[Tuple[str, List[str]]]
+
+@lru_cache(maxsize=8)
+def _read_layout_cached(glb_path: str, mtime: float) -> Tuple[Tuple[str, Tuple[str, ...]], ...]:
+    data = Path(glb_path).read_bytes()
+    magic, version, _ = struct.unpack_from('<III', data, 0)
+    if magic != GLB_MAGIC or version != GLB_VERSION:
+        raise ValueError(f"Not a glTF 2.0 binary: {glb_path}")
+
+    chunk_length, chunk_type = struct.unpack_from('<II', data, 12)
+    if chunk_type != CHUNK_JSON:
+        raise ValueError(f"GLB does not start with a JSON chunk: {glb_path}")
+    gltf = json.loads(data[20:20 + chunk_length])
+
+    meshes = gltf.get('meshes', [])
+    layout = []
+    for index, node in enumerate(gltf.get('nodes', [])):
+        if 'mesh' not in node:
+            continue
+        names = (meshes[node['mesh']].get('extras') or {}).get('targetNames') or []
+        if names:
+            layout.append((node.get('name', f"node_{index}"), tuple(names)))
+    return tuple(layout)
+
+def read_morph_layout(glb_path: str) -> MorphLayout:
+    """
+    Read the morph-target ordering of every mesh node in a GLB
+
+    Args:
+        glb_path: Path to a .glb file (e.g. frontend/assets/avatar.glb)
+
+    Returns:
+        List of (node_name, target_names) for nodes whose mesh has named morph targets
+    """
+    mtime = Path(glb_path).stat().st_mtime
+    return [(node, list(names)) for node, names in _read_layout_cached(str(glb_path), mtime)]
+
+def remap_channels(blendshapes: np.ndarray, source_names: Sequence[str],
+                   target_names: Sequence[str]) -> np.ndarray:
+    """Reorder SDK channels into a target ordering; targets the SDK does not produce stay at 0"""
+    source_index = {name: i for i, name in enumerate(source_names)}
+    columns = np.array([source_index.get(name, -1) for name in target_names], dtype=np.intp)
+
+    out = np.zeros((blendshapes.shape[0], len(target_names)), dtype=np.float32)
+    present = columns >= 0
+    out[:, present] = blendshapes[:, columns[present]]
+    return out
+
+class EmptyTrack(ValueError):
+    """Raised for a track with no frames (glTF accessors may not be empty)"""
+
+class _GLBBuilder:
+    """Accumulates buffer views and accessors for a single-buffer GLB"""
+
+    def __init__(self):
+        self.blob = bytearray()
+        self.buffer_views = []
+        self.accessors = []
+
+    def add_accessor(self, array: np.ndarray, component_type: int, accessor_type: str,
+                     normalized: bool = False, with_bounds: bool = False) -> int:
+        # Every bufferView starts 4-byte aligned, which covers all component sizes we emit
+        self.blob.extend(b'\x00' * (-len(self.blob) % 4))
+        raw = np.ascontiguousarray(array).tobytes()
+        self.buffer_views.append({'buffer': 0, 'byteOffset': len(self.blob), 'byteLength': len(raw)})
+        self.blob.extend(raw)
+
+        components = {'SCALAR': 1, 'VEC3': 3}.get(accessor_type, 1)
+        accessor = {
+            'bufferView': len(self.buffer_views) - 1,
+            'componentType': component_type,
+            'count': int(array.size // components),
+            'type': accessor_type,
+        }
+        if normalized:
+            accessor['normalized'] = True
+        if with_bounds:
+            flat = array.reshape(-1, components)
+            accessor['min'] = flat.min(axis=0).tolist() if flat.size else [0] * components
+            accessor['max'] = flat.max(axis=0).tolist() if flat.size else [0] * components
+        self.accessors.append(accessor)
+        return len(self.accessors) - 1
+
+def bake_glb(blendshapes: np.ndarray, timestamps: np.ndarray, source_names: Sequence[str],
+             layout: MorphLayout, clip_name: str = "speech", precision: str = "float") -> bytes:
+    """
+    Bake a blendshape track into a GLB containing one morph-weight animation
+
+    Each distinct morph ordering in the layout gets one sampler; every node sharing
+    that ordering gets a channel on it. Nodes carry a degenerate placeholder mesh
+    with the right number of (zero-displacement) targets so the file validates
+    and loaders can bind the clip onto the real rig by node name.
+
+    Args:
+        blendshapes: (num_frames, num_blendshapes) in SDK order
+        timestamps: (num_frames,) keyframe times in seconds
+        source_names: Names of the SDK channels
+        layout: (node_name, target_names) pairs to animate
+        clip_name: Animation name
+        precision: 'float', 'ushort' or 'ubyte' sampler output encoding
+
+    Returns:
+        GLB file bytes
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision '{precision}', expected one of {list(PRECISIONS)}")
+    if not layout:
+        raise ValueError("Morph layout is empty")
+    if len(timestamps) == 0 or len(blendshapes) == 0:
+        raise EmptyTrack("Track has no frames to animate (audio shorter than one frame)")
+    component_type, dtype, scale = PRECISIONS[precision]
+
+    builder = _GLBBuilder()
+    times = builder.add_accessor(np.asarray(timestamps, dtype=np.float32), FLOAT, 'SCALAR', with_bounds=True)
+
+    # Shared placeholder geometry: one degenerate triangle, zero morph displacement
+    zeros = np.zeros((3, 3), dtype=np.float32)
+    base_position = builder.add_accessor(zeros, FLOAT, 'VEC3', with_bounds=True)
+    zero_target = builder.add_accessor(zeros, FLOAT, 'VEC3', with_bounds=True)
+
+    meshes, nodes, samplers, channels = [], [], [], []
+    ordering_slots = {}
+    for node_name, target_names in layout:
+        key = tuple(target_names)
+        if key not in ordering_slots:
+            weights = remap_channels(blendshapes, source_names, target_names)
+            if scale is not None:
+                weights = np.round(np.clip(weights, 0.0, 1.0) * scale).astype(dtype)
+            output = builder.add_accessor(weights, component_type, 'SCALAR', normalized=scale is not None)
+            samplers.append({'input': times, 'output': output, 'interpolation': 'LINEAR'})
+            meshes.append({
+                'name': f"{clip_name}_morphs_{len(meshes)}",
+                'primitives': [{
+                    'attributes': {'POSITION': base_position},
+                    'targets': [{'POSITION': zero_target} for _ in target_names],
+                }],
+                'weights': [0.0] * len(target_names),
+                'extras': {'targetNames': list(target_names)},
+            })
+            ordering_slots[key] = (len(samplers) - 1, len(meshes) - 1)
+
+        sampler, mesh = ordering_slots[key]
+        nodes.append({'name': node_name, 'mesh': mesh})
+        channels.append({'sampler': sampler, 'target': {'node': len(nodes) - 1, 'path': 'weights'}})
+
+    builder.blob.extend(b'\x00' * (-len(builder.blob) % 4))
+    gltf = {
+        'asset': {'version': '2.0', 'generator': 'Audio2Face MVP'},
+        'scene': 0,
+        'scenes': [{'nodes': list(range(len(nodes)))}],
+        'nodes': nodes,
+        'meshes': meshes,
+        'animations': [{'name': clip_name, 'samplers': samplers, 'channels': channels}],
+        'accessors': builder.accessors,
+        'bufferViews': builder.buffer_views,
+        'buffers': [{'byteLength': len(builder.blob)}],
+    }
+
+    json_chunk = json.dumps(gltf, separators=(',', ':')).encode('utf-8')
+    json_chunk += b' ' * (-len(json_chunk) % 4)
+    bin_chunk = bytes(builder.blob)
+
+    total = 12 + 8 + len(json_chunk) + 8 + len(bin_chunk)
+    return b''.join([
+        struct.pack('<III', GLB_MAGIC, GLB_VERSION, total),
+        struct.pack('<II', len(json_chunk), CHUNK_JSON), json_chunk,
+        struct.pack('<II', len(bin_chunk), CHUNK_BIN), bin_chunk,
+    ])
+
+def glb_etag(content: bytes) -> str:
+    """Strong ETag from a content hash (of a baked clip, or of everything it is baked from)"""
+    return '"' + hashlib.sha256(content).hexdigest()[:32] + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches etag (weak comparison, as RFC 9110 requires)"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or etag in [tag[2:] if tag.startswith('W/') else tag for tag in tags]
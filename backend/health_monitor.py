@@ -0,0 +1,274 @@
+"""
+Background Health Monitor
+Periodically runs cheap runtime checks (worker progress, canary inference,
+temp dir, memory, queue depth) on a background thread and caches the result, so /health is
+answered from the last snapshot without doing any work
+
+Checks follow health_validator's convention of returning (passed, message),
+plus a dict of metrics. A failed critical check makes the service
+unhealthy; a failed non-critical check only degrades it. A snapshot older
+than a few intervals means the monitor itself is stuck, and counts as
+unhealthy too.
+"""
+
+import os
+import sys
+import time
+import shutil
+import threading
+import numpy as np
+from concurrent.futures import TimeoutError as FutureTimeout
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from cancellation import CancelToken
+from scheduler import AdmissionRejected
+from structured_logging import get_logger
+
+logger = get_logger(__name__)
+
+CheckResult = Tuple[bool, str, Dict]
+CheckFn = Callable[[], CheckResult]
+
+DETAIL_LEVELS = ('basic', 'lb', 'full')
+
+class HealthMonitor:
+    """Runs registered checks every interval seconds and keeps the latest snapshot"""
+
+    def __init__(self, interval: float = 15.0, stale_after: float = 3.0):
+        """
+        Args:
+            interval: Seconds between check rounds
+            stale_after: Snapshot is considered stale after this many intervals
+        """
+        self.interval = interval
+        self.stale_after = stale_after
+        self._checks: List[Tuple[str, CheckFn, bool]] = []
+        self._snapshot: Optional[Dict] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add_check(self, name: str, check_fn: CheckFn, critical: bool = True):
+        """Register a check; critical failures make the service unhealthy"""
+        self._checks.append((name, check_fn, critical))
+
+    def run_once(self) -> Dict:
+        """Run every check now and publish the snapshot"""
+        checks = {}
+        status = 'healthy'
+        for name, check_fn, critical in self._checks:
+            start = time.perf_counter()
+            try:
+                passed, message, metrics = check_fn()
+            except Exception as e:
+                passed, message, metrics = False, f"Error during check: {e}", {}
+            checks[name] = {
+                'passed': passed,
+                'critical': critical,
+                'message': message,
+                'metrics': metrics,
+                'check_ms': round((time.perf_counter() - start) * 1000, 2)
+            }
+            if not passed:
+                if critical:
+                    status = 'unhealthy'
+                elif status == 'healthy':
+                    status = 'degraded'
+
+        previous = self._snapshot
+        # Plain attribute assignment, so readers never see a half-built snapshot
+        self._snapshot = {'status': status, 'checked_at': time.time(),
+                          'checked_monotonic': time.monotonic(), 'checks': checks}
+
+        if previous is None or previous['status'] != status:
+            failing = [name for name, check in checks.items() if not check['passed']]
+            log = logger.info if status == 'healthy' else logger.warning
+            log("Health status changed", extra={'status': status, 'failing_checks': failing})
+        return self._snapshot
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Start the background thread (the first round runs immediately)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="health-monitor", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def snapshot(self, detail: str = 'basic') -> Dict:
+        """
+        Latest cached health, without running any checks
+
+        Args:
+            detail: 'lb' (status only), 'basic' (status and failing checks)
+                    or 'full' (every check with metrics)
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            return {'status': 'starting'}
+
+        age = time.monotonic() - snapshot['checked_monotonic']
+        status = snapshot['status']
+        if age > self.interval * self.stale_after:
+            status = 'unhealthy'
+
+        if detail == 'lb':
+            return {'status': status}
+
+        result = {
+            'status': status,
+            'checked_at': snapshot['checked_at'],
+            'age_seconds': round(age, 2)
+        }
+        if detail == 'full':
+            result['checks'] = snapshot['checks']
+        else:
+            result['failing'] = {
+                name: check['message'] for name, check in snapshot['checks'].items() if not check['passed']
+            }
+        return result
+
+class Canary:
+    """
+    Tiny inference through the scheduler, so a slow GPU or broken model shows up
+
+    The canary is costed like any other short interactive job, so it runs
+    ahead of long uploads; its latency is timed from when a worker picks it
+    up, so queue wait is reported but not held against the SLO. A canary
+    that is rejected, waits out its timeout behind long jobs or fails only
+    degrades health: whether the workers are alive is decided from their
+    progress (worker_progress_check), not from queue luck.
+    """
+
+    def __init__(self, scheduler, sample_rate: int, seconds: float = 0.5,
+                 slo_ms: float = 500.0, timeout: float = 10.0):
+        t = np.arange(int(seconds * sample_rate)) / sample_rate
+        self.audio = (0.5 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+        self.scheduler = scheduler
+        self.slo_ms = slo_ms
+        self.timeout = timeout
+        self.latency_ms: Optional[float] = None
+        self.queue_wait_ms: Optional[float] = None
+
+    def inference_check(self) -> CheckResult:
+        """Run the canary; fails if it is rejected, errors, times out or yields no frames"""
+        self.latency_ms = None
+        self.queue_wait_ms = None
+        if self.scheduler is None:
+            return False, "Inference scheduler not running", {}
+
+        token = CancelToken()
+        submitted = time.perf_counter()
+        started = []
+        try:
+            future = self.scheduler.submit(self.audio, 'interactive', cancel_token=token,
+                                           on_start=lambda: started.append(time.perf_counter()), probe=True)
+            result = future.result(self.timeout)
+        except AdmissionRejected as e:
+            return False, f"Canary rejected: {e}", {}
+        except FutureTimeout:
+            token.cancel("health canary timed out")
+            where = "running" if started else "queued"
+            return False, f"Canary did not finish within {self.timeout:g}s (still {where})", {}
+        except Exception as e:
+            return False, f"Canary failed: {e}", {}
+        finished = time.perf_counter()
+        began = started[0] if started else submitted
+        self.latency_ms = (finished - began) * 1000
+        self.queue_wait_ms = (began - submitted) * 1000
+
+        if result['num_frames'] == 0:
+            return False, "Canary produced no frames", {}
+        return True, "Canary inference succeeded", {'num_frames': int(result['num_frames']),
+                                                    'queue_wait_ms': round(self.queue_wait_ms, 2)}
+
+    def latency_check(self) -> CheckResult:
+        """Latency of the last canary against the SLO"""
+        if self.latency_ms is None:
+            return False, "No canary latency (canary failed)", {'slo_ms': self.slo_ms}
+        metrics = {'latency_ms': round(self.latency_ms, 2), 'slo_ms': self.slo_ms}
+        if self.latency_ms > self.slo_ms:
+            return False, f"Canary took {self.latency_ms:.0f}ms (SLO {self.slo_ms:.0f}ms)", metrics
+        return True, f"Canary {self.latency_ms:.0f}ms", metrics
+
+def worker_progress_check(scheduler) -> CheckFn:
+    """Inference workers exist and none has run its jobs past the watchdog's hang limit"""
+
+    def check() -> CheckResult:
+        if scheduler is None:
+            return False, "Inference scheduler not running", {}
+        workers = scheduler.worker_progress()
+        metrics = {'workers': len(workers), 'running': sum(worker['running'] for worker in workers)}
+        if not workers:
+            return False, "No inference workers", metrics
+        stalled = [worker for worker in workers if worker['stalled']]
+        if stalled:
+            worst = max(stalled, key=lambda worker: worker['busy_seconds'])
+            metrics['stalled'] = [worker['index'] for worker in stalled]
+            return False, (f"{len(stalled)} of {len(workers)} worker(s) stalled (worker {worst['index']} busy "
+                           f"{worst['busy_seconds']:.1f}s, limit {worst['hang_limit_seconds']:.1f}s)"), metrics
+        return True, f"{len(workers)} worker(s) making progress, {metrics['running']} job(s) running", metrics
+
+    return check
+
+def temp_dir_check(temp_dir: Path, max_mb: float, min_free_mb: float) -> CheckFn:
+    """Bytes left behind in the temp dir, and free space on its filesystem"""
+
+    def check() -> CheckResult:
+        used = 0
+        files = 0
+        for entry in os.scandir(temp_dir):
+            if entry.is_file(follow_symlinks=False):
+                used += entry.stat(follow_symlinks=False).st_size
+                files += 1
+        free = shutil.disk_usage(temp_dir).free
+
+        metrics = {'used_mb': round(used / 2**20, 2), 'files': files, 'free_mb': round(free / 2**20, 2)}
+        if used / 2**20 > max_mb:
+            return False, f"Temp dir holds {used / 2**20:.0f}MB (limit {max_mb:.0f}MB)", metrics
+        if free / 2**20 < min_free_mb:
+            return False, f"Only {free / 2**20:.0f}MB free for temp files", metrics
+        return True, f"{files} temp file(s), {free / 2**30:.1f}GB free", metrics
+
+    return check
+
+def _rss_bytes() -> int:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        # Not Linux: peak rather than current RSS, but still a useful bound
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+def memory_check(max_rss_mb: float) -> CheckFn:
+    """Resident memory of this process"""
+
+    def check() -> CheckResult:
+        rss_mb = _rss_bytes() / 2**20
+        metrics = {'rss_mb': round(rss_mb, 1), 'limit_mb': max_rss_mb}
+        if rss_mb > max_rss_mb:
+            return False, f"RSS {rss_mb:.0f}MB exceeds {max_rss_mb:.0f}MB", metrics
+        return True, f"RSS {rss_mb:.0f}MB", metrics
+
+    return check
+
+def queue_check(scheduler, max_depth: int) -> CheckFn:
+    """Inference queue depth and queued audio"""
+
+    def check() -> CheckResult:
+        if scheduler is None:
+            return False, "Inference scheduler not running", {}
+        stats = scheduler.stats()
+        metrics = {key: stats[key] for key in ('queue_depth', 'queued_audio_seconds', 'running', 'workers')}
+        if stats['queue_depth'] > max_depth:
+            return False, f"{stats['queue_depth']} jobs queued (limit {max_depth})", metrics
+        return True, f"{stats['queue_depth']} queued, {stats['running']} running", metrics
+
+    return check
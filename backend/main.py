@@ -1,34 +1,96 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+# Numeric libraries size their thread pools when first imported, and threads
+# inherit CPU affinity from their creator, so pinning and the thread budget's
+# environment defaults come before every other import
+from config import config
+import prefork
+import thread_budget
+
+cpu_affinity = thread_budget.pin_process(config.CPU_AFFINITY, *prefork.worker_position())
+if config.THREAD_BUDGET:
+    thread_budget.export_environment(thread_budget.plan(
+        config.INFERENCE_WORKERS, config.DECODE_WORKERS, cpu_affinity, prefork.worker_position()[1]))
+
+from fastapi import FastAPI, File, Form, UploadFile, HTTPException, Header, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, RedirectResponse, Response, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from pathlib import Path
+from typing import Dict, List, Optional
+import hmac
+from urllib.parse import urlencode
 import uuid
+import json
+import argparse
+import time
+import asyncio
+import numpy as np
 import traceback
 import sys
 
-from config import config
-from audio_utils import AudioProcessor
-from a2f_wrapper import Audio2FaceSDK
+from audio_utils import AudioProcessor, PCM_FORMATS, SUPPORTED_FORMATS, sniff_format
+from autotune import default_settings, load_or_tune, build_workers, synthetic_clips
+from gltf_export import EmptyTrack, bake_glb, etag_matches, glb_etag, read_morph_layout, PRECISIONS
+from result_store import ResultStore, ResultNotFound, parse_range
+from single_flight import SingleFlight, request_key
+from segment_cache import SegmentCache, IncrementalProcessor
+from stage_pool import StagePool
+from progress import ProgressMiddleware, ProgressRegistry, ProgressSink, WindowTally
+from rig_profiles import RigProfile, RigProfileError, RigProfileRegistry
+from projection import Projection, ProjectionError, parse_projection
+from scheduler import InferenceScheduler, AdmissionRejected, DeadlineExpired, WorkerHung, PRIORITIES
+from cancellation import CancelToken, Cancelled, RequestAbandoned, guard, check
 from health_validator import run_all_checks
+from model_swap import ModelSwapper, SwapInProgress
+from health_monitor import HealthMonitor, Canary, DETAIL_LEVELS
+from health_monitor import worker_progress_check, temp_dir_check, memory_check, queue_check
+from structured_logging import setup_logging, get_logger, log_stats, request_id_var
+
+def parse_launch_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Audio2Face backend")
+    parser.add_argument("--host", default=config.HOST)
+    parser.add_argument("--port", type=int, default=config.PORT)
+    parser.add_argument("--workers", type=int, default=config.SERVER_WORKERS,
+                        help="Pre-forked server processes (1 = serve from this process)")
+    return parser.parse_args()
+
+# With more than one worker, `python main.py` is a pre-fork launcher: it
+# validates and imports once, then forks workers that import this module as
+# `main` and build their own SDK instances (see prefork.py)
+if __name__ == "__main__":
+    launch_args = parse_launch_args()
+    if launch_args.workers > 1:
+        prefork.launch(launch_args.workers, launch_args.host, launch_args.port)
+
+# Log records are written by a background thread; the request path never blocks on I/O
+setup_logging(
+    level=config.LOG_LEVEL,
+    json_format=config.LOG_JSON,
+    queue_size=config.LOG_QUEUE_SIZE,
+    sample_rates=config.LOG_SAMPLE_RATES,
+    trace_limit=config.LOG_TRACE_LIMIT,
+    trace_window=config.LOG_TRACE_WINDOW
+)
+logger = get_logger("audio2face.api")
 
-# Run health checks on startup
-print("\n" + "="*60)
-print("Audio2Face Backend - Startup Validation")
-print("="*60 + "\n")
-
-validator = run_all_checks(verbose=True)
-
-if not validator.is_healthy():
-    print("\n❌ Critical issues detected. Backend may not function properly.")
-    print("Fix the issues above and restart the backend.\n")
-    # Don't exit - allow backend to start for debugging
-else:
-    summary = validator.get_summary()
-    if summary['warnings'] > 0:
-        print(f"\n⚠️  Backend starting with {summary['warnings']} warning(s).")
-        print("Some features may be unavailable.\n")
+# Run health checks on startup (pre-forked workers inherit the launcher's)
+if not prefork.is_worker():
+    print("\n" + "="*60)
+    print("Audio2Face Backend - Startup Validation")
+    print("="*60 + "\n")
+
+    validator = run_all_checks(verbose=True)
+
+    if not validator.is_healthy():
+        print("\n❌ Critical issues detected. Backend may not function properly.")
+        print("Fix the issues above and restart the backend.\n")
+        # Don't exit - allow backend to start for debugging
     else:
-        print("\n✅ All checks passed. Starting backend...\n")
+        summary = validator.get_summary()
+        if summary['warnings'] > 0:
+            print(f"\n⚠️  Backend starting with {summary['warnings']} warning(s).")
+            print("Some features may be unavailable.\n")
+        else:
+            print("\n✅ All checks passed. Starting backend...\n")
 
 # Initialize FastAPI
 app = FastAPI(title="Audio2Face API", version="1.0.0")
@@ -42,6 +104,29 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-request progress, streamed as server-sent events by /progress/{request_id}.
+# Added before assign_request_id so it runs inside it and sees the request id.
+# Pre-forked workers share channels through files, since a subscriber
+# usually reaches a different worker than its upload.
+shared_progress_dir = config.TEMP_DIR / "progress" if prefork.worker_position()[1] > 1 else None
+progress_registry = ProgressRegistry(lambda: scheduler.seconds_per_second, lambda: scheduler.expected_wait(),
+                                     retention=config.PROGRESS_RETENTION_SECONDS,
+                                     max_channels=config.PROGRESS_MAX_CHANNELS,
+                                     shared_dir=shared_progress_dir)
+app.add_middleware(ProgressMiddleware, registry=progress_registry, paths=("/process-audio", "/process-pcm"))
+
+@app.middleware("http")
+async def assign_request_id(request: Request, call_next):
+    """Tag every log record of a request with its id (client-supplied X-Request-Id or a new one)"""
+    request_id = request.headers.get("X-Request-Id") or uuid.uuid4().hex
+    token = request_id_var.set(request_id)
+    try:
+        response = await call_next(request)
+    finally:
+        request_id_var.reset(token)
+    response.headers["X-Request-Id"] = request_id
+    return response
+
 # Initialize CUDA before TensorRT (FIX for error 35)
 # See: https://stackoverflow.com/questions/58369731/adding-multiple-inference-on-tensorrt-invalid-resource-handle-error
 print("🔧 Applying CUDA initialization fix for TensorRT...")
@@ -58,16 +143,129 @@ except Exception as e:
     print(f"⚠ CUDA pre-initialization failed: {e}")
     print("  Continuing anyway...\n")
 
+# Pick solver, worker and thread settings (autotuned per host if enabled)
+inference_settings = default_settings()
+if config.AUTOTUNE_ON_STARTUP:
+    try:
+        inference_settings = load_or_tune()['settings']
+    except Exception as e:
+        print(f"⚠ Autotuning failed, using configured defaults: {e}")
+
+# Divide the CPUs between inference workers, decode threads and the libraries they call
+budget = thread_budget.plan(inference_settings['inference_workers'], config.DECODE_WORKERS,
+                            cpu_affinity, prefork.worker_position()[1])
+if config.THREAD_BUDGET:
+    # Autotuned library thread counts, when present, were measured on this host and win
+    thread_budget.apply(budget, inference_settings['blas_threads'], inference_settings['numba_threads'])
+print(f"✓ Thread budget: {thread_budget.report(budget)}")
+
 # Initialize Audio2Face SDK
+audio_processor = AudioProcessor()
 try:
-    a2f_sdk = Audio2FaceSDK()
-    audio_processor = AudioProcessor()
-    print("✓ Audio2Face SDK initialized successfully")
+    inference_sdks = build_workers(inference_settings)
+    a2f_sdk = inference_sdks[0]
+    print(f"✓ Audio2Face SDK initialized successfully ({len(inference_sdks)} inference worker(s))")
 except Exception as e:
     print(f"✗ Failed to initialize Audio2Face SDK: {e}")
     print("NOTE: This is expected if GPU is not available or SDK is not built yet")
     traceback.print_exc()
     a2f_sdk = None
+    inference_sdks = []
+
+# Rig profiles retarget SDK channels to a client's morph-target order on the server
+rig_profiles = RigProfileRegistry(config.RIG_PROFILES_DIR, a2f_sdk.get_blendshape_names() if a2f_sdk else [])
+if a2f_sdk:
+    for problem in rig_profiles.load():
+        print(f"⚠ Skipping rig profile {problem}")
+    if rig_profiles.get("avatar") is None and config.AVATAR_GLB_PATH.exists():
+        # The bundled avatar's largest morph-target mesh, mapped by name
+        layout = read_morph_layout(str(config.AVATAR_GLB_PATH))
+        if layout:
+            _, targets = max(layout, key=lambda entry: len(entry[1]))
+            rig_profiles.register({"name": "avatar", "targets": targets}, persist=False)
+    print(f"✓ Rig profiles: {', '.join(rig_profiles.names()) or 'none'}")
+
+# Finished tracks are kept on disk for windowed access via /results
+# Each process tracks the results it writes, so pre-forked workers split the budget
+result_store = ResultStore(config.RESULTS_DIR, config.RESULT_STORE_MAX_BYTES // prefork.worker_position()[1])
+
+def build_replacement_worker():
+    """Fresh SDK instance for a worker the scheduler's watchdog gave up on"""
+    sdk = build_workers({**inference_settings, 'inference_workers': 1})[0]
+    return sdk.process_audio, sdk.process_batch if sdk.supports_native_batching() else None
+
+# Inference workers are fed by the scheduler; concurrent duplicate uploads are coalesced
+scheduler = InferenceScheduler(
+    [sdk.process_audio for sdk in inference_sdks], config.SAMPLE_RATE,
+    aging_rate=config.SCHEDULER_AGING_RATE,
+    bulk_offset=config.SCHEDULER_BULK_OFFSET,
+    max_queued_seconds=config.SCHEDULER_MAX_QUEUED_SECONDS,
+    # Batching only pays off when the binding runs clips in one native call
+    infer_batch=[sdk.process_batch if sdk.supports_native_batching() else None for sdk in inference_sdks],
+    max_batch_size=config.MAX_BATCH_SIZE,
+    batch_window=config.BATCH_WINDOW_MS / 1000,
+    worker_factory=build_replacement_worker,
+    hang_min_seconds=config.INFERENCE_HANG_SECONDS,
+    hang_factor=config.INFERENCE_HANG_FACTOR
+) if a2f_sdk else None
+single_flight = SingleFlight()
+
+# Decode and serialization run on their own bounded pools, so they overlap
+# with inference instead of queueing behind it
+decode_pool = StagePool("decode", budget.decode_workers, config.DECODE_QUEUE_SIZE,
+                        config.STAGE_UTILIZATION_WINDOW)
+serialize_pool = StagePool("serialize", config.SERIALIZE_WORKERS, config.SERIALIZE_QUEUE_SIZE,
+                           config.STAGE_UTILIZATION_WINDOW)
+
+# Re-submitted audio with small edits only re-infers the chunks that changed
+# (per client document key: chunks are never shared between unrelated clips)
+segment_cache = SegmentCache(config.SEGMENT_CACHE_MAX_BYTES)
+segment_processor = IncrementalProcessor(
+    segment_cache, config.SAMPLE_RATE,
+    context_seconds=config.SEGMENT_CONTEXT_SECONDS,
+    blend_seconds=config.SEGMENT_BLEND_SECONDS,
+    min_reuse=config.SEGMENT_MIN_REUSE
+) if config.INCREMENTAL_REPROCESSING else None
+
+def model_namespace(sdk) -> str:
+    """Cached frames are only valid for the model configuration that produced them"""
+    if not sdk:
+        return ""
+    return (f"{sdk.model_dir}:{sdk.character_index}:{sdk.use_gpu_solver}:"
+            f"{sdk.window_seconds}:{sdk.window_context_seconds}")
+
+segment_namespace = model_namespace(a2f_sdk)
+
+def publish_workers(sdks, settings):
+    """Point new requests at hot-swapped SDK instances; returns the previous ones"""
+    global a2f_sdk, inference_sdks, inference_settings, segment_namespace, budget
+    previous = inference_sdks
+    inference_sdks, a2f_sdk, inference_settings = sdks, sdks[0], settings
+    segment_namespace = model_namespace(a2f_sdk)
+    # The worker count may have changed; the decode pool keeps its size
+    budget = thread_budget.plan(settings['inference_workers'], budget.decode_workers,
+                                cpu_affinity, prefork.worker_position()[1])
+    if config.THREAD_BUDGET:
+        thread_budget.apply(budget, settings.get('blas_threads'), settings.get('numba_threads'))
+    return previous
+
+# Models are replaced in the background while the old workers keep serving
+model_swapper = ModelSwapper(scheduler, build_workers, publish_workers, synthetic_clips()[0],
+                             drain_timeout=config.MODEL_SWAP_DRAIN_SECONDS)
+
+# Runtime health is checked in the background; /health serves the cached snapshot
+health_monitor = HealthMonitor(interval=config.HEALTH_INTERVAL_SECONDS)
+canary = Canary(scheduler, config.SAMPLE_RATE, seconds=config.HEALTH_CANARY_SECONDS,
+                slo_ms=config.HEALTH_CANARY_SLO_MS, timeout=config.HEALTH_CANARY_TIMEOUT_SECONDS)
+health_monitor.add_check("Inference Workers", worker_progress_check(scheduler), critical=True)
+health_monitor.add_check("Canary Inference", canary.inference_check, critical=False)
+health_monitor.add_check("Canary Latency", canary.latency_check, critical=False)
+health_monitor.add_check("Temp Directory", temp_dir_check(
+    config.TEMP_DIR, config.HEALTH_TEMP_DIR_MAX_MB, config.HEALTH_MIN_FREE_DISK_MB), critical=False)
+health_monitor.add_check("Memory", memory_check(config.HEALTH_MAX_RSS_MB), critical=False)
+health_monitor.add_check("Inference Queue", queue_check(scheduler, config.HEALTH_MAX_QUEUE_DEPTH), critical=False)
+health_monitor.start()
+prefork.mark_ready()
 
 @app.get("/")
 async def root():
@@ -79,12 +277,46 @@ async def root():
     }
 
 @app.get("/health")
-async def health():
+async def health(detail: str = "basic"):
+    """
+    Cached health snapshot (no checks run per request)
+
+    detail=lb returns only the status, with 503 unless healthy or degraded;
+    detail=basic (default) adds failing checks; detail=full adds every
+    check's metrics.
+    """
+    if detail not in DETAIL_LEVELS:
+        raise HTTPException(status_code=400, detail=f"detail must be one of {list(DETAIL_LEVELS)}")
+
+    snapshot = health_monitor.snapshot(detail)
+    if detail == "lb":
+        serving = snapshot["status"] in ("healthy", "degraded")
+        return JSONResponse(snapshot, status_code=200 if serving else 503)
+
+    return {**snapshot, "sdk_loaded": a2f_sdk is not None}
+
+@app.get("/stats")
+async def stats():
+    """Runtime counters"""
     return {
-        "status": "healthy" if a2f_sdk else "unhealthy",
-        "sdk_loaded": a2f_sdk is not None
+        "inference_settings": inference_settings,
+        "single_flight": single_flight.stats(),
+        "segment_cache": segment_cache.stats(),
+        "logging": log_stats(),
+        "process": prefork.process_stats(),
+        "thread_budget": {**budget.describe(), "effective": thread_budget.effective_limits()},
+        "scheduler": scheduler.stats() if scheduler else None,
+        "pipeline": pipeline_stats()
     }
 
+def pipeline_stats() -> Dict:
+    """Per-stage load; the stage with the highest utilization is the bottleneck"""
+    stages = {"decode": decode_pool.stats(), "serialize": serialize_pool.stats()}
+    if scheduler:
+        inference = scheduler.stats()
+        stages["inference"] = {key: inference[key] for key in ('workers', 'queue_depth', 'running', 'utilization')}
+    return {"stages": stages, "bottleneck": max(stages, key=lambda name: stages[name]["utilization"])}
+
 @app.get("/blendshape-names")
 async def get_blendshape_names():
     """Get list of blendshape names"""
@@ -93,71 +325,847 @@ async def get_blendshape_names():
 
     return {"blendshape_names": a2f_sdk.get_blendshape_names()}
 
-@app.post("/process-audio")
-async def process_audio(file: UploadFile = File(...)):
+@app.get("/rig-profiles")
+async def list_rig_profiles():
+    """Registered rig profiles"""
+    return {"profiles": [rig_profiles.get(name).describe() for name in rig_profiles.names()]}
+
+@app.get("/rig-profiles/{name}")
+async def get_rig_profile(name: str):
+    """A rig profile's definition"""
+    profile = resolve_rig(name)
+    return {**profile.describe(), "definition": profile.definition}
+
+@app.post("/rig-profiles")
+async def register_rig_profile(definition: Dict, x_admin_token: Optional[str] = Header(None)):
     """
-    Process audio file and return blendshape animation data
+    Register (or replace) a rig profile
 
-    Expected input: WAV file (any format, will be converted)
-    Returns: JSON with blendshapes, timestamps, and metadata
+    Body: {"name", "targets", "mapping" | "matrix", "gains", "clamp"}; see
+    rig_profiles.build_profile. Profiles are written to disk, so this needs
+    the admin token like /admin/model-swap.
     """
+    require_admin(x_admin_token)
     if not a2f_sdk:
         raise HTTPException(status_code=500, detail="SDK not initialized")
+    try:
+        profile = rig_profiles.register(definition)
+    except RigProfileError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.info("Registered rig profile", extra={'profile': profile.name, 'targets': len(profile.targets)})
+    return profile.describe()
 
-    # Validate file type
-    if not file.filename.endswith(('.wav', '.mp3', '.ogg', '.flac')):
-        raise HTTPException(status_code=400, detail="Only audio files supported")
+def resolve_rig(name: Optional[str]) -> Optional[RigProfile]:
+    """Rig profile by name (None passes through)"""
+    if name is None:
+        return None
+    profile = rig_profiles.get(name)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"Unknown rig profile '{name}'")
+    return profile
+
+# Settings a model swap may change; the rest carry over from the running workers
+SWAP_SETTINGS = {'model_path': str, 'use_gpu_solver': bool, 'window_seconds': (int, float), 'inference_workers': int}
 
+def require_admin(token: Optional[str]):
+    """Reject admin calls without the configured X-Admin-Token (disabled when none is configured)"""
+    if not config.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Admin endpoints are disabled (no ADMIN_TOKEN configured)")
+    if token is None or not hmac.compare_digest(token.encode(), config.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@app.post("/admin/model-swap", status_code=202)
+async def start_model_swap(changes: Dict, x_admin_token: Optional[str] = Header(None)):
+    """
+    Hot-swap the inference model without downtime
+
+    Body: any of {"model_path", "use_gpu_solver", "window_seconds",
+    "inference_workers"}. New workers are built and warmed in the background;
+    new requests switch to them at once while in-flight requests finish on
+    the old ones. Poll GET /admin/model-swap for progress and the report.
+
+    A swap only reaches the process that receives it, so it is refused
+    when the server runs several pre-forked processes (they would end up
+    serving different models); restart those with the new settings.
+    """
+    require_admin(x_admin_token)
+    if not a2f_sdk:
+        raise HTTPException(status_code=500, detail="SDK not initialized")
+    if prefork.worker_position()[1] > 1:
+        raise HTTPException(status_code=409, detail="Model swap is per process and the server runs "
+                            f"{prefork.worker_position()[1]} workers; restart them with the new settings instead")
+
+    for name, value in changes.items():
+        if name not in SWAP_SETTINGS:
+            raise HTTPException(status_code=400, detail=f"Cannot change '{name}'; allowed: {sorted(SWAP_SETTINGS)}")
+        # bool is an int subclass, so true/false would otherwise pass as a number
+        if not isinstance(value, SWAP_SETTINGS[name]) or (isinstance(value, bool) and SWAP_SETTINGS[name] is not bool):
+            raise HTTPException(status_code=400, detail=f"Invalid value for '{name}'")
+    if 'model_path' in changes and not (Path(changes['model_path']) / "model.json").exists():
+        raise HTTPException(status_code=400, detail=f"No model.json in {changes['model_path']}")
+    if changes.get('inference_workers', 1) < 1:
+        raise HTTPException(status_code=400, detail="inference_workers must be at least 1")
+    if not 0 <= changes.get('window_seconds', 0) < float('inf'):
+        raise HTTPException(status_code=400, detail="window_seconds must be 0 (whole clip) or a positive length")
+
+    settings = {**inference_settings, 'model_path': str(a2f_sdk.model_dir), **changes}
+    try:
+        status = model_swapper.start(settings)
+    except SwapInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    logger.info("Model swap started", extra={'changes': changes})
+    return status
+
+@app.get("/admin/model-swap")
+async def model_swap_status(x_admin_token: Optional[str] = Header(None)):
+    """Progress of the current or last model swap, with build/warm/switch/drain timings"""
+    require_admin(x_admin_token)
+    return model_swapper.status()
+
+def resolve_projection(rig: Optional[RigProfile], channels: Optional[str], frames: Optional[str] = None,
+                       time_range: Optional[str] = None, every: int = 1, fps: Optional[float] = None,
+                       names: Optional[List[str]] = None) -> Optional[Projection]:
+    """
+    Channel/frame selection for a response; channel names are the rig's when
+    one is given, else names (a stored track's), else the SDK's
+    """
+    names = rig.targets if rig else names or a2f_sdk.get_blendshape_names()
     try:
-        # Save uploaded file
-        temp_id = str(uuid.uuid4())
-        input_path = config.TEMP_DIR / f"{temp_id}_input{Path(file.filename).suffix}"
-        processed_path = config.TEMP_DIR / f"{temp_id}_processed.wav"
+        return parse_projection(names, fps or a2f_sdk.fps, channels, frames, time_range, every)
+    except ProjectionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
+def resolve_morph_layout(morph_targets: Optional[str], target_nodes: Optional[str],
+                         default_names: Optional[List[str]] = None):
+    """Morph layout for glTF export: explicit names from the request, else the avatar's, else default_names"""
+    if morph_targets:
+        names = [name.strip() for name in morph_targets.split(',') if name.strip()]
+        nodes = [node.strip() for node in (target_nodes or "Face").split(',') if node.strip()]
+        return [(node, names) for node in nodes]
+
+    if config.AVATAR_GLB_PATH.exists():
+        layout = read_morph_layout(str(config.AVATAR_GLB_PATH))
+        if layout:
+            return layout
+
+    return [("Face", default_names or a2f_sdk.get_blendshape_names())]
+
+def store_result(result: Dict, metadata: Dict) -> str:
+    """Persist a track with its channel names, so it can be served later without the SDK (blocking)"""
+    return result_store.put(result['blendshapes'], result['fps'],
+                            {**metadata, 'blendshape_names': a2f_sdk.get_blendshape_names()})
+
+def stored_channel_names(meta: Dict) -> List[str]:
+    """Channel names of a stored track (results stored before names were recorded fall back to the SDK's)"""
+    names = meta.get('blendshape_names')
+    if names is None and a2f_sdk and len(a2f_sdk.get_blendshape_names()) == meta['num_blendshapes']:
+        names = a2f_sdk.get_blendshape_names()
+    return names or [f"channel_{i}" for i in range(meta['num_blendshapes'])]
+
+def stage_timer():
+    """Stage timings for a request: (stages dict, mark(stage) recording ms since the previous mark)"""
+    stages = {}
+    stage_start = time.perf_counter()
+
+    def mark(stage: str):
+        nonlocal stage_start
+        now = time.perf_counter()
+        stages[stage] = round((now - stage_start) * 1000, 2)
+        stage_start = now
+
+    return stages, mark
+
+def decode_upload(content: bytes, audio_format: Optional[str], suffix: str, mark,
+                  cancel_token: Optional[CancelToken], progress: ProgressSink):
+    """Write, decode and preprocess an upload (blocking); returns (audio, sample_rate, duration)"""
+    # Save uploaded file
+    temp_id = str(uuid.uuid4())
+    input_path = config.TEMP_DIR / f"{temp_id}_input.{audio_format or suffix}"
+    processed_path = config.TEMP_DIR / f"{temp_id}_processed.wav"
+
+    def on_decoded(samples: np.ndarray, sample_rate: int):
+        progress.update('resample', samples=samples.shape[-1], input_sample_rate=sample_rate,
+                        audio_seconds=samples.shape[-1] / sample_rate)
+
+    try:
+        progress.update('decode', bytes=len(content))
         with open(input_path, "wb") as f:
-            content = await file.read()
             f.write(content)
-
-        print(f"Processing: {file.filename} ({len(content)} bytes)")
+        mark('write_ms')
+        check(cancel_token, "decode")
 
         # Load and preprocess audio
-        audio, sr = audio_processor.load_and_preprocess(str(input_path))
+        audio, sr = audio_processor.load_and_preprocess(str(input_path), audio_format, cancel_token, on_decoded)
         audio_processor.save_processed(audio, str(processed_path))
         duration = audio_processor.get_duration(audio, sr)
+        mark('decode_ms')
+    finally:
+        # Cleanup temp files
+        input_path.unlink(missing_ok=True)
+        processed_path.unlink(missing_ok=True)
 
-        print(f"Audio preprocessed: {duration:.2f}s @ {sr}Hz")
+    return audio, sr, duration
 
-        # Run Audio2Face inference
-        result = a2f_sdk.process_audio(audio)
+def window_tally(progress: ProgressSink) -> WindowTally:
+    """
+    Per-window inference progress for a request (options keep a job out of
+    batches, so single-window clips go without and count when they finish;
+    a lone single-window clip's progress is estimated from the measured rate)
+    """
+    return WindowTally(progress, lambda samples: sum(1 for _ in a2f_sdk.iter_windows(samples)))
 
-        print(f"Generated {len(result['blendshapes'])} frames @ {result['fps']}fps")
+async def run_pipeline(content: bytes, audio_format: Optional[str], suffix: str, filename: str,
+                       priority: str = "interactive", deadline: Optional[float] = None,
+                       cancel_token: Optional[CancelToken] = None,
+                       progress: Optional[ProgressSink] = None, document: Optional[str] = None) -> Dict:
+    """
+    Decode, preprocess, infer and store one upload
 
-        # Cleanup temp files
-        input_path.unlink(missing_ok=True)
-        processed_path.unlink(missing_ok=True)
+    Each step runs on its own stage (decode_pool, the scheduler's inference
+    workers, serialize_pool), and no thread is held while the request waits
+    between them. cancel_token is checked at every stage boundary, so work
+    nobody is waiting for any more stops at the next one. progress defaults
+    to the current request's channel (coalesced requests pass their group).
+    With a document key, unchanged chunks of that document's earlier
+    versions are reused (see segment_cache).
+    """
+    stages, mark = stage_timer()
+    progress = progress or progress_registry.current()
+    audio, sr, duration = await decode_pool.run(decode_upload, content, audio_format, suffix, mark,
+                                                cancel_token, progress)
+    check(cancel_token, "inference")
+    progress.update('queued', audio_seconds=duration)
 
-        # Return results
-        return JSONResponse({
-            "success": True,
-            "data": {
-                "blendshapes": result['blendshapes'].tolist(),
-                "timestamps": result['timestamps'].tolist(),
-                "fps": result['fps'],
-                "duration": result['duration'],
-                "num_frames": len(result['blendshapes']),
-                "blendshape_count": config.BLENDSHAPE_COUNT
-            },
-            "metadata": {
-                "original_filename": file.filename,
+    def started():
+        progress.update('inference')
+
+    # Run Audio2Face inference through the scheduler (shortest interactive job first),
+    # only for the parts of the clip not already in the segment cache
+    windows = window_tally(progress)
+
+    def submit(clip: np.ndarray):
+        infer_options, on_done = windows.track(len(clip))
+        future = scheduler.submit(clip, priority, deadline, cancel_token, infer_options, on_start=started)
+        future.add_done_callback(on_done)
+        return future
+
+    if segment_processor:
+        # Splices cached and fresh segments; the thread mostly waits on the scheduler
+        result, reused_fraction = await run_in_threadpool(segment_processor.process, audio, submit,
+                                                          segment_namespace, document)
+    else:
+        result, reused_fraction = await asyncio.wrap_future(submit(audio)), 0.0
+    mark('inference_ms')
+
+    progress.update('serialize', frames=int(result['num_frames']))
+    result_id = await serialize_pool.run(store_result, result, {
+        'original_filename': filename,
+        'audio_duration': duration
+    })
+
+    mark('store_ms')
+
+    logger.info("Processed audio", extra={
+        'request_id': request_id_var.get(),
+        'upload_filename': filename,
+        'bytes': len(content),
+        'format': audio_format or suffix,
+        'audio_duration': round(duration, 3),
+        'num_frames': int(result['num_frames']),
+        'priority': priority,
+        'reused_fraction': round(reused_fraction, 4),
+        'stages': stages
+    })
+
+    return {'result': result, 'result_id': result_id, 'duration': duration, 'sample_rate': sr,
+            'reused_fraction': reused_fraction}
+
+async def run_pcm_pipeline(data: bytes, sample_format: str, sample_rate: int, channels: int,
+                           priority: str = "interactive", deadline: Optional[float] = None,
+                           cancel_token: Optional[CancelToken] = None) -> Dict:
+    """Convert raw PCM in memory, infer and store, one stage at a time (see run_pipeline)"""
+    stages, mark = stage_timer()
+    progress = progress_registry.current()
+    samples = len(data) // (PCM_FORMATS[sample_format].itemsize * channels)
+    progress.update('decode', bytes=len(data), samples=samples, input_sample_rate=sample_rate,
+                    audio_seconds=samples / sample_rate)
+    audio = await decode_pool.run(audio_processor.from_pcm, data, sample_format, sample_rate, channels)
+    duration = audio_processor.get_duration(audio, config.SAMPLE_RATE)
+    mark('convert_ms')
+    check(cancel_token, "inference")
+    progress.update('queued', audio_seconds=duration)
+
+    infer_options, on_done = window_tally(progress).track(len(audio))
+    future = scheduler.submit(audio, priority, deadline, cancel_token, infer_options,
+                              on_start=lambda: progress.update('inference'))
+    future.add_done_callback(on_done)
+    result = await asyncio.wrap_future(future)
+    mark('inference_ms')
+
+    progress.update('serialize', frames=int(result['num_frames']))
+
+    result_id = await serialize_pool.run(store_result, result, {'audio_duration': duration})
+    mark('store_ms')
+
+    logger.info("Processed PCM", extra={
+        'request_id': request_id_var.get(),
+        'bytes': len(data),
+        'format': sample_format,
+        'input_sample_rate': sample_rate,
+        'audio_duration': round(duration, 3),
+        'num_frames': int(result['num_frames']),
+        'priority': priority,
+        'stages': stages
+    })
+
+    return {'result': result, 'result_id': result_id, 'duration': duration}
+
+def ndjson_line(obj: Dict) -> bytes:
+    return (json.dumps(obj, separators=(',', ':')) + "\n").encode('utf-8')
+
+async def stream_process_audio(content: bytes, audio_format: Optional[str], suffix: str, filename: str,
+                               priority: str, deadline: Optional[float], timeout: float,
+                               rig: Optional[RigProfile] = None,
+                               projection: Optional[Projection] = None) -> StreamingResponse:
+    """
+    Decode, then stream frames as NDJSON while inference runs window by window
+
+    Lines are {"type": "metadata", ...} first, then {"type": "frames", ...}
+    per finished window, then {"type": "end", "result_id": ...}, or
+    {"type": "error", ...} if inference fails after the response has started.
+    Decode and admission errors are still plain HTTP errors. With a rig
+    profile, every frames block is already in the rig's channel order; with a
+    projection, blocks carry only the selected channels and frames (blocks
+    left empty by a frame range are skipped).
+    """
+    request_id = request_id_var.get()
+    progress = progress_registry.current()
+    cancel_token = CancelToken()
+    stages, mark = stage_timer()
+    try:
+        audio, sr, duration = await decode_pool.run(
+            decode_upload, content, audio_format, suffix, mark, cancel_token, progress
+        )
+    except Exception as e:
+        raise processing_error(e)
+    progress.update('queued', audio_seconds=duration)
+
+    # Windows finish on an inference thread; hand them to this event loop
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+
+    def on_window(window: Dict):
+        progress.update(windows_done=window['window_index'] + 1, windows_total=window['num_windows'])
+        loop.call_soon_threadsafe(events.put_nowait, window)
+
+    try:
+        future = scheduler.submit(audio, priority, deadline, cancel_token, infer_options={
+            'on_window': on_window,
+            'window_seconds': config.STREAM_WINDOW_SECONDS
+        }, on_start=lambda: progress.update('inference'))
+    except Exception as e:
+        raise processing_error(e)
+    future.add_done_callback(lambda _: loop.call_soon_threadsafe(events.put_nowait, None))
+    fps = a2f_sdk.fps
+
+    async def body():
+        expires = time.monotonic() + timeout
+        try:
+            metadata = {
+                "type": "metadata",
+                "fps": fps,
+                "blendshape_count": len(rig.targets) if rig else config.BLENDSHAPE_COUNT,
+                "expected_frames": projection.count(int(duration * fps)) if projection else int(duration * fps),
                 "audio_duration": duration,
-                "sample_rate": sr
+                "sample_rate": sr,
+                "original_filename": filename
             }
-        })
+            if rig:
+                metadata.update(rig_profile=rig.name, blendshape_names=rig.targets)
+            if projection:
+                metadata.update(blendshape_count=len(projection.channel_names()),
+                                blendshape_names=projection.channel_names(),
+                                projection=projection.describe())
+            yield ndjson_line(metadata)
+
+            while True:
+                window = await asyncio.wait_for(events.get(), max(0.0, expires - time.monotonic()))
+                if window is None:
+                    break
+                if 'first_frame_ms' not in stages:
+                    mark('first_frame_ms')
+                frames, start, step = window['blendshapes'], window['start_frame'], 1
+                if projection:
+                    rows, start = projection.block_slice(start, len(frames))
+                    frames, step = frames[rows], projection.step
+                    if not len(frames):
+                        continue
+                if rig:
+                    frames = rig.apply(frames)
+                if projection:
+                    frames = projection.columns(frames)
+                yield ndjson_line({
+                    "type": "frames",
+                    "start_frame": start,
+                    "window_index": window['window_index'],
+                    "num_windows": window['num_windows'],
+                    "timestamps": ((start + step * np.arange(len(frames))) / fps).tolist(),
+                    "blendshapes": frames.tolist()
+                })
+
+            result = future.result()
+            mark('inference_ms')
+            progress.update('serialize', frames=int(result['num_frames']))
+            result_id = await serialize_pool.run(store_result, result, {
+                'original_filename': filename,
+                'audio_duration': duration
+            })
+            mark('store_ms')
+            yield ndjson_line({
+                "type": "end",
+                "result_id": result_id,
+                "num_frames": int(result['num_frames']),
+                "duration": result['duration']
+            })
+            logger.info("Streamed audio", extra={
+                'request_id': request_id,
+                'upload_filename': filename,
+                'bytes': len(content),
+                'audio_duration': round(duration, 3),
+                'num_frames': int(result['num_frames']),
+                'priority': priority,
+                'stages': stages
+            })
+        except asyncio.TimeoutError:
+            error = processing_error(RequestAbandoned('timeout', f"Request timed out after {timeout:g}s"))
+            progress.finish(error.detail)
+            yield ndjson_line({"type": "error", "status": error.status_code, "detail": error.detail})
+        except Exception as e:
+            error = processing_error(e)
+            # The response status is already 200; the progress channel must not report success
+            progress.finish(error.detail)
+            yield ndjson_line({"type": "error", "status": error.status_code, "detail": error.detail})
+        finally:
+            # Client went away (or we gave up): stop inference at the next window
+            if not future.done():
+                cancel_token.cancel("stream closed")
+
+    return StreamingResponse(body(), media_type="application/x-ndjson",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def blendshape_payload(result: Dict, result_id: str, metadata: Dict,
+                       rig: Optional[RigProfile] = None, projection: Optional[Projection] = None) -> Dict:
+    """
+    JSON body shared by the processing endpoints
+
+    Frames are selected before retargeting and channels after it, so only
+    the requested part of the track is ever converted to JSON.
+    """
+    blendshapes, timestamps = result['blendshapes'], result['timestamps']
+    if projection:
+        blendshapes, timestamps = projection.frames(blendshapes), projection.frames(timestamps)
+    if rig:
+        blendshapes = rig.apply(blendshapes)
+    if projection:
+        blendshapes = projection.columns(blendshapes)
+    data = {
+        "result_id": result_id,
+        "blendshapes": blendshapes.tolist(),
+        "timestamps": timestamps.tolist(),
+        "fps": result['fps'],
+        "duration": result['duration'],
+        "num_frames": len(blendshapes),
+        "blendshape_count": blendshapes.shape[1]
+    }
+    if rig:
+        data["rig_profile"] = rig.name
+        data["blendshape_names"] = rig.targets
+    if projection:
+        data["projection"] = projection.describe()
+        data["blendshape_names"] = projection.channel_names()
+    return {"success": True, "data": data, "metadata": metadata}
+
+def encode_payload(*args) -> bytes:
+    """blendshape_payload(*args) as JSON bytes, encoded the way JSONResponse would"""
+    return json.dumps(blendshape_payload(*args), ensure_ascii=False, allow_nan=False,
+                      separators=(",", ":")).encode("utf-8")
+
+async def payload_response(*args) -> Response:
+    """JSON response built and encoded on the serialize stage instead of the event loop"""
+    return Response(content=await serialize_pool.run(encode_payload, *args), media_type="application/json")
+
+def processing_error(e: Exception) -> HTTPException:
+    """HTTP error for an exception raised while processing a request"""
+    if isinstance(e, EmptyTrack):
+        return HTTPException(status_code=422, detail=str(e))
+    if isinstance(e, AdmissionRejected):
+        return HTTPException(status_code=503, detail=str(e),
+                             headers={"Retry-After": str(max(1, round(e.retry_after)))})
+    if isinstance(e, DeadlineExpired):
+        return HTTPException(status_code=504, detail=str(e))
+    if isinstance(e, RequestAbandoned):
+        logger.info("Request abandoned", extra={'reason': e.reason})
+        # 499: nginx's "client closed request"; nobody reads it, but logs do
+        return HTTPException(status_code=504 if e.reason == 'timeout' else 499, detail=str(e))
+    if isinstance(e, (Cancelled, WorkerHung)):
+        logger.warning("Processing cancelled", extra={'error': str(e)})
+        return HTTPException(status_code=503, detail=str(e))
+    logger.error("Processing failed", exc_info=e)
+    return HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
+
+@app.post("/process-audio")
+async def process_audio(
+    request: Request,
+    file: UploadFile = File(...),
+    output: str = "json",
+    morph_targets: Optional[str] = Form(None),
+    target_nodes: Optional[str] = Form(None),
+    precision: str = Form(config.GLTF_PRECISION),
+    priority: str = "interactive",
+    deadline_ms: Optional[int] = Query(None, gt=0),
+    timeout_ms: Optional[int] = Query(None, gt=0),
+    stream: Optional[str] = None,
+    rig: Optional[str] = None,
+    channels: Optional[str] = None,
+    frames: Optional[str] = None,
+    time_range: Optional[str] = Query(None, alias="time"),
+    every: int = 1,
+    document: Optional[str] = Query(None, min_length=1, max_length=128)
+):
+    """
+    Process audio file and return blendshape animation data
+
+    Expected input: WAV file (any format, will be converted)
+    Returns: JSON with blendshapes, timestamps, and metadata, or with
+    ?output=glb a 303 redirect to GET /results/{id}.glb, which serves the
+    track baked as a morph-target animation (ordering from
+    morph_targets/target_nodes, default: avatar.glb)
+
+    priority ('interactive' or 'bulk') selects the scheduling class; with
+    deadline_ms the request is dropped if inference has not started in time.
+    timeout_ms (default REQUEST_TIMEOUT_SECONDS) bounds the whole request; on
+    timeout or client disconnect the work is cancelled at its next stage
+    boundary unless another identical request is still waiting for it.
+    With ?stream=ndjson, frames are streamed as each inference window
+    finishes (see stream_process_audio) so playback can start early.
+    With ?rig=<profile>, channels come back in that rig profile's
+    morph-target order (see /rig-profiles).
+    JSON output can be narrowed with channels=<names and groups, e.g.
+    mouth,jaw>, frames=<start:end> or time=<seconds:seconds>, and
+    every=<n> to keep every nth frame (see projection.parse_projection).
+    With ?document=<key>, a re-submitted (edited) version of the same clip
+    only re-infers the chunks that changed since the last version sent with
+    that key; without one the clip is always inferred whole.
+    """
+    if not a2f_sdk:
+        raise HTTPException(status_code=500, detail="SDK not initialized")
+
+    if output not in ("json", "glb"):
+        raise HTTPException(status_code=400, detail="output must be 'json' or 'glb'")
+    if stream not in (None, "ndjson") or (stream and output != "json"):
+        raise HTTPException(status_code=400, detail="stream must be 'ndjson', with output=json")
+    if output == "glb" and precision not in PRECISIONS:
+        raise HTTPException(status_code=400, detail=f"precision must be one of {list(PRECISIONS)}")
+    if priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"priority must be one of {list(PRIORITIES)}")
+    rig_profile = resolve_rig(rig)
+    projection = resolve_projection(rig_profile, channels, frames, time_range, every)
+    if projection and output != "json":
+        raise HTTPException(status_code=400, detail="channels, frames, time and every apply to output=json")
+    deadline = time.monotonic() + deadline_ms / 1000 if deadline_ms else None
+    timeout = timeout_ms / 1000 if timeout_ms else config.REQUEST_TIMEOUT_SECONDS
+
+    content = await file.read()
+
+    # Validate file type from the container's magic bytes, falling back to the
+    # filename suffix for streams we cannot sniff (e.g. headerless MP3)
+    suffix = Path(file.filename or "").suffix.lower().lstrip('.')
+    audio_format = sniff_format(content[:16])
+    if audio_format is None and suffix not in SUPPORTED_FORMATS:
+        raise HTTPException(status_code=400, detail="Only audio files supported")
+
+    if stream:
+        return await stream_process_audio(content, audio_format, suffix, file.filename,
+                                          priority, deadline, timeout, rig_profile, projection)
+
+    try:
+        # Identical uploads in flight at the same time share one decode + inference;
+        # the key covers every setting that changes output (the segment cache's
+        # namespace: model, character, solver, windowing), so a request never
+        # receives a result computed before a hot-swap or retune
+        key = request_key(content, namespace=segment_namespace, document=document)
+        # Every request waiting on the computation follows its progress, not only the leader
+        progress = progress_registry.current()
+        shared_progress = progress_registry.join(key, progress)
+        try:
+            processed = await guard(single_flight.do(key, lambda cancel_token: run_pipeline(
+                content, audio_format, suffix, file.filename, priority, deadline, cancel_token, shared_progress,
+                document
+            )), timeout, request.is_disconnected)
+        finally:
+            progress_registry.leave(key, progress)
+        result = processed['result']
+        result_id = processed['result_id']
+        duration = processed['duration']
+        sr = processed['sample_rate']
+
+        if output == "glb":
+            # The clip is served (and cached, conditionally) by GET /results/{id}.glb;
+            # 303 makes clients fetch it with a GET
+            query = {"precision": precision, "rig": rig, "morph_targets": morph_targets,
+                     "target_nodes": target_nodes}
+            query = urlencode({name: value for name, value in query.items() if value is not None})
+            return RedirectResponse(f"/results/{result_id}.glb?{query}", status_code=303, headers={
+                "X-Result-Id": result_id,
+                "X-Reused-Fraction": f"{processed['reused_fraction']:.4f}"
+            })
+
+        # Return results
+        return await payload_response(result, result_id, {
+            "original_filename": file.filename,
+            "audio_duration": duration,
+            "sample_rate": sr,
+            "reused_fraction": round(processed['reused_fraction'], 4)
+        }, rig_profile, projection)
 
     except Exception as e:
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
+        raise processing_error(e)
+
+@app.post("/process-pcm")
+async def process_pcm(
+    request: Request,
+    x_sample_rate: int = Header(config.SAMPLE_RATE, gt=0),
+    x_sample_format: str = Header("s16le"),
+    x_channels: int = Header(1, gt=0),
+    priority: str = "interactive",
+    deadline_ms: Optional[int] = Query(None, gt=0),
+    timeout_ms: Optional[int] = Query(None, gt=0),
+    rig: Optional[str] = None,
+    channels: Optional[str] = None,
+    frames: Optional[str] = None,
+    time_range: Optional[str] = Query(None, alias="time"),
+    every: int = 1
+):
+    """
+    Process raw PCM and return blendshape animation data
+
+    Expected input: application/octet-stream body of interleaved little-endian
+    samples, described by X-Sample-Format (s16le or f32le), X-Sample-Rate and
+    X-Channels. Skips multipart parsing, temp files and container decoding;
+    16kHz mono s16le (typical TTS output) needs no resampling at all.
+    Returns: Same JSON as /process-audio (including ?rig=<profile> and the
+    channels/frames/time/every selection)
+    """
+    if not a2f_sdk:
+        raise HTTPException(status_code=500, detail="SDK not initialized")
+    rig_profile = resolve_rig(rig)
+    projection = resolve_projection(rig_profile, channels, frames, time_range, every)
+
+    if x_sample_format not in PCM_FORMATS:
+        raise HTTPException(status_code=400, detail=f"X-Sample-Format must be one of {list(PCM_FORMATS)}")
+    if priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"priority must be one of {list(PRIORITIES)}")
+    deadline = time.monotonic() + deadline_ms / 1000 if deadline_ms else None
+    timeout = timeout_ms / 1000 if timeout_ms else config.REQUEST_TIMEOUT_SECONDS
+
+    data = await request.body()
+    if not data:
+        raise HTTPException(status_code=400, detail="Empty body")
+    if len(data) % (PCM_FORMATS[x_sample_format].itemsize * x_channels):
+        raise HTTPException(status_code=400, detail="Body is not a whole number of sample frames")
+
+    try:
+        cancel_token = CancelToken()
+        try:
+            processed = await guard(run_pcm_pipeline(
+                data, x_sample_format, x_sample_rate, x_channels, priority, deadline, cancel_token
+            ), timeout, request.is_disconnected)
+        except RequestAbandoned as e:
+            cancel_token.cancel(e.reason)
+            raise
+
+        return await payload_response(processed['result'], processed['result_id'], {
+            "audio_duration": processed['duration'],
+            "sample_rate": config.SAMPLE_RATE,
+            "input_sample_rate": x_sample_rate
+        }, rig_profile, projection)
+
+    except Exception as e:
+        raise processing_error(e)
+
+@app.get("/progress")
+async def list_progress():
+    """Progress of the requests being processed right now"""
+    return {"requests": progress_registry.active()}
+
+@app.get("/progress/{request_id}")
+async def stream_progress(request_id: str):
+    """
+    Server-sent events with the progress of one request
+
+    Subscribe with the X-Request-Id the request is (or will be) sent with;
+    subscribing first is how a client sees its own upload. Events are
+    `progress` (stage, percent, eta_seconds, byte/sample/window counts),
+    then a final `done` or `error` (see ProgressRegistry.events).
+    """
+    if len(request_id) > 128:
+        raise HTTPException(status_code=400, detail="Request id too long")
+    return StreamingResponse(progress_registry.events(request_id, config.PROGRESS_HEARTBEAT_SECONDS),
+                             media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# Registered before /results/{result_id}, which would otherwise match "<id>.glb"
+@app.get("/results/{result_id}.glb")
+async def get_result_glb(
+    request: Request,
+    result_id: str,
+    morph_targets: Optional[str] = None,
+    target_nodes: Optional[str] = None,
+    precision: str = config.GLTF_PRECISION,
+    rig: Optional[str] = None
+):
+    """
+    A stored track baked into a glTF morph-target animation (GLB)
+
+    Stored results never change, so the ETag is a hash of everything the
+    clip is baked from (result id, rig profile, morph layout, precision) and
+    If-None-Match is answered with 304 before any baking. Responses are
+    revalidated rather than cached blindly, since a rig profile or the
+    avatar may be replaced.
+    """
+    if precision not in PRECISIONS:
+        raise HTTPException(status_code=400, detail=f"precision must be one of {list(PRECISIONS)}")
+    rig_profile = resolve_rig(rig)
+    try:
+        meta = result_store.metadata(result_id)
+    except ResultNotFound:
+        raise HTTPException(status_code=404, detail="Result not found")
+
+    stored_names = stored_channel_names(meta)
+    layout = resolve_morph_layout(morph_targets, target_nodes, stored_names)
+    etag = glb_etag(json.dumps([result_id, rig_profile.definition if rig_profile else None, layout, precision],
+                               sort_keys=True).encode('utf-8'))
+    headers = {"ETag": etag, "Cache-Control": "public, no-cache", "X-Result-Id": result_id}
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    blendshapes = result_store.frames(result_id, 0, meta['num_frames'])
+    timestamps = np.arange(meta['num_frames']) / meta['fps']
+    # A rig profile retargets first; its target names then drive the layout match
+    if rig_profile:
+        blendshapes, source_names = rig_profile.apply(blendshapes), rig_profile.targets
+    else:
+        source_names = stored_names
+    clip_name = Path(meta.get('original_filename') or "speech").stem.replace('"', '') or "speech"
+    try:
+        glb = await serialize_pool.run(bake_glb, blendshapes, timestamps, source_names, layout,
+                                       clip_name=clip_name, precision=precision)
+    except Exception as e:
+        raise processing_error(e)
+    logger.info("Baked GLB animation", extra={'bytes': len(glb), 'target_nodes': len(layout)})
+    return Response(
+        content=glb,
+        media_type="model/gltf-binary",
+        headers={**headers, "Content-Disposition": f'attachment; filename="{clip_name}.glb"'}
+    )
+
+@app.get("/results/{result_id}")
+async def get_result(result_id: str):
+    """Metadata of a stored result"""
+    try:
+        return result_store.metadata(result_id)
+    except ResultNotFound:
+        raise HTTPException(status_code=404, detail="Result not found")
+
+@app.get("/results/{result_id}/frames")
+async def get_result_frames(
+    result_id: str,
+    start: int = Query(0, ge=0),
+    end: Optional[int] = Query(None, ge=0),
+    format: str = "json",
+    rig: Optional[str] = None,
+    channels: Optional[str] = None,
+    every: int = 1,
+    range_header: Optional[str] = Header(None, alias="Range")
+):
+    """
+    Serve a window of a stored track without loading the whole of it
+
+    The window is frames [start, end), or an HTTP Range header which takes
+    precedence: 'frames=a-b' (inclusive) for a frame window, or 'bytes=a-b'
+    over the raw row-major float32 payload (other units are ignored). format=binary returns raw
+    little-endian float32 rows instead of JSON. rig=<profile> retargets
+    frame windows (not byte ranges, which address the stored SDK layout);
+    channels and every narrow a frame window the same way as on
+    /process-audio.
+    """
+    rig_profile = resolve_rig(rig)
+    try:
+        meta = result_store.metadata(result_id)
+    except ResultNotFound:
+        raise HTTPException(status_code=404, detail="Result not found")
+    projection = resolve_projection(rig_profile, channels, every=every, fps=meta['fps'],
+                                    names=stored_channel_names(meta))
+
+    num_frames = meta['num_frames']
+    row_bytes = meta['num_blendshapes'] * 4
+    status_code = 200
+    headers = {"Accept-Ranges": "bytes, frames"}
+
+    # A range in a unit we don't serve is ignored: the full window is sent with 200 (RFC 9110)
+    unit = range_header.partition('=')[0].strip().lower() if range_header else None
+    if unit in ('bytes', 'frames'):
+        total = num_frames * row_bytes if unit == 'bytes' else num_frames
+        try:
+            unit, first, last = parse_range(range_header, total)
+        except ValueError as e:
+            raise HTTPException(status_code=416, detail=str(e),
+                                headers={"Content-Range": f"{unit} */{total}"})
+        status_code = 206
+        headers["Content-Range"] = f"{unit} {first}-{last - 1}/{total}"
+
+        if unit == 'bytes':
+            payload = result_store.read_bytes(result_id, first, last - first)
+            return Response(content=payload, status_code=206,
+                            media_type="application/octet-stream", headers=headers)
+        start, end = first, last
+    else:
+        end = num_frames if end is None else min(end, num_frames)
+        if start >= end and num_frames > 0:
+            raise HTTPException(status_code=416, detail=f"Empty frame window [{start}, {end})")
+
+    frames = result_store.frames(result_id, start, end)
+    frame_index = np.arange(start, start + len(frames))
+    if projection:
+        frames, frame_index = projection.frames(frames), projection.frames(frame_index)
+    if rig_profile:
+        frames = rig_profile.apply(frames)
+        headers["X-Rig-Profile"] = rig_profile.name
+    if projection:
+        frames = projection.columns(frames)
+        headers["X-Frame-Step"] = str(every)
+    headers.update({
+        "X-Frame-Start": str(start),
+        "X-Frame-Count": str(len(frames)),
+        "X-Num-Frames": str(num_frames),
+        "X-FPS": str(meta['fps'])
+    })
+
+    if format == "binary":
+        return Response(content=frames.astype('<f4').tobytes(), status_code=status_code,
+                        media_type="application/octet-stream", headers=headers)
+
+    return JSONResponse({
+        "result_id": result_id,
+        "start": start,
+        "end": end,
+        "num_frames": num_frames,
+        "fps": meta['fps'],
+        "blendshapes": frames.tolist(),
+        "timestamps": (frame_index / meta['fps']).tolist(),
+        **({"blendshape_names": projection.channel_names()} if projection else {})
+    }, status_code=status_code, headers=headers)
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host=config.HOST, port=config.PORT)
+    uvicorn.run(app, host=launch_args.host, port=launch_args.port)
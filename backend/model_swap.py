@@ -0,0 +1,125 @@
+"""
+Model Hot-Swap
+Replace the inference bundles without restarting the backend: new
+Audio2FaceSDK instances are built and warmed in the background, the
+scheduler switches to them in one step, in-flight jobs drain on the old
+workers, and the old bundles are then released
+
+While a swap runs, both generations are resident (double buffering), so the
+host needs memory for two sets of bundles.
+"""
+
+import time
+import threading
+import numpy as np
+from typing import Callable, Dict, List, Optional
+
+from structured_logging import get_logger
+
+logger = get_logger(__name__)
+
+SWAP_STATES = ('idle', 'building', 'warming', 'switching', 'draining', 'complete', 'failed')
+
+class SwapInProgress(Exception):
+    """Raised when a swap is requested while another is still running"""
+
+class ModelSwapper:
+    """Runs one hot-swap at a time on a background thread and reports its progress"""
+
+    def __init__(self, scheduler, build: Callable[[Dict], List], on_switch: Callable[[List, Dict], List],
+                 warmup_audio: np.ndarray, drain_timeout: float = 300.0):
+        """
+        Args:
+            scheduler: InferenceScheduler whose workers are swapped
+            build: Builds the new Audio2FaceSDK instances from settings
+            on_switch: Publishes the new instances and settings, returning the
+                       previous instances
+            warmup_audio: Clip each new instance runs before taking traffic
+            drain_timeout: Longest wait for in-flight jobs on the old workers
+        """
+        self.scheduler = scheduler
+        self.build = build
+        self.on_switch = on_switch
+        self.warmup_audio = warmup_audio
+        self.drain_timeout = drain_timeout
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.report: Dict = {'state': 'idle'}
+        self.swaps = 0
+
+    def start(self, settings: Dict) -> Dict:
+        """
+        Begin swapping to workers built from settings
+
+        Raises:
+            SwapInProgress: Another swap has not finished yet
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                raise SwapInProgress(f"Model swap already {self.report['state']}")
+            self.report = {'state': 'building', 'settings': settings, 'started_at': time.time()}
+            self._thread = threading.Thread(target=self._run, args=(settings,), name="model-swap", daemon=True)
+            self._thread.start()
+            return dict(self.report)
+
+    def status(self) -> Dict:
+        """Progress of the current or last swap"""
+        report = dict(self.report)
+        if self.scheduler is not None and 'rate_before' in report:
+            # Measured inference seconds per audio second, before vs. now
+            report['rate_now'] = self.scheduler.stats()['inference_seconds_per_audio_second']
+        report['swaps_completed'] = self.swaps
+        return report
+
+    def _set(self, **fields):
+        self.report = {**self.report, **fields}
+
+    def _run(self, settings: Dict):
+        new_sdks: List = []
+        try:
+            start = time.perf_counter()
+            new_sdks = self.build(settings)
+            self._set(state='warming', build_seconds=round(time.perf_counter() - start, 3))
+
+            # First call pays lazy allocation; the second is the steady-state latency
+            warm_ms = []
+            for sdk in new_sdks:
+                sdk.process_audio(self.warmup_audio)
+                call = time.perf_counter()
+                sdk.process_audio(self.warmup_audio)
+                warm_ms.append(round((time.perf_counter() - call) * 1000, 2))
+            self._set(state='switching', warm_latency_ms=warm_ms)
+
+            rate_before = self.scheduler.stats()['inference_seconds_per_audio_second']
+            switch = time.perf_counter()
+            old_threads = self.scheduler.swap_workers([
+                (sdk.process_audio, sdk.process_batch if sdk.supports_native_batching() else None)
+                for sdk in new_sdks
+            ])
+            old_sdks = self.on_switch(new_sdks, settings)
+            switch_ms = round((time.perf_counter() - switch) * 1000, 3)
+            self._set(state='draining', switch_ms=switch_ms, rate_before=rate_before)
+            logger.info("Switched to new inference workers", extra={'switch_ms': switch_ms, 'workers': len(new_sdks)})
+
+            drain = time.perf_counter()
+            deadline = time.monotonic() + self.drain_timeout
+            for thread in old_threads:
+                thread.join(max(0.0, deadline - time.monotonic()))
+            drained = not any(thread.is_alive() for thread in old_threads)
+
+            # A worker still running past the timeout keeps its bundle until it
+            # finishes; the garbage collector frees it then
+            if drained:
+                for sdk in old_sdks:
+                    sdk.release()
+
+            self.swaps += 1
+            self._set(state='complete', drain_seconds=round(time.perf_counter() - drain, 3),
+                      drained=drained, finished_at=time.time())
+            logger.info("Model swap complete", extra={k: v for k, v in self.report.items() if k != 'state'})
+
+        except Exception as e:
+            for sdk in new_sdks:
+                sdk.release()
+            self._set(state='failed', error=str(e), finished_at=time.time())
+            logger.error("Model swap failed; still serving the previous model", exc_info=e)
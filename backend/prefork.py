@@ -0,0 +1,238 @@
+"""
+Pre-fork Launcher
+Serve the API from several worker processes forked from one parent
+
+`uvicorn --workers N` spawns fresh interpreters, so every worker re-imports
+librosa, SciPy and the SDK binding and re-runs the startup checks. Here the
+parent does that once, freezes its heap, and forks; workers share those
+pages copy-on-write and only build what cannot cross a fork: the CUDA
+context and the SDK bundles, plus their own threads. Each worker then
+imports the app as `main` and serves from a listening socket bound by the
+parent.
+
+Everything the app keeps in memory is therefore per worker: the result
+store's size accounting, the segment cache and single-flight coalescing.
+Progress channels and rig profiles are shared through files (see
+progress.ProgressRegistry and rig_profiles.RigProfileRegistry), while /admin/model-swap is refused
+with more than one worker because it would only swap the one that
+received it.
+"""
+
+import gc
+import os
+import sys
+import time
+import signal
+import socket
+import traceback
+from typing import Dict, Optional, Tuple
+
+# Workers that die this soon after forking are failing to boot; respawning
+# them would only loop
+MIN_WORKER_LIFETIME = 5.0
+
+_worker_index: Optional[int] = None
+_worker_count = 1
+_ready_seconds: Optional[float] = None
+
+def is_worker() -> bool:
+    """True inside a worker forked by launch()"""
+    return _worker_index is not None
+
+def worker_position() -> Tuple[Optional[int], int]:
+    """(this worker's index or None, number of server processes)"""
+    return _worker_index, _worker_count
+
+def _process_age() -> Optional[float]:
+    """Seconds since this process started (since the fork, for a worker)"""
+    try:
+        with open('/proc/self/stat') as f:
+            # Field 22, counted after the parenthesized command name
+            start_ticks = int(f.read().rpartition(')')[2].split()[19])
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return None
+
+def memory_usage(pid: str = 'self') -> Dict:
+    """
+    RSS, plus PSS and private memory where the kernel reports them
+
+    PSS charges each shared page to its sharers in equal parts, so the PSS
+    of all workers adds up to their real footprint; RSS double-counts pages
+    shared copy-on-write.
+    """
+    fields = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                name, _, value = line.partition(':')
+                if value.strip().endswith('kB'):
+                    fields[name] = int(value.split()[0]) / 1024
+    except OSError:
+        pass
+    if not fields:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {'rss_mb': round((peak if sys.platform == 'darwin' else peak * 1024) / 2**20, 1)}
+    return {
+        'rss_mb': round(fields.get('Rss', 0), 1),
+        'pss_mb': round(fields.get('Pss', 0), 1),
+        'private_mb': round(fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0), 1),
+        'shared_mb': round(fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0), 1)
+    }
+
+def mark_ready():
+    """Record boot time (call once the app is fully initialized)"""
+    global _ready_seconds
+    _ready_seconds = _process_age()
+    label = f"Worker {_worker_index}" if is_worker() else "Backend"
+    boot = f" in {_ready_seconds:.2f}s" if _ready_seconds is not None else ""
+    memory = memory_usage()
+    print(f"✓ {label} (pid {os.getpid()}) ready{boot}, "
+          + ", ".join(f"{name[:-3].upper()} {value:.0f}MB" for name, value in memory.items()))
+
+def process_stats() -> Dict:
+    """Boot time and memory of this process, for /stats"""
+    return {
+        'pid': os.getpid(),
+        'worker': _worker_index,
+        'boot_seconds': round(_ready_seconds, 3) if _ready_seconds is not None else None,
+        **memory_usage()
+    }
+
+def _prepare():
+    """Expensive, fork-safe setup shared by every worker"""
+    from config import config
+    from health_validator import run_all_checks
+    from audio_utils import AudioProcessor
+    import numpy as np
+
+    print("\n" + "="*60)
+    print("Audio2Face Backend - Startup Validation (pre-fork launcher)")
+    print("="*60 + "\n")
+    validator = run_all_checks(verbose=True)
+    if not validator.is_healthy():
+        print("\n❌ Critical issues detected. Backend may not function properly.\n")
+
+    # Load (but do not initialize) CUDA and the binding: mapping the shared
+    # libraries is fork-safe, creating a CUDA context is not
+    try:
+        from cuda_init_fix import preload_cuda_libraries
+        preload_cuda_libraries()
+        import audio2face_py  # noqa: F401
+    except Exception as e:
+        print(f"⚠ SDK libraries not preloaded: {e}")
+
+    # First boot on a host: tune in a throwaway child so the parent never
+    # touches CUDA; workers then read the cached result
+    if config.AUTOTUNE_ON_STARTUP:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                from autotune import load_or_tune
+                load_or_tune()
+            except Exception:
+                traceback.print_exc()
+                code = 1
+            os._exit(code)
+        os.waitpid(pid, 0)
+
+    # Run the decode path once so resampling filters and JIT-compiled
+    # kernels exist before the fork instead of once per worker
+    t = np.arange(44100, dtype=np.float32) / 44100
+    AudioProcessor.preprocess(np.stack([np.sin(2 * np.pi * 220 * t)] * 2), 44100)
+
+def _serve_worker(index: int, sock: socket.socket, host: str, port: int):
+    """Worker process body: build per-process state, then serve until told to stop"""
+    global _worker_index
+    _worker_index = index
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    code = 0
+    try:
+        import uvicorn
+        import main
+        server = uvicorn.Server(uvicorn.Config(main.app, host=host, port=port, log_config=None))
+        server.run(sockets=[sock])
+    except Exception:
+        traceback.print_exc()
+        code = 1
+    finally:
+        sys.stdout.flush()
+        os._exit(code)
+
+def _spawn(index: int, sock: socket.socket, host: str, port: int) -> int:
+    pid = os.fork()
+    if pid == 0:
+        _serve_worker(index, sock, host, port)
+    return pid
+
+def launch(workers: int, host: str, port: int):
+    """
+    Prepare once, fork workers sharing one listening socket, and supervise them
+
+    Crashed workers are replaced; SIGINT/SIGTERM are forwarded to every
+    worker and the launcher exits once they have shut down. Never returns.
+    """
+    global _worker_count
+    started = time.perf_counter()
+    _worker_count = workers
+    _prepare()
+
+    sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    # Objects created so far are never collected in the workers, so the
+    # collector does not touch (and un-share) their pages
+    gc.collect()
+    gc.freeze()
+    print(f"✓ Launcher prepared in {time.perf_counter() - started:.2f}s "
+          f"({memory_usage()['rss_mb']:.0f}MB); forking {workers} workers on {host}:{port}\n")
+
+    children: Dict[int, tuple] = {}
+    for index in range(workers):
+        children[_spawn(index, sock, host, port)] = (index, time.monotonic())
+
+    stopping = failed = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        if pid not in children:
+            continue
+        index, born = children.pop(pid)
+        if stopping:
+            continue
+        code = os.waitstatus_to_exitcode(status)
+        if time.monotonic() - born < MIN_WORKER_LIFETIME:
+            print(f"✗ Worker {index} exited during boot (status {code}); shutting down")
+            failed = True
+            stop(None, None)
+            continue
+        print(f"⚠ Worker {index} (pid {pid}) exited with status {code}; replacing it")
+        children[_spawn(index, sock, host, port)] = (index, time.monotonic())
+
+    sock.close()
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,481 @@
+"""
+Request Progress
+Stage-by-stage progress of in-flight requests, published as server-sent events
+
+Every processing request gets a channel keyed by its request id (the
+client's X-Request-Id, so a client can subscribe before it uploads). The
+pipeline reports stage transitions - upload, decode, resample, queued,
+inference (per window for multi-window clips), serialize - with byte and
+sample counts; percent done and the estimated time remaining are derived
+from them and the scheduler's measured real-time factor. Finished channels
+linger for a while so a late subscriber still sees the outcome.
+
+Identical uploads coalesced onto one computation share a ProgressGroup, so
+every waiting request id sees the computation's stages, not just the
+leader's.
+
+Channels live in the memory of one server process. Under the pre-fork
+launcher a subscriber usually reaches a different worker than its upload,
+so with a shared directory every channel also writes its snapshot to a
+small JSON file there, and a worker streaming a request it does not run
+follows that file instead.
+"""
+
+import os
+import json
+import time
+import hashlib
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from structured_logging import request_id_var
+
+STAGES = ('pending', 'upload', 'decode', 'resample', 'queued', 'inference', 'serialize', 'done')
+
+# Percent range covered by each stage; inference dominates every real request
+STAGE_SPAN = {
+    'pending': (0, 0),
+    'upload': (0, 10),
+    'decode': (10, 15),
+    'resample': (15, 20),
+    'queued': (20, 20),
+    'inference': (20, 95),
+    'serialize': (95, 100),
+    'done': (100, 100)
+}
+
+class Progress:
+    """Progress of one request; updated from any thread, watched from event loops"""
+
+    def __init__(self, request_id: str, rate: Callable[[], float], queue_wait: Callable[[], float],
+                 publish: Optional[Callable[['Progress'], None]] = None):
+        """
+        Args:
+            request_id: Channel key
+            rate: Measured inference seconds per audio second
+            queue_wait: Expected seconds until queued work reaches a worker
+            publish: Called after every change (shares the channel with other processes)
+        """
+        self.request_id = request_id
+        self.stage = 'pending'
+        self.fields: Dict = {}
+        self.error: Optional[str] = None
+        self.version = 0
+        self.created = time.monotonic()
+        self.stage_started = self.created
+        self.finished: Optional[float] = None
+        self._rate = rate
+        self._queue_wait = queue_wait
+        self._publish = publish
+        self._lock = threading.Lock()
+        self._watchers: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
+
+    def update(self, stage: Optional[str] = None, **fields):
+        """Move to stage (if given) and record counters such as bytes_received or windows_done"""
+        self._change(stage, fields)
+
+    def finish(self, error: Optional[str] = None):
+        """Close the channel as done, or failed with error"""
+        if error is None:
+            self._change('done', {})
+        else:
+            self._change(None, {'error': error}, error)
+
+    def _change(self, stage: Optional[str], fields: Dict, error: Optional[str] = None):
+        with self._lock:
+            if self.finished is not None:
+                return
+            now = time.monotonic()
+            if stage and stage != self.stage:
+                self.stage = stage
+                self.stage_started = now
+            self.fields.update(fields)
+            if stage == 'done' or error is not None:
+                self.error = error
+                self.finished = now
+            self.version += 1
+            watchers = list(self._watchers)
+        for loop, event in watchers:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # That watcher's event loop is gone
+        if self._publish is not None:
+            self._publish(self)
+
+    def watch(self) -> asyncio.Event:
+        """Event set on the calling loop whenever the progress changes"""
+        event = asyncio.Event()
+        with self._lock:
+            self._watchers.append((asyncio.get_running_loop(), event))
+        return event
+
+    def unwatch(self, event: asyncio.Event):
+        with self._lock:
+            self._watchers = [(loop, e) for loop, e in self._watchers if e is not event]
+
+    def _inference_fraction(self, now: float, expected: float) -> float:
+        """Share of inference done: by windows when reported, else by time at the measured rate"""
+        total = self.fields.get('windows_total') or 0
+        if total > 1:
+            return self.fields.get('windows_done', 0) / total
+        if expected <= 0:
+            return 0.0
+        # Never claim completion before the result is actually there
+        return min(0.95, (now - self.stage_started) / expected)
+
+    def _estimate(self, now: float) -> Tuple[float, Optional[float]]:
+        """(percent done, seconds remaining or None while the audio length is unknown)"""
+        low, high = STAGE_SPAN.get(self.stage, (0, 0))
+        audio = self.fields.get('audio_seconds')
+        expected = audio * self._rate() if audio is not None else 0.0
+        fraction, eta = 0.0, None
+
+        if self.stage == 'upload' and self.fields.get('bytes_total'):
+            fraction = self.fields.get('bytes_received', 0) / self.fields['bytes_total']
+        elif self.stage == 'inference':
+            fraction = self._inference_fraction(now, expected)
+        elif self.stage == 'done':
+            fraction, eta = 1.0, 0.0
+
+        if audio is not None and self.stage != 'done':
+            if self.stage == 'inference':
+                eta = expected * (1 - fraction)
+            elif self.stage == 'serialize':
+                eta = 0.0
+            else:
+                eta = self._queue_wait() + expected
+        return low + (high - low) * min(1.0, fraction), eta
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            now = self.finished or time.monotonic()
+            percent, eta = self._estimate(now)
+            state = {
+                'request_id': self.request_id,
+                'stage': self.stage,
+                'percent': round(percent, 1),
+                'eta_seconds': round(eta, 2) if eta is not None else None,
+                'elapsed_seconds': round(now - self.created, 3),
+                'stage_seconds': round(now - self.stage_started, 3),
+                **self.fields
+            }
+            if self.finished is not None:
+                state['finished'] = True
+        return state
+
+class ProgressGroup:
+    """
+    Progress of one computation shared by several requests
+
+    update() reaches every member channel; a channel that joins late first
+    catches up with the stage and counters reported so far.
+    """
+
+    def __init__(self):
+        self.stage: Optional[str] = None
+        self.fields: Dict = {}
+        self._members: List[Progress] = []
+        self._lock = threading.Lock()
+
+    def update(self, stage: Optional[str] = None, **fields):
+        with self._lock:
+            if stage:
+                self.stage = stage
+            self.fields.update(fields)
+            members = list(self._members)
+        for progress in members:
+            progress.update(stage, **fields)
+
+    def add(self, progress: Progress):
+        with self._lock:
+            self._members.append(progress)
+            stage, fields = self.stage, dict(self.fields)
+        if stage or fields:
+            progress.update(stage, **fields)
+
+    def remove(self, progress: Progress) -> bool:
+        """Drop a member; True once the group is empty"""
+        with self._lock:
+            self._members = [member for member in self._members if member is not progress]
+            return not self._members
+
+ProgressSink = Union[Progress, ProgressGroup]
+
+class WindowTally:
+    """
+    Inference windows of one request over every clip it submits (the whole
+    clip, or only the segment cache's missing regions), as windows_done and
+    windows_total
+    """
+
+    def __init__(self, progress: ProgressSink, count_windows: Callable[[int], int]):
+        """
+        Args:
+            progress: Where the counts are reported
+            count_windows: Windows the SDK splits a clip of this many samples into
+        """
+        self.progress = progress
+        self.count_windows = count_windows
+        self.done = 0
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def _advance(self, windows: int):
+        with self._lock:
+            self.done += windows
+            self.progress.update(windows_done=self.done)
+
+    def track(self, samples: int) -> Tuple[Optional[Dict], Callable[[Future], None]]:
+        """
+        Count one clip about to be submitted
+
+        Returns:
+            (infer options reporting each window, or None for a single-window
+            clip, which must stay batchable; done-callback for the clip's
+            future, crediting windows that were not reported one by one)
+        """
+        windows = self.count_windows(samples)
+        reported = 0
+        with self._lock:
+            self.total += windows
+            self.progress.update(windows_done=self.done, windows_total=self.total)
+
+        def on_window(window: Dict):
+            nonlocal reported
+            reported += 1
+            self._advance(1)
+
+        def on_done(future: Future):
+            if windows > reported:
+                self._advance(windows - reported)
+
+        return ({'on_window': on_window} if windows > 1 else None), on_done
+
+class ProgressRegistry:
+    """Progress channels by request id, pruned once finished or abandoned"""
+
+    def __init__(self, rate: Callable[[], float], queue_wait: Callable[[], float],
+                 retention: float = 60.0, max_channels: int = 1000,
+                 shared_dir: Optional[Path] = None, publish_interval: float = 0.25):
+        """
+        Args:
+            rate: Measured inference seconds per audio second
+            queue_wait: Expected seconds until queued work reaches a worker
+            retention: Seconds a finished (or never-used) channel is kept
+            max_channels: Beyond this, the oldest finished or idle channels are dropped early
+            shared_dir: Directory where channels are shared with other server
+                        processes (None: this process only)
+            publish_interval: Shortest time between shared writes of one
+                              channel (stage changes and the outcome are always written)
+        """
+        self._rate = rate
+        self._queue_wait = queue_wait
+        self.retention = retention
+        self.max_channels = max_channels
+        self.shared_dir = Path(shared_dir) if shared_dir is not None else None
+        self.publish_interval = publish_interval
+        self._published: Dict[str, Tuple[float, str]] = {}
+        # Own lock: channels publish from inside registry calls (join -> update)
+        self._publish_lock = threading.Lock()
+        if self.shared_dir is not None:
+            self.shared_dir.mkdir(parents=True, exist_ok=True)
+        self._channels: 'OrderedDict[str, Progress]' = OrderedDict()
+        self._groups: Dict[str, ProgressGroup] = {}
+        self._lock = threading.Lock()
+
+    def open(self, request_id: str, fresh: bool = False) -> Progress:
+        """The channel for request_id, created if needed (fresh: restart a finished one)"""
+        with self._lock:
+            self._prune(time.monotonic())
+            progress = self._channels.get(request_id)
+            if progress is None or (fresh and progress.finished is not None):
+                publish = self._publish if self.shared_dir is not None else None
+                progress = Progress(request_id, self._rate, self._queue_wait, publish)
+                self._channels[request_id] = progress
+            return progress
+
+    def get(self, request_id: Optional[str]) -> Optional[Progress]:
+        with self._lock:
+            return self._channels.get(request_id) if request_id else None
+
+    def current(self) -> Progress:
+        """The channel of the request being handled (by request_id_var), or a detached one nobody watches"""
+        return self.get(request_id_var.get()) or Progress('', self._rate, self._queue_wait)
+
+    def _shared_path(self, request_id: str) -> Path:
+        # Hashed: request ids come from clients and must not pick the file name
+        return self.shared_dir / (hashlib.sha256(request_id.encode('utf-8')).hexdigest()[:32] + '.json')
+
+    def _publish(self, progress: Progress):
+        """Write a channel's snapshot for other processes, at most every publish_interval"""
+        if not progress.request_id:
+            return
+        now = time.monotonic()
+        with self._publish_lock:
+            last_time, last_stage = self._published.get(progress.request_id, (0.0, ''))
+            if progress.finished is None and progress.stage == last_stage \
+                    and now - last_time < self.publish_interval:
+                return
+            self._published[progress.request_id] = (now, progress.stage)
+        path = self._shared_path(progress.request_id)
+        partial = path.with_name(f"{path.stem}.{os.getpid()}.partial")
+        try:
+            partial.write_text(json.dumps({'version': progress.version, 'error': progress.error,
+                                           'state': progress.snapshot()}))
+            os.replace(partial, path)
+        except OSError:
+            pass  # Sharing is best effort; the owning process still streams it
+
+    def _read_shared(self, request_id: str) -> Optional[Dict]:
+        if self.shared_dir is None:
+            return None
+        try:
+            return json.loads(self._shared_path(request_id).read_text())
+        except (OSError, ValueError):
+            return None
+
+    def join(self, key: str, progress: Progress) -> ProgressGroup:
+        """Add a channel to the group for a shared computation (e.g. a single-flight key)"""
+        with self._lock:
+            # Under the registry lock, so a concurrent leave() cannot discard the group first
+            group = self._groups.setdefault(key, ProgressGroup())
+            group.add(progress)
+        return group
+
+    def leave(self, key: str, progress: Progress):
+        """Remove a channel from its group; the last one out discards the group"""
+        with self._lock:
+            group = self._groups.get(key)
+            if group is not None and group.remove(progress):
+                del self._groups[key]
+
+    def active(self) -> List[Dict]:
+        with self._lock:
+            channels = [p for p in self._channels.values() if p.finished is None and p.stage != 'pending']
+        return [progress.snapshot() for progress in channels]
+
+    def _prune(self, now: float):
+        def idle(progress: Progress) -> bool:
+            return progress.finished is not None or progress.stage == 'pending'
+
+        def drop(request_id: str):
+            del self._channels[request_id]
+            with self._publish_lock:
+                published = self._published.pop(request_id, None)
+            if published is not None:
+                self._shared_path(request_id).unlink(missing_ok=True)
+
+        for request_id, progress in list(self._channels.items()):
+            since = progress.finished if progress.finished is not None else progress.created
+            if idle(progress) and now - since > self.retention:
+                drop(request_id)
+        # Oldest first; requests still running are never dropped
+        for request_id, progress in list(self._channels.items()):
+            if len(self._channels) < self.max_channels:
+                break
+            if idle(progress):
+                drop(request_id)
+
+    async def events(self, request_id: str, heartbeat: float = 1.0) -> AsyncIterator[bytes]:
+        """
+        Server-sent events for one request
+
+        `event: progress` carries a snapshot on connect, on every change and
+        every heartbeat seconds (the ETA moves even when nothing else does);
+        the stream ends with `event: done` or `event: error`. A channel with
+        no request behind it after the retention period ends with an error.
+        While the request has not reached this process, a channel shared by
+        another process (see shared_dir) is followed instead, polled every
+        publish_interval.
+        """
+        progress = self.open(request_id)
+        changed = progress.watch()
+        wait = heartbeat if self.shared_dir is None else min(heartbeat, self.publish_interval)
+        last_sent = None
+        try:
+            while True:
+                changed.clear()
+                state = progress.snapshot()
+                version, error, finished = progress.version, progress.error, progress.finished is not None
+                remote = self._read_shared(request_id) if progress.stage == 'pending' else None
+                if remote is not None:
+                    state, version, error = remote['state'], remote['version'], remote['error']
+                    finished = bool(state.get('finished'))
+                if finished:
+                    yield sse_event('error' if error else 'done', state, version)
+                    return
+                if remote is None and progress.stage == 'pending' and state['elapsed_seconds'] > self.retention:
+                    yield sse_event('error', {**state, 'error': "Unknown request"}, version)
+                    return
+                now = time.monotonic()
+                # Shared channels are polled: send changes, plus the heartbeat
+                if last_sent is None or version != last_sent[0] or now - last_sent[1] >= heartbeat - 0.01:
+                    yield sse_event('progress', state, version)
+                    last_sent = (version, now)
+                try:
+                    await asyncio.wait_for(changed.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            progress.unwatch(changed)
+
+def sse_event(event: str, data: Dict, event_id: int) -> bytes:
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode('utf-8')
+
+class ProgressMiddleware:
+    """
+    ASGI middleware opening a progress channel per processing request
+
+    Counts request body bytes as the upload stage and closes the channel
+    when the response has been sent (failed for error statuses). Must sit
+    inside the middleware that sets request_id_var.
+    """
+
+    def __init__(self, app, registry: ProgressRegistry, paths: Iterable[str]):
+        self.app = app
+        self.registry = registry
+        self.paths = tuple(paths)
+
+    async def __call__(self, scope, receive, send):
+        request_id = request_id_var.get()
+        if scope['type'] != 'http' or scope['method'] != 'POST' or scope['path'] not in self.paths \
+                or not request_id:
+            await self.app(scope, receive, send)
+            return
+
+        progress = self.registry.open(request_id, fresh=True)
+        headers = dict(scope.get('headers') or [])
+        try:
+            total = int(headers.get(b'content-length', b''))
+        except ValueError:
+            total = None
+        progress.update('upload', bytes_received=0, bytes_total=total)
+        received = 0
+        status = 500
+
+        async def counting_receive():
+            nonlocal received
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                progress.update(bytes_received=received)
+            return message
+
+        async def watching_send(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+            if message['type'] == 'http.response.body' and not message.get('more_body', False):
+                progress.finish(None if status < 400 else f"HTTP {status}")
+
+        try:
+            await self.app(scope, counting_receive, watching_send)
+        finally:
+            if progress.finished is None:
+                progress.finish(f"HTTP {status}")
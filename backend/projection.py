@@ -0,0 +1,168 @@
+"""
+Result Projection
+Select channels and frames of a blendshape track before it is serialized
+
+Clients that only drive the mouth, or only need a time slice, ask for it
+with channels/frames/time/every; the selection is plain NumPy slicing, so
+payload size and serialization time follow what is actually requested.
+"""
+
+import math
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+# Groups select channels by name prefix (ARKit naming; also matches rig
+# profiles whose targets follow it)
+CHANNEL_GROUPS = {
+    'eyes': ('eye',),
+    'brows': ('brow',),
+    'mouth': ('mouth',),
+    'jaw': ('jaw',),
+    'cheeks': ('cheek',),
+    'nose': ('nose',),
+    'tongue': ('tongue',),
+    'lipsync': ('jaw', 'mouth', 'tongue')
+}
+
+class ProjectionError(ValueError):
+    """Raised for selections that name unknown channels or empty ranges"""
+
+class Projection:
+    """A channel subset plus a frame range [start, end) keeping every step-th frame"""
+
+    def __init__(self, names: Sequence[str], channels: Optional[List[int]] = None,
+                 start: int = 0, end: Optional[int] = None, step: int = 1):
+        """
+        Args:
+            names: Channel names of the track being projected
+            channels: Column indices to keep, in output order (None: all)
+            start: First frame
+            end: Frame after the last (None: to the end of the track)
+            step: Keep every step-th frame from start
+        """
+        self.names = list(names)
+        self.channel_index = channels
+        self.start = start
+        self.end = end
+        self.step = step
+        # Contiguous runs are sliced as views instead of gathered
+        if channels and channels == list(range(channels[0], channels[-1] + 1)):
+            self._columns: Union[slice, List[int], None] = slice(channels[0], channels[-1] + 1)
+        else:
+            self._columns = channels
+
+    @property
+    def selects_channels(self) -> bool:
+        return self.channel_index is not None
+
+    def block_slice(self, offset: int, length: int) -> Tuple[slice, int]:
+        """
+        Rows kept from a block of frames starting at frame offset
+
+        Returns:
+            (slice into the block, index of the first kept frame in the track)
+        """
+        first = max(self.start, offset)
+        first += -(first - self.start) % self.step
+        last = offset + length if self.end is None else min(offset + length, self.end)
+        if first >= last:
+            return slice(0, 0), first
+        return slice(first - offset, last - offset, self.step), first
+
+    def frames(self, blendshapes: np.ndarray) -> np.ndarray:
+        """Selected frames of a whole track"""
+        return blendshapes[self.block_slice(0, len(blendshapes))[0]]
+
+    def columns(self, frames: np.ndarray) -> np.ndarray:
+        """Selected channels of already-selected frames"""
+        return frames if self._columns is None else frames[:, self._columns]
+
+    def count(self, num_frames: int) -> int:
+        """Frames kept from a track of num_frames"""
+        rows = self.block_slice(0, num_frames)[0]
+        return len(range(*rows.indices(num_frames)))
+
+    def channel_names(self) -> List[str]:
+        if self.channel_index is None:
+            return self.names
+        return [self.names[i] for i in self.channel_index]
+
+    def describe(self) -> Dict:
+        return {
+            'channels': self.channel_names() if self.selects_channels else None,
+            'start_frame': self.start,
+            'end_frame': self.end,
+            'every': self.step
+        }
+
+def _parse_range(text: str, what: str) -> Tuple[Optional[float], Optional[float]]:
+    """'a:b', 'a:' or ':b' -> (a, b) with None for an open end"""
+    first, sep, last = text.partition(':')
+    if not sep:
+        raise ProjectionError(f"{what} must be 'start:end' (either side may be empty)")
+    try:
+        bounds = (float(first) if first.strip() else None,
+                  float(last) if last.strip() else None)
+    except ValueError:
+        raise ProjectionError(f"{what} bounds must be numbers, got '{text}'")
+    # float() also accepts inf and nan, which no frame index can be built from
+    if any(bound is not None and not math.isfinite(bound) for bound in bounds):
+        raise ProjectionError(f"{what} bounds must be finite numbers, got '{text}'")
+    return bounds
+
+def parse_projection(names: Sequence[str], fps: float, channels: Optional[str] = None,
+                     frames: Optional[str] = None, time: Optional[str] = None,
+                     every: int = 1) -> Optional[Projection]:
+    """
+    Build a projection from request parameters
+
+    Args:
+        names: Channel names of the track (SDK or rig profile order)
+        fps: Track frame rate, for time ranges
+        channels: Comma-separated channel names and/or CHANNEL_GROUPS names
+        frames: 'start:end' frame range (end exclusive)
+        time: 'start:end' range in seconds, widened to whole frames
+        every: Keep every Nth frame (decimation)
+
+    Returns:
+        Projection, or None when nothing is selected (the whole track)
+    """
+    if channels is None and frames is None and time is None and every == 1:
+        return None
+    if frames is not None and time is not None:
+        raise ProjectionError("Give either frames or time, not both")
+    if every < 1:
+        raise ProjectionError("every must be at least 1")
+
+    channel_index = None
+    if channels is not None:
+        position = {name: i for i, name in enumerate(names)}
+        channel_index = []
+        for token in (token.strip() for token in channels.split(',')):
+            if not token:
+                continue
+            if token in CHANNEL_GROUPS:
+                matches = [i for i, name in enumerate(names) if name.startswith(CHANNEL_GROUPS[token])]
+            elif token in position:
+                matches = [position[token]]
+            else:
+                raise ProjectionError(f"Unknown channel or group '{token}' "
+                                      f"(groups: {', '.join(CHANNEL_GROUPS)})")
+            channel_index.extend(i for i in matches if i not in channel_index)
+        if not channel_index:
+            raise ProjectionError("channels selects no channels")
+
+    start, end = 0, None
+    if frames is not None:
+        first, last = _parse_range(frames, "frames")
+        if (first is not None and not first.is_integer()) or (last is not None and not last.is_integer()):
+            raise ProjectionError("frames bounds must be whole numbers")
+        start, end = int(first or 0), None if last is None else int(last)
+    elif time is not None:
+        first, last = _parse_range(time, "time")
+        start = math.floor((first or 0.0) * fps)
+        end = None if last is None else math.ceil(last * fps)
+    if start < 0 or (end is not None and end <= start):
+        raise ProjectionError(f"Empty or negative frame range [{start}, {end})")
+
+    return Projection(names, channel_index, start, end, every)
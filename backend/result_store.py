@@ -0,0 +1,172 @@
+"""
+Memory-Mapped Result Store
+Keeps finished blendshape tracks on disk as .npy files addressed by id, so
+frame windows can be served by seeking into the mapped file instead of
+holding whole tracks in memory
+"""
+
+import os
+import json
+import time
+import uuid
+import threading
+import numpy as np
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+class ResultNotFound(KeyError):
+    """Raised when a result id is unknown or has been evicted"""
+
+class ResultStore:
+    """On-disk store of (num_frames, num_blendshapes) float32 tracks"""
+
+    def __init__(self, root: Path, max_bytes: int):
+        """
+        Args:
+            root: Directory holding <id>.npy and <id>.json pairs
+            max_bytes: Total size budget; least recently written results are evicted beyond it
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # Result id -> array size, oldest first; scanned from disk once, then kept
+        # up to date by put() and eviction so requests never walk the directory
+        self._sizes: 'OrderedDict[str, int]' = OrderedDict()
+        self._total = 0
+        self._load_index()
+
+    def _load_index(self):
+        arrays = []
+        for path in self.root.glob("*.npy"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            arrays.append((stat.st_mtime, path.stem, stat.st_size))
+        with self._lock:
+            for _, result_id, size in sorted(arrays):
+                self._sizes[result_id] = size
+                self._total += size
+
+    def _paths(self, result_id: str) -> Tuple[Path, Path]:
+        # Ids are uuid hex; reject anything else so ids can't traverse paths
+        if not result_id.isalnum():
+            raise ResultNotFound(result_id)
+        return self.root / f"{result_id}.npy", self.root / f"{result_id}.json"
+
+    def put(self, blendshapes: np.ndarray, fps: float, metadata: Optional[Dict] = None) -> str:
+        """
+        Persist a track and return its id
+
+        Args:
+            blendshapes: (num_frames, num_blendshapes) array
+            fps: Frame rate, used to derive timestamps for windows
+            metadata: Extra JSON-serializable fields stored alongside
+        """
+        result_id = uuid.uuid4().hex
+        array_path, meta_path = self._paths(result_id)
+
+        # Write under a temp name and rename, so readers never see a partial file
+        partial = array_path.with_suffix('.partial')
+        with open(partial, 'wb') as f:
+            np.lib.format.write_array(f, np.ascontiguousarray(blendshapes, dtype='<f4'))
+        with open(partial, 'rb') as f:
+            if np.lib.format.read_magic(f) == (1, 0):
+                np.lib.format.read_array_header_1_0(f)
+            else:
+                np.lib.format.read_array_header_2_0(f)
+            data_offset = f.tell()
+
+        num_frames, num_blendshapes = blendshapes.shape
+        meta = {
+            'result_id': result_id,
+            'num_frames': int(num_frames),
+            'num_blendshapes': int(num_blendshapes),
+            'fps': float(fps),
+            'dtype': 'float32',
+            'data_offset': data_offset,
+            'created': time.time(),
+            **(metadata or {})
+        }
+        meta_path.write_text(json.dumps(meta))
+        size = partial.stat().st_size
+        os.replace(partial, array_path)
+
+        with self._lock:
+            self._sizes[result_id] = size
+            self._total += size
+            self._evict()
+        return result_id
+
+    def metadata(self, result_id: str) -> Dict:
+        """Stored metadata for a result"""
+        _, meta_path = self._paths(result_id)
+        try:
+            return json.loads(meta_path.read_text())
+        except FileNotFoundError:
+            raise ResultNotFound(result_id) from None
+
+    def open(self, result_id: str) -> np.memmap:
+        """Read-only memory map of the whole track; pages load only when touched"""
+        array_path, _ = self._paths(result_id)
+        try:
+            return np.load(array_path, mmap_mode='r')
+        except FileNotFoundError:
+            raise ResultNotFound(result_id) from None
+
+    def frames(self, result_id: str, start: int, end: int) -> np.ndarray:
+        """Copy out frames [start, end) of a track"""
+        track = self.open(result_id)
+        return np.array(track[start:end])
+
+    def read_bytes(self, result_id: str, start: int, length: int) -> bytes:
+        """Read a byte range of the raw row-major float32 payload"""
+        array_path, _ = self._paths(result_id)
+        offset = self.metadata(result_id)['data_offset']
+        with open(array_path, 'rb') as f:
+            f.seek(offset + start)
+            return f.read(length)
+
+    def _evict(self):
+        """Drop the oldest results until the store fits its byte budget (caller holds the lock)"""
+        while self._total > self.max_bytes and len(self._sizes) > 1:
+            result_id, size = self._sizes.popitem(last=False)
+            array_path, meta_path = self._paths(result_id)
+            array_path.unlink(missing_ok=True)
+            meta_path.unlink(missing_ok=True)
+            self._total -= size
+
+def parse_range(header: str, total: int) -> Tuple[str, int, int]:
+    """
+    Parse a single-range HTTP Range header
+
+    Supports the standard 'bytes' unit and a 'frames' unit, both with
+    inclusive 'a-b', open 'a-' and suffix '-n' forms.
+
+    Returns:
+        Tuple of (unit, start, end) with end exclusive and clamped to total
+
+    Raises:
+        ValueError: Malformed, multi-range or unsatisfiable range
+    """
+    unit, _, spec = header.strip().partition('=')
+    unit = unit.strip().lower()
+    if unit not in ('bytes', 'frames') or not spec or ',' in spec:
+        raise ValueError(f"Unsupported range: {header}")
+
+    first, _, last = spec.strip().partition('-')
+    if first:
+        start = int(first)
+        end = int(last) + 1 if last else total
+    elif last:
+        start = max(total - int(last), 0)
+        end = total
+    else:
+        raise ValueError(f"Unsupported range: {header}")
+
+    end = min(end, total)
+    if start < 0 or start >= end:
+        raise ValueError(f"Unsatisfiable range: {header}")
+    return unit, start, end
@@ -0,0 +1,222 @@
+"""
+Rig Profiles
+Server-side retargeting of SDK blendshape channels to an avatar's
+morph-target layout
+
+A profile is a (num_sdk_channels x num_targets) retarget matrix plus
+per-target gains, applied to a whole track in one matrix multiply. The
+output columns are in the rig's morphTargetInfluences order, so clients can
+copy frames straight in. Profiles are written either as a name mapping
+(target -> SDK channel, or target -> {channel: weight}) or as an explicit
+matrix, and are stored as JSON files in config.RIG_PROFILES_DIR.
+"""
+
+import json
+import math
+import re
+import threading
+import numpy as np
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+
+# Profile names double as file names
+_NAME_PATTERN = re.compile(r'^[A-Za-z0-9_.-]{1,64}$')
+
+Mapping = Dict[str, Union[str, Dict[str, float]]]
+
+class RigProfileError(ValueError):
+    """Raised for malformed profile definitions"""
+
+class RigProfile:
+    """Retarget matrix from SDK channels to a rig's morph targets"""
+
+    def __init__(self, name: str, targets: Sequence[str], matrix: np.ndarray,
+                 clamp: Optional[Sequence[float]] = (0.0, 1.0), definition: Optional[Dict] = None):
+        """
+        Args:
+            name: Profile name
+            targets: Morph target names, in the rig's influence order
+            matrix: (num_sdk_channels, len(targets)) weights, gains folded in
+            clamp: (low, high) applied after retargeting, or None
+            definition: The JSON definition the profile was built from
+        """
+        if matrix.ndim != 2 or matrix.shape[1] != len(targets):
+            raise RigProfileError(f"Matrix shape {matrix.shape} does not match {len(targets)} targets")
+        self.name = name
+        self.targets = list(targets)
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        self.clamp = tuple(clamp) if clamp is not None else None
+        self.definition = definition or {}
+
+    def apply(self, blendshapes: np.ndarray) -> np.ndarray:
+        """(num_frames, num_sdk_channels) -> (num_frames, num_targets)"""
+        if blendshapes.shape[1] != self.matrix.shape[0]:
+            raise RigProfileError(f"Profile '{self.name}' expects {self.matrix.shape[0]} channels, "
+                                  f"got {blendshapes.shape[1]}")
+        out = np.asarray(blendshapes, dtype=np.float32) @ self.matrix
+        if self.clamp is not None:
+            np.clip(out, self.clamp[0], self.clamp[1], out=out)
+        return out
+
+    def describe(self) -> Dict:
+        return {
+            'name': self.name,
+            'targets': self.targets,
+            'clamp': list(self.clamp) if self.clamp else None,
+            'mapped_targets': int(np.count_nonzero(np.abs(self.matrix).sum(axis=0)))
+        }
+
+def _number(value, what: str) -> float:
+    """A finite JSON number (booleans excluded), else RigProfileError"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise RigProfileError(f"{what} must be a finite number, got {value!r}")
+    return float(value)
+
+def _object(value, what: str) -> Dict:
+    if not isinstance(value, dict):
+        raise RigProfileError(f"{what} must be an object")
+    return value
+
+def build_profile(definition: Dict, source_names: Sequence[str]) -> RigProfile:
+    """
+    Build a profile from its JSON definition
+
+    Definition keys:
+        name: Profile name
+        targets: Morph target names in influence order
+        mapping: {target: channel} or {target: {channel: weight}}; targets
+                 not listed stay at 0 (a target named like an SDK channel
+                 maps to it when mapping is omitted)
+        matrix: Alternative to mapping, [num_sdk_channels][num_targets] weights
+        gains: {target: gain} multipliers (default 1)
+        clamp: [low, high] or null (default [0, 1])
+    """
+    definition = _object(definition, "Profile definition")
+    name = definition.get('name', '')
+    if not isinstance(name, str) or not _NAME_PATTERN.match(name):
+        raise RigProfileError("Profile name must be 1-64 characters of letters, digits, '_', '-' or '.'")
+    targets = definition.get('targets')
+    if not isinstance(targets, list) or not targets or not all(isinstance(target, str) for target in targets):
+        raise RigProfileError("Profile needs a non-empty list of target names")
+    if len(set(targets)) != len(targets):
+        raise RigProfileError("Target names must be unique")
+
+    source_index = {channel: i for i, channel in enumerate(source_names)}
+    target_index = {target: j for j, target in enumerate(targets)}
+
+    shape = (len(source_names), len(targets))
+    if 'matrix' in definition:
+        rows = definition['matrix']
+        if not isinstance(rows, list) or len(rows) != shape[0] \
+                or not all(isinstance(row, list) and len(row) == shape[1] for row in rows):
+            raise RigProfileError(f"Matrix must be a list of {shape[0]} rows of {shape[1]} weights")
+        matrix = np.array([[_number(weight, "Matrix weight") for weight in row] for row in rows],
+                          dtype=np.float32).reshape(shape)
+    else:
+        mapping: Mapping = _object(definition.get('mapping') or {target: target for target in targets
+                                                                 if target in source_index}, "Mapping")
+        matrix = np.zeros(shape, dtype=np.float32)
+        for target, sources in mapping.items():
+            if target not in target_index:
+                raise RigProfileError(f"Mapping names unknown target '{target}'")
+            if isinstance(sources, str):
+                sources = {sources: 1.0}
+            for channel, weight in _object(sources, f"Mapping for '{target}'").items():
+                if channel not in source_index:
+                    raise RigProfileError(f"Mapping names unknown SDK channel '{channel}'")
+                matrix[source_index[channel], target_index[target]] += _number(weight, f"Weight of '{channel}'")
+
+    for target, gain in _object(definition.get('gains') or {}, "Gains").items():
+        if target not in target_index:
+            raise RigProfileError(f"Gain names unknown target '{target}'")
+        matrix[:, target_index[target]] *= _number(gain, f"Gain of '{target}'")
+
+    clamp = definition.get('clamp', [0.0, 1.0])
+    if clamp is not None:
+        if not isinstance(clamp, list) or len(clamp) != 2:
+            raise RigProfileError("Clamp must be [low, high] or null")
+        low, high = (_number(bound, "Clamp bound") for bound in clamp)
+        if low > high:
+            raise RigProfileError(f"Clamp low {low:g} is above high {high:g}")
+        clamp = (low, high)
+    return RigProfile(name, targets, matrix, clamp, definition)
+
+class RigProfileRegistry:
+    """
+    Profiles by name, loaded from (and saved to) a directory of JSON files
+
+    The directory is the source of truth shared by every server process: a
+    profile file that appears or changes (registered through another
+    pre-forked worker) is picked up the next time its name is looked up.
+    """
+
+    def __init__(self, directory: Path, source_names: Sequence[str]):
+        self.directory = Path(directory)
+        self.source_names = list(source_names)
+        self._profiles: Dict[str, RigProfile] = {}
+        # File modification time each profile was last read at
+        self._mtimes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _refresh(self, name: str):
+        """Re-read a profile whose file is new or changed since it was last read"""
+        path = self.directory / f"{name}.json"
+        try:
+            mtime = path.stat().st_mtime_ns
+        except OSError:
+            return
+        with self._lock:
+            if self._mtimes.get(name) == mtime:
+                return
+            self._mtimes[name] = mtime
+        try:
+            profile = build_profile(json.loads(path.read_text()), self.source_names)
+        except (OSError, UnicodeDecodeError, json.JSONDecodeError, RigProfileError):
+            return  # Keep serving the last good version
+        if profile.name == name:
+            with self._lock:
+                self._profiles[name] = profile
+
+    def load(self) -> List[str]:
+        """Load every *.json profile in the directory; returns the names that failed"""
+        failed = []
+        if not self.directory.exists():
+            return failed
+        for path in sorted(self.directory.glob('*.json')):
+            try:
+                mtime = path.stat().st_mtime_ns
+                profile = self.register(json.loads(path.read_text()), persist=False)
+                with self._lock:
+                    self._mtimes[profile.name] = mtime
+            except (OSError, UnicodeDecodeError, json.JSONDecodeError, RigProfileError) as e:
+                failed.append(f"{path.name}: {e}")
+        return failed
+
+    def register(self, definition: Dict, persist: bool = True) -> RigProfile:
+        """Validate, add (replacing a profile of the same name) and optionally save to disk"""
+        profile = build_profile(definition, self.source_names)
+        if persist:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self.directory / f"{profile.name}.json"
+            partial = path.with_suffix('.partial')
+            partial.write_text(json.dumps(definition, indent=2))
+            partial.replace(path)
+        with self._lock:
+            self._profiles[profile.name] = profile
+            if persist:
+                self._mtimes[profile.name] = path.stat().st_mtime_ns
+        return profile
+
+    def get(self, name: str) -> Optional[RigProfile]:
+        # Names that cannot be file names never touch the disk
+        if _NAME_PATTERN.match(name):
+            self._refresh(name)
+        with self._lock:
+            return self._profiles.get(name)
+
+    def names(self) -> List[str]:
+        if self.directory.exists():
+            for path in self.directory.glob('*.json'):
+                self._refresh(path.stem)
+        with self._lock:
+            return sorted(self._profiles)
@@ -0,0 +1,478 @@
+"""
+Inference Scheduler
+Duration-aware admission control and shortest-job-first ordering in front of
+Audio2FaceSDK.process_audio
+
+Jobs are costed by their decoded duration. Interactive jobs run
+shortest-first; bulk jobs queue behind them by a fixed offset. Every job ages
+while it waits, so long and bulk jobs still make progress. Jobs whose
+deadline has passed, or whose cancel token has fired, are dropped before
+they reach inference.
+
+With max_batch_size > 1 the consumer becomes a dynamic batcher: after taking
+the best job it waits up to batch_window for more arrivals, then runs up to
+max_batch_size jobs through one infer_batch call.
+
+Passing lists of callables runs one consumer thread per inference worker
+(e.g. one per Audio2FaceSDK instance), all fed from the same queue. With a
+worker_factory, a watchdog fails the jobs of a worker stuck far beyond its
+expected run time, abandons it and starts a replacement.
+"""
+
+import time
+import heapq
+import itertools
+import threading
+import numpy as np
+from concurrent.futures import Future, InvalidStateError
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from cancellation import CancelToken, Cancelled
+from stage_pool import Utilization
+
+PRIORITIES = ('interactive', 'bulk')
+
+InferFn = Callable[[np.ndarray], Dict]
+BatchFn = Callable[[List[np.ndarray]], List[Dict]]
+WorkerFactory = Callable[[], Tuple[InferFn, Optional[BatchFn]]]
+
+class AdmissionRejected(Exception):
+    """Raised when accepting a job would exceed the queued-work budget"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class DeadlineExpired(Exception):
+    """Raised for a job whose deadline passed before inference started"""
+
+class WorkerHung(Exception):
+    """Raised for jobs running on a worker the watchdog gave up on"""
+
+class _Job:
+    __slots__ = ('audio', 'priority', 'cost', 'deadline', 'submitted', 'cancel_token', 'options', 'on_start',
+                 'probe', 'future')
+
+    def __init__(self, audio, priority, cost, deadline, submitted, cancel_token, options, on_start,
+                 probe=False):
+        self.audio = audio
+        self.priority = priority
+        self.cost = cost
+        self.deadline = deadline
+        self.submitted = submitted
+        self.cancel_token = cancel_token
+        self.options = options
+        self.on_start = on_start
+        self.probe = probe
+        self.future = Future()
+
+class _Worker:
+    """One consumer thread and the inference callables it owns"""
+
+    def __init__(self, index: int, infer: InferFn, infer_batch: Optional[BatchFn]):
+        self.index = index
+        self.infer = infer
+        self.infer_batch = infer_batch
+        self.jobs: List[_Job] = []
+        self.started: Optional[float] = None
+        self.retired = False
+        self.thread: Optional[threading.Thread] = None
+
+class InferenceScheduler:
+    """Priority queue feeding one consumer thread per inference worker"""
+
+    def __init__(self, infer: Union[InferFn, Sequence[InferFn]], sample_rate: int,
+                 aging_rate: float = 1.0, bulk_offset: float = 30.0,
+                 max_queued_seconds: float = 600.0,
+                 infer_batch: Union[Optional[BatchFn], Sequence[Optional[BatchFn]]] = None,
+                 max_batch_size: int = 1, batch_window: float = 0.0,
+                 worker_factory: Optional[WorkerFactory] = None,
+                 hang_min_seconds: float = 60.0, hang_factor: float = 10.0):
+        """
+        Args:
+            infer: Blocking inference call, e.g. Audio2FaceSDK.process_audio,
+                   or a list of them, one per worker
+            sample_rate: Sample rate of submitted audio, for costing
+            aging_rate: Seconds of cost forgiven per second waited
+            bulk_offset: Extra cost (seconds) charged to bulk jobs
+            max_queued_seconds: Admission budget of queued audio seconds
+            infer_batch: Blocking batched call, e.g. Audio2FaceSDK.process_batch,
+                         or a list matching infer
+            max_batch_size: Most jobs per infer_batch call (1 disables batching)
+            batch_window: Seconds to wait for more jobs once one is ready
+            worker_factory: Builds (infer, infer_batch) for a replacement worker;
+                            enables the hung-worker watchdog
+            hang_min_seconds: A worker is never considered hung before this...
+            hang_factor: ...nor before this many times its jobs' expected run time
+        """
+        workers = list(infer) if isinstance(infer, (list, tuple)) else [infer]
+        batchers = list(infer_batch) if isinstance(infer_batch, (list, tuple)) else [infer_batch] * len(workers)
+        if len(batchers) != len(workers):
+            raise ValueError("infer_batch must match infer, one per worker")
+
+        self.sample_rate = sample_rate
+        self.aging_rate = aging_rate
+        self.bulk_offset = bulk_offset
+        self.max_queued_seconds = max_queued_seconds
+        self._batch_size_limit = max_batch_size
+        self.max_batch_size = max_batch_size if all(batchers) else 1
+        self.batch_window = batch_window
+        self.worker_factory = worker_factory
+        self.hang_min_seconds = hang_min_seconds
+        self.hang_factor = hang_factor
+
+        self._heap = []
+        self._sequence = itertools.count()
+        self._worker_ids = itertools.count()
+        self._cond = threading.Condition()
+        self._queued_seconds = 0.0
+        self._closed = False
+        # Measured inference seconds per audio second, for Retry-After estimates
+        self._seconds_per_second = 0.05
+
+        self.counters = {'completed': 0, 'failed': 0, 'expired': 0, 'cancelled': 0,
+                         'rejected': 0, 'batches': 0, 'workers_replaced': 0}
+        self.wait_totals = {priority: [0, 0.0] for priority in PRIORITIES}
+        self.utilization = Utilization()
+
+        self._workers: List[_Worker] = []
+        for worker, batcher in zip(workers, batchers):
+            self._start_worker(worker, batcher)
+
+        if worker_factory is not None:
+            threading.Thread(target=self._watch, name="inference-watchdog", daemon=True).start()
+
+    @property
+    def num_workers(self) -> int:
+        return len(self._workers)
+
+    @property
+    def seconds_per_second(self) -> float:
+        """Measured inference seconds per audio second (moving average)"""
+        return self._seconds_per_second
+
+    def expected_wait(self) -> float:
+        """Seconds until the work queued now has been taken by a worker, at the measured rate"""
+        with self._cond:
+            return self._queued_seconds * self._seconds_per_second / max(1, len(self._workers))
+
+    def worker_progress(self) -> List[Dict]:
+        """
+        What each worker is doing: seconds on its current jobs against the
+        limit after which the watchdog treats it as hung
+
+        Returns:
+            One dict per worker with index, running, busy_seconds,
+            hang_limit_seconds and stalled
+        """
+        now = time.monotonic()
+        with self._cond:
+            report = []
+            for worker in self._workers:
+                busy = now - worker.started if worker.started is not None and worker.jobs else 0.0
+                limit = self._hang_limit(worker.jobs) if worker.jobs else self.hang_min_seconds
+                report.append({
+                    'index': worker.index,
+                    'running': len(worker.jobs),
+                    'busy_seconds': round(busy, 3),
+                    'hang_limit_seconds': round(limit, 3),
+                    'stalled': busy > limit
+                })
+            return report
+
+    def _start_worker(self, infer: InferFn, infer_batch: Optional[BatchFn]):
+        worker = _Worker(next(self._worker_ids), infer, infer_batch)
+        worker.thread = threading.Thread(target=self._run, args=(worker,),
+                                         name=f"inference-worker-{worker.index}", daemon=True)
+        with self._cond:
+            self._workers.append(worker)
+        worker.thread.start()
+
+    def _key(self, job: _Job) -> float:
+        # Score = class offset + cost - aging_rate * waited. The "now" term is
+        # shared by every job, so ordering by the rest keeps the heap valid.
+        offset = self.bulk_offset if job.priority == 'bulk' else 0.0
+        return offset + job.cost + self.aging_rate * job.submitted
+
+    def submit(self, audio: np.ndarray, priority: str = 'interactive',
+               deadline: Optional[float] = None, cancel_token: Optional[CancelToken] = None,
+               infer_options: Optional[Dict] = None,
+               on_start: Optional[Callable[[], None]] = None, probe: bool = False) -> Future:
+        """
+        Queue audio for inference
+
+        Args:
+            audio: Preprocessed 16kHz mono audio
+            priority: 'interactive' or 'bulk'
+            deadline: Absolute time.monotonic() after which the job is dropped
+            cancel_token: Drops the job if cancelled while queued; also passed
+                          to infer(audio, cancel_token=...) to stop between windows
+            infer_options: Extra keyword arguments for infer (e.g. on_window);
+                           such jobs always run alone, never in a batch
+            on_start: Called on the worker thread when the job leaves the
+                      queue for inference (batched jobs included)
+            probe: Health probe; runs alone and is kept out of the measured
+                   rate that Retry-After, ETAs and the watchdog rely on
+
+        Returns:
+            Future resolving to the SDK result dict
+
+        Raises:
+            AdmissionRejected: Queued work would exceed max_queued_seconds
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"priority must be one of {PRIORITIES}")
+
+        cost = len(audio) / self.sample_rate
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Scheduler is shut down")
+            if self._heap and self._queued_seconds + cost > self.max_queued_seconds:
+                self.counters['rejected'] += 1
+                raise AdmissionRejected(
+                    f"Inference queue full ({self._queued_seconds:.0f}s of audio queued)",
+                    retry_after=self._queued_seconds * self._seconds_per_second
+                )
+
+            job = _Job(audio, priority, cost, deadline, time.monotonic(), cancel_token, infer_options or {},
+                       on_start, probe)
+            heapq.heappush(self._heap, (self._key(job), next(self._sequence), job))
+            self._queued_seconds += cost
+            self._cond.notify()
+        return job.future
+
+    def _take_batch(self, worker: _Worker) -> Optional[List[_Job]]:
+        """Block for the best job, then gather up to max_batch_size within the batch window"""
+        with self._cond:
+            while not self._heap:
+                if self._closed or worker.retired:
+                    return None
+                self._cond.wait()
+
+            if self.max_batch_size > 1 and self.batch_window > 0:
+                closes = time.monotonic() + self.batch_window
+                while len(self._heap) < self.max_batch_size:
+                    remaining = closes - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+            # A swap (or the watchdog) may have retired this worker while it waited: queued
+            # jobs belong to the new workers and their model, so hand the wakeup on
+            if worker.retired:
+                self._cond.notify()
+                return None
+
+            # Another worker may have drained the queue during the window
+            jobs = []
+            while self._heap and len(jobs) < self.max_batch_size:
+                _, _, job = heapq.heappop(self._heap)
+                self._queued_seconds -= job.cost
+                jobs.append(job)
+
+            worker.jobs = jobs
+            worker.started = time.monotonic()
+        return jobs
+
+    def _count(self, name: str, n: int = 1):
+        with self._cond:
+            self.counters[name] += n
+
+    def _resolve(self, job: _Job, result=None, error: Optional[BaseException] = None):
+        """Settle a job's future; the watchdog may already have failed it"""
+        try:
+            if error is None:
+                job.future.set_result(result)
+            else:
+                job.future.set_exception(error)
+        except InvalidStateError:
+            pass
+
+    def _admit(self, job: _Job, now: float) -> bool:
+        """Record wait time and drop cancelled or expired jobs"""
+        with self._cond:
+            waits = self.wait_totals[job.priority]
+            waits[0] += 1
+            waits[1] += now - job.submitted
+
+        if not job.future.set_running_or_notify_cancel():
+            return False
+        if job.cancel_token is not None and job.cancel_token.cancelled:
+            self._count('cancelled')
+            self._resolve(job, error=Cancelled(f"Cancelled before inference: {job.cancel_token.reason}"))
+            return False
+        if job.deadline is not None and now > job.deadline:
+            self._count('expired')
+            self._resolve(job, error=DeadlineExpired(
+                f"Deadline expired {now - job.deadline:.2f}s before inference"
+            ))
+            return False
+        if job.on_start is not None:
+            try:
+                job.on_start()
+            except Exception:
+                pass  # A progress callback must never fail the job
+        return True
+
+    def _record_rate(self, seconds: float, cost: float):
+        if cost > 0:
+            measured = seconds / cost
+            self._seconds_per_second = 0.8 * self._seconds_per_second + 0.2 * measured
+
+    def _run_single(self, job: _Job, worker: _Worker):
+        try:
+            start = time.perf_counter()
+            options = dict(job.options)
+            if job.cancel_token is not None:
+                options['cancel_token'] = job.cancel_token
+            result = worker.infer(job.audio, **options)
+            if not job.probe:
+                self._record_rate(time.perf_counter() - start, job.cost)
+            self._count('completed')
+            self._resolve(job, result)
+        except Cancelled as e:
+            self._count('cancelled')
+            self._resolve(job, error=e)
+        except Exception as e:
+            self._count('failed')
+            self._resolve(job, error=e)
+
+    def _run_batch(self, jobs: List[_Job], worker: _Worker):
+        try:
+            start = time.perf_counter()
+            results = worker.infer_batch([job.audio for job in jobs])
+            self._record_rate(time.perf_counter() - start, sum(job.cost for job in jobs))
+        except Exception:
+            # Isolate the failure: one bad clip must not fail its batch-mates
+            for job in jobs:
+                self._run_single(job, worker)
+            return
+
+        self._count('batches')
+        self._count('completed', len(jobs))
+        for job, result in zip(jobs, results):
+            self._resolve(job, result)
+
+    def _run(self, worker: _Worker):
+        while True:
+            taken = self._take_batch(worker)
+            if taken is None:
+                return
+            busy = self.utilization.begin()
+            now = time.monotonic()
+            jobs = [job for job in taken if self._admit(job, now)]
+
+            # Jobs with per-call options (e.g. streaming callbacks) can't share a batch call,
+            # and probes run alone so their timing stays out of the measured rate
+            for job in [job for job in jobs if job.options or job.probe]:
+                self._run_single(job, worker)
+            jobs = [job for job in jobs if not (job.options or job.probe)]
+
+            if len(jobs) == 1:
+                self._run_single(jobs[0], worker)
+            elif jobs:
+                self._run_batch(jobs, worker)
+
+            self.utilization.end(busy)
+            with self._cond:
+                worker.jobs = []
+                worker.started = None
+                if worker.retired:
+                    # Replaced by the watchdog or a worker swap; let the thread end
+                    return
+
+    def _hang_limit(self, jobs: List[_Job]) -> float:
+        expected = sum(job.cost for job in jobs) * self._seconds_per_second
+        return max(self.hang_min_seconds, self.hang_factor * expected)
+
+    def _watch(self):
+        """Fail and replace workers stuck far beyond their jobs' expected run time"""
+        while not self._closed:
+            time.sleep(min(1.0, self.hang_min_seconds / 4))
+            now = time.monotonic()
+            with self._cond:
+                hung = [
+                    (worker, list(worker.jobs), now - worker.started)
+                    for worker in self._workers
+                    if worker.started is not None and worker.jobs
+                    and now - worker.started > self._hang_limit(worker.jobs)
+                ]
+                for worker, _, _ in hung:
+                    worker.retired = True
+                    self._workers.remove(worker)
+
+            for worker, jobs, stuck in hung:
+                # A Python thread cannot be killed: the stuck call keeps its
+                # thread until it returns, but its results are discarded
+                error = WorkerHung(f"Inference worker {worker.index} unresponsive for {stuck:.0f}s")
+                for job in jobs:
+                    if job.cancel_token is not None:
+                        job.cancel_token.cancel("inference worker hung")
+                    self._count('failed')
+                    self._resolve(job, error=error)
+                try:
+                    self._start_worker(*self.worker_factory())
+                    self._count('workers_replaced')
+                except Exception:
+                    # Run with reduced capacity rather than take the watchdog down
+                    pass
+
+    def swap_workers(self, workers: Sequence[Tuple[InferFn, Optional[BatchFn]]]) -> List[threading.Thread]:
+        """
+        Atomically replace every worker: new jobs go to the new workers, while
+        old ones finish the job they are running and exit
+
+        Returns:
+            Threads of the retired workers, for the caller to join (drain)
+        """
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Scheduler is shut down")
+            retired = list(self._workers)
+
+        # Start the new workers first, so the queue is never without a consumer
+        for infer, infer_batch in workers:
+            self._start_worker(infer, infer_batch)
+
+        with self._cond:
+            for worker in retired:
+                worker.retired = True
+                if worker in self._workers:
+                    self._workers.remove(worker)
+            self.max_batch_size = self._batch_size_limit if all(batch for _, batch in workers) else 1
+            # Idle old workers are parked in _take_batch; wake them so they exit
+            self._cond.notify_all()
+
+        return [worker.thread for worker in retired]
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting jobs; workers exit once the queue is drained"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            threads = [worker.thread for worker in self._workers]
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    def stats(self) -> Dict:
+        """Queue depth, queued work and wait times per class"""
+        with self._cond:
+            queued = {priority: 0 for priority in PRIORITIES}
+            for _, _, job in self._heap:
+                queued[job.priority] += 1
+            return {
+                'queue_depth': len(self._heap),
+                'queued_by_priority': queued,
+                'queued_audio_seconds': round(self._queued_seconds, 3),
+                'running': sum(len(worker.jobs) for worker in self._workers),
+                'workers': self.num_workers,
+                'max_batch_size': self.max_batch_size,
+                'inference_seconds_per_audio_second': round(self._seconds_per_second, 4),
+                'utilization': round(self.utilization.value(self.num_workers), 3),
+                'mean_wait_seconds': {
+                    priority: round(total / count, 4) if count else 0.0
+                    for priority, (count, total) in self.wait_totals.items()
+                },
+                **self.counters
+            }
@@ -0,0 +1,270 @@
+"""
+Segment Cache
+Incremental reprocessing of edited audio: the clip is split into
+content-defined chunks, each chunk's blendshape frames are cached by the hash
+of its samples, and a re-submitted clip only re-infers the chunks that
+changed
+
+Chunk boundaries depend only on nearby samples (a rolling hash over a short
+window), so an edit moves the boundaries around it but not elsewhere, and
+unchanged chunks hash the same even when an edit shifted them in time.
+Changed chunks are merged into regions and inferred with context padding on
+both sides; their first and last frames are crossfaded into the reused
+neighbours so the splice is seamless.
+
+Because audio is peak-normalized on load, an edit that changes the loudest
+sample changes every chunk, and nothing is reused.
+
+Chunks are only reused between versions of the same document (a key the
+client sends with each revision of a clip). The model infers a chunk's
+frames from the audio around it, so an identical chunk - typically
+silence - in an unrelated clip would get frames that are wrong for it;
+clips without a document key are inferred whole and not cached.
+"""
+
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Tuple
+
+SubmitFn = Callable[[np.ndarray], Future]
+
+# Multiplier for mixing the two rolling sums into one hash (Knuth)
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+
+def chunk_boundaries(audio: np.ndarray, sample_rate: int, avg_seconds: float = 2.0,
+                     min_seconds: float = 0.5, max_seconds: float = 8.0,
+                     window: int = 256) -> List[int]:
+    """
+    Content-defined chunk boundaries
+
+    A sample is a boundary candidate when a hash of the `window` samples
+    before it hits a 1-in-(avg_seconds * sample_rate) pattern. Silence always
+    qualifies, so chunks tend to end in pauses.
+
+    Returns:
+        Sorted sample offsets starting with 0 and ending with len(audio)
+    """
+    n = len(audio)
+    min_len = int(min_seconds * sample_rate)
+    max_len = int(max_seconds * sample_rate)
+    if n <= 2 * min_len:
+        return [0, n]
+
+    # Windowed sum and position-weighted sum of coarsely quantized samples:
+    # both depend only on the window's content, not on where it sits
+    q = np.round(audio * 256).astype(np.int64)
+    idx = np.arange(n, dtype=np.int64)
+    c1 = np.concatenate([[0], np.cumsum(q)])
+    c2 = np.concatenate([[0], np.cumsum(q * idx)])
+    end = np.arange(window, n + 1)
+    s1 = c1[end] - c1[end - window]
+    s2 = c2[end] - c2[end - window] - (end - window) * s1
+    mixed = (s1.astype(np.uint64) * _GOLDEN) ^ (s2.astype(np.uint64) * _GOLDEN >> np.uint64(17))
+    divisor = np.uint64(max(1, int(avg_seconds * sample_rate)))
+    candidates = end[(mixed % divisor) == 0]
+
+    bounds = [0]
+    while True:
+        last = bounds[-1]
+        i = np.searchsorted(candidates, last + min_len)
+        if i < len(candidates) and candidates[i] <= min(last + max_len, n - min_len):
+            bounds.append(int(candidates[i]))
+        elif n - last > max_len:
+            # No candidate in reach: forced cut (not content-defined)
+            bounds.append(last + max_len)
+        else:
+            break
+    bounds.append(n)
+    return bounds
+
+def chunk_key(namespace: str, samples: np.ndarray) -> str:
+    """Hash of a chunk's 16-bit samples, scoped to the model configuration and document"""
+    digest = hashlib.sha256(namespace.encode('utf-8'))
+    digest.update(np.round(samples * 32767).astype('<i2').tobytes())
+    return digest.hexdigest()
+
+class SegmentCache:
+    """In-memory LRU of per-chunk blendshape frames, bounded by bytes"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[str, Tuple[np.ndarray, int]]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Tuple[np.ndarray, int]]:
+        """(frames, fps) for a chunk, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, frames: np.ndarray, fps: int):
+        frames = np.array(frames, dtype=np.float32)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[0].nbytes
+            self._entries[key] = (frames, fps)
+            self._bytes += frames.nbytes
+            while self._bytes > self.max_bytes and self._entries:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0
+            }
+
+def _fit(frames: np.ndarray, count: int) -> np.ndarray:
+    """Trim, or pad by repeating the last frame, to exactly count frames"""
+    if len(frames) >= count:
+        return frames[:count]
+    if len(frames) == 0:
+        raise RuntimeError("Inference returned no frames for a non-empty region")
+    return np.concatenate([frames, np.repeat(frames[-1:], count - len(frames), axis=0)])
+
+class IncrementalProcessor:
+    """Re-infer only the chunks of a clip that are not in the segment cache"""
+
+    def __init__(self, cache: SegmentCache, sample_rate: int, context_seconds: float = 0.5,
+                 blend_seconds: float = 0.1, min_reuse: float = 0.2, **chunking):
+        """
+        Args:
+            cache: Shared segment cache
+            sample_rate: Sample rate of the audio passed to process
+            context_seconds: Audio context inferred on each side of a changed region
+            blend_seconds: Crossfade length into reused neighbours
+            min_reuse: Below this fraction of reusable audio, run the whole clip
+            **chunking: Passed to chunk_boundaries (avg/min/max_seconds)
+        """
+        self.cache = cache
+        self.sample_rate = sample_rate
+        self.context_seconds = context_seconds
+        self.blend_seconds = blend_seconds
+        self.min_reuse = min_reuse
+        self.chunking = chunking
+
+    def process(self, audio: np.ndarray, submit: SubmitFn, namespace: str,
+                document: Optional[str] = None) -> Tuple[Dict, float]:
+        """
+        Blendshapes for a clip, reusing cached chunks of earlier versions of the same document
+
+        Args:
+            audio: Preprocessed audio
+            submit: Queues audio for inference, returning a Future of the SDK
+                    result dict (e.g. a bound InferenceScheduler.submit)
+            namespace: Model configuration the cache entries belong to
+            document: Client key shared by the versions of one clip; without
+                      one the clip is inferred whole and nothing is cached
+
+        Returns:
+            (result dict as from Audio2FaceSDK.process_audio, fraction of frames reused)
+        """
+        if document is None:
+            return submit(audio).result(), 0.0
+
+        sr = self.sample_rate
+        bounds = chunk_boundaries(audio, sr, **self.chunking)
+        chunks = list(zip(bounds[:-1], bounds[1:]))
+        scope = f"{namespace}\0{document}"
+        keys = [chunk_key(scope, audio[start:end]) for start, end in chunks]
+        cached = [self.cache.get(key) for key in keys]
+
+        reusable = sum(end - start for (start, end), hit in zip(chunks, cached) if hit is not None)
+        if len(chunks) < 2 or reusable < self.min_reuse * len(audio):
+            result = submit(audio).result()
+            self._remember(chunks, keys, result['blendshapes'], result['fps'], range(len(chunks)))
+            return result, 0.0
+
+        fps = next(hit[1] for hit in cached if hit is not None)
+
+        def frame_at(sample: int) -> int:
+            return int(round(sample * fps / sr))
+
+        num_frames = int(len(audio) / sr * fps)
+        frame_bounds = [min(frame_at(sample), num_frames) for sample in bounds]
+        frame_bounds[-1] = num_frames
+        width = cached[next(i for i, hit in enumerate(cached) if hit is not None)][0].shape[1]
+        out = np.empty((num_frames, width), dtype=np.float32)
+        filled = np.zeros(num_frames, dtype=bool)
+
+        for i, hit in enumerate(cached):
+            if hit is not None:
+                first, last = frame_bounds[i], frame_bounds[i + 1]
+                out[first:last] = _fit(hit[0], last - first)
+                filled[first:last] = True
+
+        # Consecutive misses become one region; all regions are queued at once
+        regions = []
+        for i, hit in enumerate(cached):
+            if hit is None:
+                if regions and regions[-1][1] == i:
+                    regions[-1][1] = i + 1
+                else:
+                    regions.append([i, i + 1])
+
+        blend = max(0, int(round(self.blend_seconds * fps)))
+        context = int(self.context_seconds * sr)
+        pending = []
+        for first_chunk, end_chunk in regions:
+            first, last = frame_bounds[first_chunk], frame_bounds[end_chunk]
+            blend_first, blend_last = max(0, first - blend), min(num_frames, last + blend)
+            start = max(0, int(round(blend_first * sr / fps)) - context)
+            end = min(len(audio), int(round(blend_last * sr / fps)) + context)
+            pending.append((first_chunk, end_chunk, first, last, blend_first, blend_last, start,
+                            submit(audio[start:end])))
+
+        reused_frames = int(filled.sum())
+        for first_chunk, end_chunk, first, last, blend_first, blend_last, start, future in pending:
+            frames = future.result()['blendshapes']
+            offset = frame_at(start)
+            new = _fit(frames[max(0, blend_first - offset):], blend_last - blend_first)
+
+            core = slice(first - blend_first, last - blend_first)
+            out[first:last] = new[core]
+
+            # Crossfade from the reused frames into the new ones (and back out)
+            for lo, hi, rising in ((blend_first, first, True), (last, blend_last, False)):
+                if hi > lo:
+                    ramp = (np.arange(hi - lo) + 1) / (hi - lo + 1)
+                    weight = (ramp if rising else ramp[::-1])[:, None]
+                    out[lo:hi] = (1 - weight) * out[lo:hi] + weight * new[lo - blend_first:hi - blend_first]
+
+            self._remember(chunks, keys, out, fps, range(first_chunk, end_chunk), frame_bounds)
+
+        timestamps = np.arange(num_frames) / fps
+        return {
+            'blendshapes': out,
+            'timestamps': timestamps,
+            'fps': fps,
+            'duration': timestamps[-1] if num_frames > 0 else 0.0,
+            'num_frames': num_frames
+        }, reused_frames / num_frames if num_frames else 0.0
+
+    def _remember(self, chunks, keys, frames: np.ndarray, fps: int, indices,
+                  frame_bounds: Optional[List[int]] = None):
+        """Cache the frames of the given chunks"""
+        for i in indices:
+            if frame_bounds is None:
+                start, end = chunks[i]
+                first = int(round(start * fps / self.sample_rate))
+                last = int(round(end * fps / self.sample_rate))
+            else:
+                first, last = frame_bounds[i], frame_bounds[i + 1]
+            if last > first:
+                self.cache.put(keys[i], frames[first:last], fps)
@@ -0,0 +1,138 @@
+"""
+Single-Flight Request Coalescing
+Concurrent requests for the same work share one computation: the first
+caller (leader) runs it and every duplicate that arrives while it is in
+flight (follower) awaits the same result
+
+Each computation gets a CancelToken. It is cancelled only when every caller
+waiting on the computation has gone away (timed out or disconnected).
+"""
+
+import time
+import asyncio
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Dict
+
+from cancellation import CancelToken
+
+def request_key(content: bytes, **params) -> str:
+    """Key for a request: hash of the uploaded bytes plus the parameters that affect the result"""
+    digest = hashlib.sha256(content)
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+class _Flight:
+    __slots__ = ('task', 'token', 'waiters')
+
+    def __init__(self, task: asyncio.Future, token: CancelToken):
+        self.task = task
+        self.token = token
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls by key
+
+    The computation runs as its own task, so a leader whose client goes away
+    does not cancel it for followers; once the last waiter is cancelled, the
+    computation's CancelToken is. If the computation fails, followers are
+    not handed the leader's error: they retry, and one of them becomes the
+    new leader.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[str, _Flight] = {}
+        self.leaders = 0
+        self.followers = 0
+        self.follower_retries = 0
+        self.failures = 0
+        self.abandoned = 0
+        self.saved_seconds = 0.0
+
+    async def do(self, key: str, fn: Callable[[CancelToken], Awaitable[Any]]) -> Any:
+        """
+        Run fn once per key among concurrent callers
+
+        Args:
+            key: Request key (see request_key)
+            fn: Coroutine function producing the result; receives the
+                computation's CancelToken
+
+        Returns:
+            The shared result
+        """
+        while True:
+            flight = self._in_flight.get(key)
+            if flight is None or flight.token.cancelled:
+                # A cancelled computation is winding down; don't join it
+                return await self._lead(key, fn)
+
+            self.followers += 1
+            try:
+                result, elapsed = await self._wait(flight)
+            except asyncio.CancelledError:
+                if flight.task.cancelled():
+                    self.followers -= 1
+                    self.follower_retries += 1
+                    continue
+                raise
+            except Exception:
+                # The leader failed; don't inherit its error, take another turn
+                self.followers -= 1
+                self.follower_retries += 1
+                continue
+
+            self.saved_seconds += elapsed
+            return result
+
+    async def _wait(self, flight: _Flight):
+        """Await the shared task; the last waiter to give up cancels the work"""
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                self.abandoned += 1
+                flight.token.cancel("all waiting requests went away")
+            raise
+        finally:
+            flight.waiters -= 1
+
+    async def _lead(self, key: str, fn: Callable[[CancelToken], Awaitable[Any]]) -> Any:
+        self.leaders += 1
+        token = CancelToken()
+
+        async def run():
+            start = time.perf_counter()
+            try:
+                return await fn(token), time.perf_counter() - start
+            finally:
+                if self._in_flight.get(key) is flight:
+                    del self._in_flight[key]
+
+        task = asyncio.ensure_future(run())
+        # Retrieve the outcome even if every waiter has gone away
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        flight = _Flight(task, token)
+        self._in_flight[key] = flight
+        try:
+            result, _ = await self._wait(flight)
+        except Exception:
+            self.failures += 1
+            raise
+        return result
+
+    def stats(self) -> Dict:
+        """Coalescing counters"""
+        total = self.leaders + self.followers
+        return {
+            'in_flight': len(self._in_flight),
+            'leaders': self.leaders,
+            'followers': self.followers,
+            'follower_retries': self.follower_retries,
+            'leader_failures': self.failures,
+            'abandoned': self.abandoned,
+            'coalesced_ratio': self.followers / total if total else 0.0,
+            'saved_compute_seconds': round(self.saved_seconds, 3)
+        }
@@ -0,0 +1,174 @@
+"""
+Pipeline Stage Pools
+Fixed-size thread pools, one per request stage, fed by bounded queues
+
+Decode/resample, inference and serialization each get their own threads, so
+request N+1 is decoded while request N is inside the model and request N-1
+is being encoded. A stage whose queue is full makes new requests wait (as
+coroutines, holding no thread) instead of piling more work onto it. Each
+stage reports its utilization; the busiest stage is the bottleneck.
+"""
+
+import time
+import queue
+import asyncio
+import itertools
+import threading
+import contextvars
+import concurrent.futures
+from collections import deque
+from typing import Callable, Deque, Dict, Tuple
+
+class Utilization:
+    """Busy fraction of a group of workers over a trailing window"""
+
+    def __init__(self, window: float = 60.0):
+        self.window = window
+        self.busy_seconds = 0.0
+        self._created = time.monotonic()
+        self._intervals: Deque[Tuple[float, float]] = deque()
+        self._active: Dict[int, float] = {}
+        self._tokens = itertools.count()
+        self._lock = threading.Lock()
+
+    def begin(self) -> int:
+        """Mark a worker busy; pass the returned token to end()"""
+        token = next(self._tokens)
+        with self._lock:
+            self._active[token] = time.monotonic()
+        return token
+
+    def end(self, token: int):
+        now = time.monotonic()
+        with self._lock:
+            start = self._active.pop(token, now)
+            self._intervals.append((start, now))
+            self.busy_seconds += now - start
+
+    def value(self, workers: int) -> float:
+        """Busy worker-seconds over available worker-seconds in the window"""
+        now = time.monotonic()
+        since = max(now - self.window, self._created)
+        span = (now - since) * workers
+        if span <= 0:
+            return 0.0
+        with self._lock:
+            while self._intervals and self._intervals[0][1] <= since:
+                self._intervals.popleft()
+            busy = sum(end - max(start, since) for start, end in self._intervals)
+            busy += sum(now - max(start, since) for start in self._active.values())
+        return min(1.0, busy / span)
+
+class StagePool:
+    """Threads for one pipeline stage, with at most workers + queue_size jobs admitted"""
+
+    def __init__(self, name: str, workers: int, queue_size: int, utilization_window: float = 60.0):
+        """
+        Args:
+            name: Stage name, for threads and stats
+            workers: Threads running the stage
+            queue_size: Jobs that may wait for a thread; further callers wait to be admitted
+            utilization_window: Seconds of history behind the utilization figure
+        """
+        self.name = name
+        self.workers = workers
+        self.queue_size = queue_size
+        self.utilization = Utilization(utilization_window)
+        self.counters = {'completed': 0, 'failed': 0, 'cancelled': 0, 'blocked': 0}
+        self._wait_seconds = 0.0
+        self._queue: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self._waiters: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+        self._threads = [
+            threading.Thread(target=self._work, name=f"{name}-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """Run fn(*args, **kwargs) on the stage's threads (with the caller's context vars) and await its result"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._admitted < self.workers + self.queue_size and not self._waiters:
+                self._admitted += 1
+                slot = None
+            else:
+                slot = loop.create_future()
+                self._waiters.append((loop, slot))
+                self.counters['blocked'] += 1
+
+        if slot is not None:
+            try:
+                await slot
+            except asyncio.CancelledError:
+                with self._lock:
+                    handed_over = (loop, slot) not in self._waiters
+                    if not handed_over:
+                        self._waiters.remove((loop, slot))
+                if handed_over:
+                    self._release()
+                raise
+
+        future = concurrent.futures.Future()
+        self._queue.put((future, contextvars.copy_context(), fn, args, kwargs, time.monotonic()))
+        return await asyncio.wrap_future(future)
+
+    def _release(self):
+        """Pass a finished job's slot to the longest-waiting caller, or free it"""
+        with self._lock:
+            while self._waiters:
+                loop, slot = self._waiters.popleft()
+                try:
+                    loop.call_soon_threadsafe(_hand_over, slot)
+                    return
+                except RuntimeError:
+                    continue  # That caller's event loop is gone
+            self._admitted -= 1
+
+    def _work(self):
+        while True:
+            future, context, fn, args, kwargs, enqueued = self._queue.get()
+            try:
+                if not future.set_running_or_notify_cancel():
+                    self._count('cancelled')
+                    continue
+                with self._lock:
+                    self._wait_seconds += time.monotonic() - enqueued
+                busy = self.utilization.begin()
+                try:
+                    future.set_result(context.run(fn, *args, **kwargs))
+                    self._count('completed')
+                except Exception as e:
+                    future.set_exception(e)
+                    self._count('failed')
+                finally:
+                    self.utilization.end(busy)
+            finally:
+                self._release()
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            queued = self._queue.qsize()
+            started = self.counters['completed'] + self.counters['failed']
+            stats = {
+                'workers': self.workers,
+                'queue_size': self.queue_size,
+                'queued': queued,
+                'running': self._admitted - queued,
+                'waiting_for_admission': len(self._waiters),
+                'mean_queue_seconds': round(self._wait_seconds / started, 4) if started else 0.0,
+                **self.counters
+            }
+        stats['utilization'] = round(self.utilization.value(self.workers), 3)
+        return stats
+
+def _hand_over(slot: asyncio.Future):
+    # A caller cancelled after being picked releases the slot itself
+    if not slot.done():
+        slot.set_result(None)
@@ -0,0 +1,79 @@
+"""
+Stand-in Audio2Face Binding
+CPU-only substitute for the audio2face_py module, for benchmarks and tuning
+runs on machines without a GPU or a built SDK
+
+Pass it as Audio2FaceSDK(binding=stand_in_binding). Outputs are deterministic
+functions of the input audio (band energies through a fixed random
+projection), with costs shaped like the real SDK: a fixed cost per bundle
+and per call, plus a per-audio-second cost.
+"""
+
+import time
+import numpy as np
+from pathlib import Path
+from config import config
+
+# Simulated costs in seconds
+BUNDLE_OVERHEAD = 0.010
+CALL_OVERHEAD = 0.015
+SECONDS_PER_AUDIO_SECOND = 0.004
+GPU_SOLVER_SPEEDUP = 1.5
+
+_projection = np.random.default_rng(0).standard_normal((8, config.BLENDSHAPE_COUNT)).astype(np.float32)
+
+def _synthesize(audio: np.ndarray, fps: int) -> np.ndarray:
+    """Blendshape-like frames from per-frame band energies"""
+    hop = config.SAMPLE_RATE // fps
+    num_frames = int(len(audio) / config.SAMPLE_RATE * fps)
+    if num_frames == 0:
+        return np.zeros((0, config.BLENDSHAPE_COUNT), dtype=np.float32)
+
+    # Frame k starts at sample round(k * sr / fps), so output is time-aligned
+    starts = np.round(np.arange(num_frames) * config.SAMPLE_RATE / fps).astype(np.intp)
+    framed = audio[np.minimum(starts[:, None] + np.arange(hop), len(audio) - 1)]
+    bands = np.abs(np.fft.rfft(framed, axis=1))
+    edges = np.linspace(0, bands.shape[1], 9).astype(int)
+    energies = np.stack([bands[:, a:b].mean(axis=1) for a, b in zip(edges[:-1], edges[1:])], axis=1)
+    return 1.0 / (1.0 + np.exp(-(np.log1p(energies) @ _projection)))
+
+class BlendshapeModel:
+    """Mimics audio2face_py.BlendshapeModel"""
+
+    def __init__(self, model_path, character_index=0, use_gpu_solver=False, constant_noise=False):
+        self.use_gpu_solver = use_gpu_solver
+        time.sleep(BUNDLE_OVERHEAD)
+
+    def get_num_blendshapes(self):
+        return config.BLENDSHAPE_COUNT
+
+    def get_fps(self):
+        return config.FPS
+
+    def _frames(self, audio):
+        cost = len(audio) / config.SAMPLE_RATE * SECONDS_PER_AUDIO_SECOND
+        time.sleep(cost / GPU_SOLVER_SPEEDUP if self.use_gpu_solver else cost)
+        return _synthesize(audio, config.FPS).astype(np.float32)
+
+    def process_audio(self, audio):
+        time.sleep(CALL_OVERHEAD)
+        return self._frames(audio)
+
+class BatchBlendshapeModel(BlendshapeModel):
+    """Stand-in that also exposes native batching"""
+
+    def process_batch(self, audios):
+        time.sleep(CALL_OVERHEAD)
+        return [self._frames(audio) for audio in audios]
+
+class BatchBinding:
+    """Binding namespace whose model supports process_batch"""
+    BlendshapeModel = BatchBlendshapeModel
+
+def use_placeholder_model(directory) -> None:
+    """Point config.MODEL_PATH at a directory holding a placeholder model.json"""
+    config.MODEL_PATH = Path(directory)
+    config.MODEL_PATH.mkdir(parents=True, exist_ok=True)
+    model_json = config.MODEL_PATH / "model.json"
+    if not model_json.exists():
+        model_json.write_text("{}")
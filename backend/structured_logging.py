@@ -0,0 +1,205 @@
+"""
+Structured Logging
+Non-blocking JSON logging for the request hot path
+
+Records are handed to a bounded in-memory queue and written by a background
+listener thread, so callers never wait on stdout. When the queue is full the
+record is dropped and counted rather than blocking. Each record carries the
+current request id; per-level sampling and a rate limit on repeated error
+traces keep log volume bounded under load.
+"""
+
+import sys
+import json
+import time
+import queue
+import random
+import atexit
+import logging
+import threading
+import contextvars
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+# Set per request by the HTTP middleware
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar('request_id', default=None)
+
+# Attributes every LogRecord has; anything else was passed via extra=
+_RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener: Optional[QueueListener] = None
+_handler: Optional['NonBlockingQueueHandler'] = None
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler that drops (and counts) records instead of blocking on a full queue"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self.enqueued = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only resolve the message here; traceback formatting and JSON encoding
+        # happen on the listener thread. Same process, so exc_info can travel as-is.
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if not hasattr(record, 'request_id'):
+            record.request_id = request_id_var.get()
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+            self.enqueued += 1
+        except queue.Full:
+            self.dropped += 1
+
+class LevelSampler(logging.Filter):
+    """Keep a fraction of records per level (levels not listed are always kept)"""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = {logging.getLevelName(level): rate for level, rate in rates.items()}
+        self.sampled_out = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rates.get(record.levelno, 1.0)
+        if rate >= 1.0 or random.random() < rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+class TraceRateLimiter(logging.Filter):
+    """
+    Allow at most `limit` tracebacks per distinct error per `window` seconds
+
+    Further occurrences are still logged, without the traceback; the next
+    record that does carry one reports how many were suppressed.
+    """
+
+    def __init__(self, limit: int, window: float):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self._seen: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+        self.suppressed = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not record.exc_info or not record.exc_info[0]:
+            return True
+
+        key = (record.exc_info[0], record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            window_start, count, suppressed = self._seen.get(key, (now, 0, 0))
+            if now - window_start > self.window:
+                window_start, count = now, 0
+
+            if count < self.limit:
+                self._seen[key] = [window_start, count + 1, 0]
+                if suppressed:
+                    record.suppressed_traces = suppressed
+                return True
+
+            self._seen[key] = [window_start, count, suppressed + 1]
+            self.suppressed += 1
+
+        record.exc_info = None
+        record.exc_text = None
+        record.trace_suppressed = True
+        return True
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg, request_id, extras, exc"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': round(record.created, 6),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        if getattr(record, 'request_id', None):
+            entry['request_id'] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RESERVED and key != 'request_id':
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class ConsoleFormatter(logging.Formatter):
+    """Human-readable lines for local development"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        request_id = getattr(record, 'request_id', None)
+        prefix = f"[{request_id[:8]}] " if request_id else ""
+        line = f"{record.levelname[0]} {prefix}{record.getMessage()}"
+        stages = getattr(record, 'stages', None)
+        if stages:
+            line += " (" + ", ".join(f"{name}={ms:.1f}ms" for name, ms in stages.items()) + ")"
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+def setup_logging(level: str = "INFO", json_format: bool = True, queue_size: int = 10000,
+                  sample_rates: Optional[Dict[str, float]] = None,
+                  trace_limit: int = 5, trace_window: float = 60.0) -> NonBlockingQueueHandler:
+    """
+    Route the root logger through a bounded queue to a background writer
+
+    Args:
+        level: Minimum level
+        json_format: JSON lines (True) or readable console lines (False)
+        queue_size: Records buffered before new ones are dropped
+        sample_rates: Fraction of records kept per level name, e.g. {"DEBUG": 0.01}
+        trace_limit: Tracebacks per distinct error per trace_window seconds
+        trace_window: Rate-limit window for tracebacks
+
+    Returns:
+        The queue handler (its counters feed log_stats)
+    """
+    global _listener, _handler
+    if _handler is not None:
+        return _handler
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    _handler = NonBlockingQueueHandler(log_queue)
+    _handler.addFilter(LevelSampler(sample_rates or {}))
+    _handler.addFilter(TraceRateLimiter(trace_limit, trace_window))
+
+    writer = logging.StreamHandler(sys.stdout)
+    writer.setFormatter(JSONFormatter() if json_format else ConsoleFormatter())
+
+    root = logging.getLogger()
+    root.handlers = [_handler]
+    root.setLevel(level)
+
+    _listener = QueueListener(log_queue, writer, respect_handler_level=False)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return _handler
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger for a module"""
+    return logging.getLogger(name)
+
+def log_stats() -> Dict:
+    """Counters for the logging pipeline"""
+    if _handler is None:
+        return {'configured': False}
+
+    stats = {
+        'configured': True,
+        'enqueued': _handler.enqueued,
+        'dropped': _handler.dropped,
+        'queue_depth': _handler.queue.qsize(),
+    }
+    for log_filter in _handler.filters:
+        if isinstance(log_filter, LevelSampler):
+            stats['sampled_out'] = log_filter.sampled_out
+        elif isinstance(log_filter, TraceRateLimiter):
+            stats['suppressed_traces'] = log_filter.suppressed
+    return stats
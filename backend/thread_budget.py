@@ -0,0 +1,202 @@
+"""
+Thread Budget
+One place that decides how many threads each CPU consumer may use
+
+NumPy's BLAS, OpenMP (the SDK's CPU solver, SciPy), numba (librosa) and our
+own inference and decode workers each default to one thread per core. Run
+concurrently they oversubscribe the machine, so the budget starts from the
+CPUs this process may really use (affinity mask and cgroup quota, not
+os.cpu_count()) and divides them between the threads that run numeric code
+at the same time.
+
+Library pools size themselves when first loaded, so export_environment()
+must run before NumPy is imported; apply() then sets the final limits at
+runtime through threadpoolctl and numba.
+"""
+
+import os
+import math
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Read by OpenBLAS, MKL, OpenMP runtimes, numexpr and numba when they load
+LIBRARY_ENV = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+               'NUMEXPR_NUM_THREADS', 'NUMBA_NUM_THREADS')
+
+# Handle returned by threadpoolctl; kept so limits can be changed again
+_library_limits = None
+
+def cgroup_cpu_limit() -> Optional[float]:
+    """CPUs allowed by the cgroup quota (v2 or v1), or None when unlimited"""
+    try:
+        quota, period = Path('/sys/fs/cgroup/cpu.max').read_text().split()[:2]
+        return None if quota == 'max' else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        quota = int(Path('/sys/fs/cgroup/cpu/cpu.cfs_quota_us').read_text())
+        period = int(Path('/sys/fs/cgroup/cpu/cpu.cfs_period_us').read_text())
+        return quota / period if quota > 0 and period > 0 else None
+    except (OSError, ValueError):
+        return None
+
+def allowed_cpus() -> List[int]:
+    """Core ids in this process's affinity mask"""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+def available_cpus() -> Tuple[int, str]:
+    """(usable CPUs, what limits them: 'cores', 'affinity' or 'cgroup quota')"""
+    cores = os.cpu_count() or 1
+    count = len(allowed_cpus())
+    source = 'affinity' if count < cores else 'cores'
+    quota = cgroup_cpu_limit()
+    if quota is not None and math.ceil(quota) < count:
+        count, source = max(1, math.ceil(quota)), 'cgroup quota'
+    return count, source
+
+def pin(cpus: Sequence[int]):
+    """Restrict this process (and threads it starts later) to the given cores"""
+    if hasattr(os, 'sched_setaffinity') and cpus:
+        os.sched_setaffinity(0, set(cpus))
+
+def cpu_slice(index: int, count: int) -> List[int]:
+    """The index-th of count disjoint, contiguous slices of the allowed cores"""
+    cpus = allowed_cpus()
+    size = max(1, len(cpus) // count)
+    start = (index * size) % len(cpus)
+    return cpus[start:start + size]
+
+class ThreadBudget:
+    """Thread counts for the workers and the numeric libraries they call"""
+
+    def __init__(self, cpus: int, source: str, inference_workers: int, decode_workers: int,
+                 affinity: Optional[List[int]] = None):
+        """
+        Args:
+            cpus: CPUs available to this process
+            source: What limits cpus (for the startup report)
+            inference_workers: Inference worker threads
+            decode_workers: Decode threads (0 sizes them from the CPUs left over)
+            affinity: Cores the process is pinned to, if pinned
+        """
+        self.cpus = cpus
+        self.source = source
+        self.inference_workers = inference_workers
+        self.decode_workers = decode_workers or max(1, min(cpus // 2, cpus - inference_workers))
+        self.affinity = affinity
+        # Every inference worker and decode thread may be inside BLAS/OpenMP/numba at once
+        concurrent = self.inference_workers + self.decode_workers
+        self.library_threads = max(1, cpus // concurrent)
+
+    @property
+    def oversubscription(self) -> float:
+        """Busy threads per CPU at full load (1.0 or less: no oversubscription)"""
+        return (self.inference_workers + self.decode_workers) * self.library_threads / self.cpus
+
+    def describe(self) -> Dict:
+        return {
+            'cpus': self.cpus,
+            'cpu_limit': self.source,
+            'affinity': self.affinity,
+            'inference_workers': self.inference_workers,
+            'decode_workers': self.decode_workers,
+            'library_threads': self.library_threads,
+            'oversubscription': round(self.oversubscription, 2)
+        }
+
+def pin_process(affinity, process_index: Optional[int] = None, process_count: int = 1) -> Optional[List[int]]:
+    """
+    Apply a CPU_AFFINITY setting; call before any thread starts (threads inherit it)
+
+    Args:
+        affinity: None (leave as inherited), a list of core ids, or "split"
+                  to give each of process_count processes its own cores
+        process_index: This process's index among pre-forked workers
+        process_count: Processes sharing the machine
+
+    Returns:
+        The cores pinned to, or None
+    """
+    pinned = None
+    if affinity == "split" and process_index is not None:
+        pinned = cpu_slice(process_index, process_count)
+    elif isinstance(affinity, (list, tuple)):
+        pinned = list(affinity)
+    if pinned:
+        pin(pinned)
+    return pinned
+
+def plan(inference_workers: int, decode_workers: int = 0, pinned: Optional[List[int]] = None,
+         process_count: int = 1) -> ThreadBudget:
+    """
+    Size the budget for this process
+
+    Args:
+        inference_workers: Inference worker threads
+        decode_workers: Decode threads (0: sized by the budget)
+        pinned: Cores from pin_process, if any
+        process_count: Processes sharing the machine
+    """
+    cpus, source = available_cpus()
+    if process_count > 1 and not pinned:
+        # Unpinned processes share every core between them
+        cpus, source = max(1, cpus // process_count), f"{source} / {process_count} processes"
+    return ThreadBudget(cpus, source, inference_workers, decode_workers, pinned)
+
+def export_environment(budget: ThreadBudget):
+    """Cap library pools before they load (variables the operator already set win)"""
+    for name in LIBRARY_ENV:
+        os.environ.setdefault(name, str(budget.library_threads))
+
+def apply_thread_limits(blas_threads: Optional[int], numba_threads: Optional[int],
+                        openmp_threads: Optional[int] = None):
+    """Apply BLAS, OpenMP and numba thread counts (None leaves the library default)"""
+    global _library_limits
+    try:
+        from threadpoolctl import threadpool_limits
+        if _library_limits is not None:
+            _library_limits.restore_original_limits()
+            _library_limits = None
+        limits = {api: n for api, n in (('blas', blas_threads), ('openmp', openmp_threads)) if n}
+        if limits:
+            _library_limits = threadpool_limits(limits=limits)
+    except ImportError:
+        pass
+
+    try:
+        import numba
+        numba.set_num_threads(min(numba_threads or numba.config.NUMBA_NUM_THREADS,
+                                  numba.config.NUMBA_NUM_THREADS))
+    except ImportError:
+        pass
+
+def apply(budget: ThreadBudget, blas_threads: Optional[int] = None, numba_threads: Optional[int] = None):
+    """Set library limits from the budget; explicit (e.g. autotuned) counts take precedence"""
+    apply_thread_limits(blas_threads or budget.library_threads, numba_threads or budget.library_threads,
+                        budget.library_threads)
+
+def effective_limits() -> Dict[str, int]:
+    """Thread counts the loaded libraries actually use, read back from them"""
+    limits = {}
+    try:
+        from threadpoolctl import threadpool_info
+        for pool in threadpool_info():
+            limits[pool['internal_api']] = pool['num_threads']
+    except ImportError:
+        pass
+    try:
+        import numba
+        limits['numba'] = numba.get_num_threads()
+    except ImportError:
+        pass
+    return limits
+
+def report(budget: ThreadBudget) -> str:
+    """One startup line with the effective settings"""
+    pinned = f", pinned to cores {budget.affinity}" if budget.affinity else ""
+    effective = ", ".join(f"{name} {n}" for name, n in effective_limits().items()) or "none loaded"
+    return (f"{budget.cpus} CPU(s) ({budget.source}{pinned}): {budget.inference_workers} inference + "
+            f"{budget.decode_workers} decode threads x {budget.library_threads} library thread(s) "
+            f"[{effective}], oversubscription {budget.oversubscription:.2f}")
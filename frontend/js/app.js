@@ -33,6 +33,7 @@ const audioFileInput = document.getElementById('audio-file');
 const processBtn = document.getElementById('process-btn');
 const playBtn = document.getElementById('play-btn');
 const stopBtn = document.getElementById('stop-btn');
+const streamToggle = document.getElementById('stream-toggle');
 const statusMessage = document.querySelector('.status-message');
 const progressBar = document.querySelector('.progress-bar');
 const progressFill = document.querySelector('.progress-fill');
@@ -152,14 +153,29 @@ async function processAudio() {
     updateStatus('Processing audio... This may take a moment', true);
     showProgress();
 
+    // The bar follows the server's own progress events for this request id
+    const requestId = newRequestId();
+    let framesReady = false;
+    const progressEvents = watchProgress(requestId, (state) => {
+        setProgress(state.percent);
+        if (!framesReady) {
+            updateStatus(describeProgress(state), true);
+        }
+    });
+
     try {
         console.log('Uploading audio file...');
         const formData = new FormData();
         formData.append('file', currentAudioFile);
 
-        console.log('Calling process-audio endpoint...');
-        const response = await fetch(`${API_URL}/process-audio`, {
+        // Streaming is opt-in: it starts playback after the first window, but its short
+        // windows (STREAM_WINDOW_SECONDS) trade a little accuracy, and streamed requests
+        // bypass the result cache and coalescing of identical uploads
+        const streaming = streamToggle.checked;
+        console.log(`Calling process-audio endpoint${streaming ? ' (streaming)' : ''}...`);
+        const response = await fetch(`${API_URL}/process-audio${streaming ? '?stream=ndjson' : ''}`, {
             method: 'POST',
+            headers: { 'X-Request-Id': requestId },
             body: formData
         });
 
@@ -171,45 +187,149 @@ async function processAudio() {
             throw new Error(errorMsg);
         }
 
-        const result = await response.json();
-        console.log('Processing result:', result);
-
-        if (result.success) {
-            console.log('Fetching blendshape names...');
-            // Store blendshape data
-            const blendshapeNames = await fetchBlendshapeNames();
-            avatarController.setBlendshapeData({
+        const blendshapeNames = await fetchBlendshapeNames();
+        let data = null;
+
+        if (streaming) {
+            // Frames arrive window by window; playback can start with the first block
+            await readNdjson(response, (message) => {
+                if (message.type === 'metadata') {
+                    console.log('Stream metadata:', message);
+                    data = {
+                        blendshapes: [],
+                        timestamps: [],
+                        fps: message.fps,
+                        names: blendshapeNames,
+                        complete: false
+                    };
+                    avatarController.setBlendshapeData(data);
+                    audioPlayer.setAudioFile(currentAudioFile);
+                    document.getElementById('fps').textContent = message.fps;
+                    document.getElementById('duration').textContent = message.audio_duration.toFixed(2) + 's';
+                } else if (message.type === 'frames') {
+                    data.blendshapes.push(...message.blendshapes);
+                    data.timestamps.push(...message.timestamps);
+                    document.getElementById('frame-count').textContent = data.blendshapes.length;
+                    if (message.window_index === 0) {
+                        framesReady = true;
+                        updateStatus('Processing audio... first frames ready, you can start playback', true);
+                        playBtn.disabled = false;
+                        stopBtn.disabled = false;
+                    }
+                } else if (message.type === 'end') {
+                    data.complete = true;
+                    document.getElementById('frame-count').textContent = message.num_frames;
+                    console.log('Processing result:', message);
+                } else if (message.type === 'error') {
+                    throw new Error(message.detail);
+                }
+            });
+        } else {
+            const result = await response.json();
+            console.log('Processing result:', result);
+            if (!result.success) {
+                throw new Error('Processing failed');
+            }
+            data = {
                 blendshapes: result.data.blendshapes,
                 timestamps: result.data.timestamps,
                 fps: result.data.fps,
-                names: blendshapeNames
-            });
-
-            // Set audio file for playback
+                names: blendshapeNames,
+                complete: true
+            };
+            avatarController.setBlendshapeData(data);
             audioPlayer.setAudioFile(currentAudioFile);
-
-            // Update UI
             document.getElementById('fps').textContent = result.data.fps;
             document.getElementById('frame-count').textContent = result.data.num_frames;
             document.getElementById('duration').textContent = result.data.duration.toFixed(2) + 's';
+        }
 
-            updateStatus('✓ Processing complete! Ready to play animation.');
-            console.log('Processing completed successfully!');
-            playBtn.disabled = false;
-            stopBtn.disabled = false;
-        } else {
-            throw new Error('Processing failed');
+        if (!data || !data.complete) {
+            throw new Error('Processing stream ended early');
         }
 
+        updateStatus(audioPlayer.isPlaying ? '▶ Playing animation...' : '✓ Processing complete! Ready to play animation.');
+        console.log('Processing completed successfully!');
+        playBtn.disabled = audioPlayer.isPlaying;
+        stopBtn.disabled = false;
+
     } catch (error) {
         updateStatus('✗ Error: ' + error.message);
         console.error('Processing error:', error);
     } finally {
+        progressEvents.close();
         hideProgress();
-        processBtn.disabled = false;
+        processBtn.disabled = audioPlayer.isPlaying;
     }
 }
 
+// Read a newline-delimited JSON response, calling onMessage per line as it arrives
+async function readNdjson(response, onMessage) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+
+        let newline;
+        while ((newline = buffer.indexOf('\n')) >= 0) {
+            const line = buffer.slice(0, newline).trim();
+            buffer = buffer.slice(newline + 1);
+            if (line) {
+                onMessage(JSON.parse(line));
+            }
+        }
+
+        if (done) break;
+    }
+}
+
+// Subscribe to server-sent progress events for a request id (before sending the request)
+function watchProgress(requestId, onProgress) {
+    const source = new EventSource(`${API_URL}/progress/${encodeURIComponent(requestId)}`);
+    source.addEventListener('progress', (event) => onProgress(JSON.parse(event.data)));
+    source.addEventListener('done', (event) => {
+        onProgress(JSON.parse(event.data));
+        source.close();
+    });
+    // Named "error" events carry data; connection errors don't, and EventSource retries those itself
+    source.addEventListener('error', (event) => {
+        if (event.data) {
+            console.warn('Processing failed:', JSON.parse(event.data).error);
+            source.close();
+        }
+    });
+    return source;
+}
+
+function newRequestId() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    return Date.now().toString(16) + Math.random().toString(16).slice(2);
+}
+
+const STAGE_LABELS = {
+    pending: 'Starting',
+    upload: 'Uploading audio',
+    decode: 'Decoding audio',
+    resample: 'Resampling audio',
+    queued: 'Waiting for an inference worker',
+    inference: 'Generating animation',
+    serialize: 'Saving result',
+    done: 'Finishing'
+};
+
+function describeProgress(state) {
+    let text = `${STAGE_LABELS[state.stage] || 'Processing'}... ${Math.round(state.percent)}%`;
+    if (state.eta_seconds > 0) {
+        text += ` (about ${Math.ceil(state.eta_seconds)}s left)`;
+    }
+    return text;
+}
+
 // Fetch blendshape names
 async function fetchBlendshapeNames() {
     const response = await fetch(`${API_URL}/blendshape-names`);
@@ -246,43 +366,20 @@ function updateStatus(message, isProcessing = false) {
 }
 
 // Show/hide progress bar
-let progressInterval = null;
-
 function showProgress() {
     progressBar.style.display = 'block';
-    animateProgress();
+    progressFill.style.width = '0%';
+}
+
+function setProgress(percent) {
+    progressFill.style.width = Math.min(100, Math.max(0, percent)) + '%';
 }
 
 function hideProgress() {
-    if (progressInterval) {
-        clearInterval(progressInterval);
-        progressInterval = null;
-    }
     progressBar.style.display = 'none';
     progressFill.style.width = '0%';
 }
 
-function animateProgress() {
-    let width = 0;
-    let increasing = true;
-
-    // Smooth pulsing animation to show system is alive
-    progressInterval = setInterval(() => {
-        if (increasing) {
-            width += 2;
-            if (width >= 85) {
-                increasing = false;
-            }
-        } else {
-            width -= 1;
-            if (width <= 60) {
-                increasing = true;
-            }
-        }
-        progressFill.style.width = width + '%';
-    }, 100);
-}
-
 // Start application after THREE.js addons are ready
 if (typeof THREE !== 'undefined' && THREE.OrbitControls && THREE.GLTFLoader) {
     // Addons already loaded
@@ -38,6 +38,12 @@ class AudioPlayer {
         if (frameIndex < data.blendshapes.length) {
             this.avatarController.applyBlendshapes(frameIndex);
             this.animationFrameId = requestAnimationFrame(() => this.animate());
+        } else if (data.complete === false) {
+            // Still streaming: hold the last frame until more arrive
+            if (data.blendshapes.length > 0) {
+                this.avatarController.applyBlendshapes(data.blendshapes.length - 1);
+            }
+            this.animationFrameId = requestAnimationFrame(() => this.animate());
         } else {
             this.stop();
         }